@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+from metrics import Gauge, Histogram
+
+
+BATCH_QUEUE_DEPTH = Gauge(
+    "vitals_batch_queue_depth",
+    "Requests waiting to be dispatched in a micro-batch, by batcher",
+    labelnames=("batcher",)
+)
+BATCH_SIZE = Histogram(
+    "vitals_batch_size",
+    "Number of requests scored together in one micro-batch, by batcher",
+    labelnames=("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+BATCH_WAIT = Histogram(
+    "vitals_batch_wait_seconds",
+    "Time a request waits before its micro-batch is dispatched, by batcher",
+    labelnames=("batcher",)
+)
+
+
+class MicroBatcher:
+    """
+    This collects concurrent requests into micro-batches on the event loop.
+
+    A batch is dispatched when it reaches max_size, or when max_wait seconds have
+    passed since its first request arrived. Each batch is scored with a single
+    predict_batch call, awaited through run, and the results are fanned back out
+    to the waiting callers in order.
+    """
+
+    def __init__(self, predict_batch, run, max_size=64, max_wait=0.002, name="predictions"):
+        self.predict_batch = predict_batch
+        self.run = run
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+        self._queue_depth = BATCH_QUEUE_DEPTH.labels(name)
+        self._batch_size = BATCH_SIZE.labels(name)
+        self._batch_wait = BATCH_WAIT.labels(name)
+
+    async def submit(self, item):
+        """
+        This queues a single item and waits for its result from a batch.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        self._pending.append((item, future, time.perf_counter()))
+        self._queue_depth.inc()
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending[:self.max_size], self._pending[self.max_size:]
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        for _, _, queued_at in batch:
+            self._batch_wait.observe(now - queued_at)
+        self._batch_size.observe(len(batch))
+        self._queue_depth.dec(len(batch))
+
+        # Anything left over from a burst starts its own window
+        if self._pending:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch):
+        # Callers that went away while waiting are dropped before scoring
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+
+        try:
+            results = await self.run(self.predict_batch, [item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,16 @@
+# A typical user's onboarding answers and watch readings, shared by the benchmarks
+SAMPLE_VITALS = {
+    "age":             52,
+    "gender":          0,
+    "smoking_status":  1,
+    "bmi":             28.4,
+    "avg_sleep_hours": 6.5,
+    "stress_level":    6,
+    "diabetic":        0,
+    "systolic_bp":     134.0,
+    "diastolic_bp":    86.0,
+    "heart_rate":      72.0,
+    "spo2":            97.0,
+    "breathing_rate":  15.0,
+    "hrv":             38.0,
+}
@@ -0,0 +1,111 @@
+"""
+Runs the inference and serialisation micro-benchmarks and the load benchmark,
+saving the results as JSON. Passing a previous results file compares the two runs
+and exits non-zero when any latency or throughput figure regressed past the
+threshold. Run from the fast-backend directory:
+
+    python -m benchmarks --output results.json --compare baseline.json
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import subprocess
+import sys
+
+# The benchmarks must never call the real Gemini API
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+from benchmarks import inference, load, serialization
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    """
+    This flattens nested results into "path/to/figure" keys, keeping only the
+    latency and throughput figures worth comparing.
+    """
+    figures = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            figures.update(flatten(value, f"{prefix}{key}/"))
+        elif key.startswith(("p50", "p95", "p99", "mean", "throughput")):
+            figures[prefix + key] = value
+    return figures
+
+
+def compare(baseline, current, threshold):
+    """
+    This prints the change in every figure present in both runs, returning the
+    figures that got worse by more than threshold, as a fraction.
+    """
+    before = flatten(baseline["results"])
+    after = flatten(current["results"])
+    regressions = []
+
+    print(f"\nCompared with {baseline.get('commit')} from {baseline.get('timestamp')}\n")
+    for key in sorted(before.keys() & after.keys()):
+        if not before[key]:
+            continue
+
+        change = (after[key] - before[key]) / before[key]
+        # Higher throughput is better, while higher latency is worse
+        worse = -change if key.endswith("throughput_rps") else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(key)
+
+        print(f"  {key:<48} {before[key]:>10} -> {after[key]:>10}   {change:+7.1%}{flag}")
+    print()
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend benchmark suite")
+    parser.add_argument("--iterations", type=int, default=2000, help="Micro-benchmark iterations")
+    parser.add_argument("--skip-load", action="store_true", help="Only run the micro-benchmarks")
+    parser.add_argument("--output", default=None, help="Where to save the results as JSON")
+    parser.add_argument("--compare", default=None, help="A previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed regression, as a fraction")
+    load.add_arguments(parser)
+    args = parser.parse_args()
+
+    bundle = inference.scoring.model_registry.load()
+    report = {
+        "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "model_version": bundle.version,
+        "engine": bundle.engine,
+        "results": {
+            "inference":     inference.run(args.iterations),
+            "serialization": serialization.run(args.iterations),
+        },
+    }
+
+    if not args.skip_load:
+        report["results"]["load"] = load.run(
+            args.endpoints, args.concurrency, args.requests, args.warmup, args.llm_delay, load.parse_env(args.env)
+        )
+
+    output = args.output or f"benchmark-{report['timestamp'].replace(':', '')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            sys.exit(f"{len(regressions)} figures regressed by more than {args.threshold:.0%}")
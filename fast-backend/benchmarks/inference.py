@@ -0,0 +1,75 @@
+"""
+Micro-benchmark for vitals inference. Run from the fast-backend directory:
+
+    python -m benchmarks.inference --iterations 2000
+"""
+import argparse
+import time
+import numpy as np
+
+import scoring
+
+from benchmarks import SAMPLE_VITALS
+
+
+SAMPLE_USER = scoring.UserData(**SAMPLE_VITALS)
+
+
+def measure(fn, iterations, warmup=50):
+    """
+    This times a callable, returning per-call latency percentiles in microseconds.
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+
+    timings *= 1e6
+    return {
+        "mean_us": round(float(timings.mean()), 1),
+        "p50_us":  round(float(np.percentile(timings, 50)), 1),
+        "p95_us":  round(float(np.percentile(timings, 95)), 1),
+        "p99_us":  round(float(np.percentile(timings, 99)), 1),
+    }
+
+
+def predict_twice(X_imp):
+    """
+    This is the previous prediction path, which traversed the booster twice.
+    """
+    model = scoring.model_registry.get().model
+    stage = int(model.predict(X_imp)[0])
+    probs = model.predict_proba(X_imp)[0].tolist()
+    return stage, probs
+
+
+def run(iterations):
+    bundle = scoring.model_registry.load()
+    X_imp = bundle.assembler.transform(SAMPLE_USER)[np.newaxis, :]
+
+    results = {
+        "before: predict + predict_proba": measure(lambda: predict_twice(X_imp), iterations),
+        "after: predict_stages":           measure(lambda: bundle.predict_stages(X_imp), iterations),
+        "run_inference":                   measure(lambda: scoring.run_inference(SAMPLE_USER), iterations),
+        "explain: 1 row":                  measure(lambda: scoring.run_batch_explanations([SAMPLE_USER]), iterations),
+        "explain: batch of 32":            measure(lambda: scoring.run_batch_explanations([SAMPLE_USER] * 32), iterations // 10),
+    }
+
+    print(f"\nEngine: {scoring.VITALS_ENGINE}, {iterations} iterations\n")
+    for name, stats in results.items():
+        print(f"  {name:<34} mean {stats['mean_us']:>9} us   p50 {stats['p50_us']:>9} us   p95 {stats['p95_us']:>9} us   p99 {stats['p99_us']:>9} us")
+    print()
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vitals inference micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    run(args.iterations)
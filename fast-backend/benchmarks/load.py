@@ -0,0 +1,230 @@
+"""
+Load benchmark for the HTTP endpoints. Starts a local uvicorn instance with the
+Gemini model replaced by the deterministic stand-in, then drives each endpoint
+at the given concurrency. Run from the fast-backend directory:
+
+    python -m benchmarks.load --concurrency 1 8 32 --requests 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import numpy as np
+
+from benchmarks import SAMPLE_VITALS
+
+
+SYMPTOMS = ("anxiety", "headaches", "chest_pain", "nausea", "shortness_of_breath")
+
+
+def vitals_request(rng):
+    """
+    This builds an /analyse-vitals body around the sample user, so requests are
+    realistic but not all identical.
+    """
+    body = dict(
+        SAMPLE_VITALS,
+        age=rng.randint(25, 80),
+        bmi=round(rng.uniform(19, 40), 1),
+        systolic_bp=round(rng.uniform(100, 170), 1),
+        diastolic_bp=round(rng.uniform(60, 105), 1),
+        heart_rate=round(rng.uniform(55, 100), 1),
+    )
+    return "/analyse-vitals", body
+
+
+def explain_request(rng):
+    # Each request is a new user, so explanations are never served from the cache
+    path, body = vitals_request(rng)
+    return f"{path}?explain=true", dict(body, bmi=round(rng.uniform(19, 40), 3))
+
+
+def suggest_request(rng):
+    return "/suggest", {name: rng.random() < 0.4 for name in SYMPTOMS}
+
+
+def chat_request(rng):
+    # Requests are spread over 100 conversations. Each one's first request starts
+    # a session, and later ones send the id the server issued for it.
+    return "/chat", {
+        "message": f"My blood pressure was {rng.randint(110, 160)}/{rng.randint(70, 100)} today, is that fine?",
+        "conversation": rng.randint(0, 99),
+    }
+
+
+ENDPOINTS = {
+    "analyse-vitals": vitals_request,
+    "analyse-vitals-explain": explain_request,
+    "suggest":        suggest_request,
+    "chat":           chat_request,
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_memory(pid):
+    """
+    This reads the resident and peak resident memory of a process in MB. It is
+    only available on Linux, and None elsewhere.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+    except OSError:
+        return None
+
+    return {
+        "rss_mb":  round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+        "peak_mb": round(int(fields["VmHWM"].split()[0]) / 1024, 1),
+    }
+
+
+def start_server(port, env):
+    """
+    This starts uvicorn on port and waits until it answers requests.
+    """
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, "LLM_BACKEND": "fake", **env},
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1).raise_for_status()
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError("Server did not start within 60 seconds")
+
+
+async def drive(client, build, requests, concurrency, seed):
+    """
+    This sends requests built by build from concurrency workers, returning the
+    latency of every request in seconds, the status counts and the wall time.
+    """
+    rng = random.Random(seed)
+    bodies = [build(rng) for _ in range(requests)]
+    latencies = np.empty(requests)
+    statuses = {}
+    sessions = {}
+    queue = iter(range(requests))
+
+    async def worker():
+        for i in queue:
+            path, body = bodies[i]
+            conversation = body.get("conversation")
+            if conversation is not None:
+                body = {key: value for key, value in body.items() if key != "conversation"}
+                if conversation in sessions:
+                    body["session_id"] = sessions[conversation]
+
+            start = time.perf_counter()
+            try:
+                # Reading the whole body includes the complete SSE stream for /chat
+                response = await client.post(path, json=body)
+                await response.aread()
+                status = str(response.status_code)
+                if conversation is not None and "x-session-id" in response.headers:
+                    sessions.setdefault(conversation, response.headers["x-session-id"])
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies[i] = time.perf_counter() - start
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+def summarise(latencies, statuses, elapsed):
+    latencies = latencies * 1000
+    return {
+        "requests":       len(latencies),
+        "statuses":       statuses,
+        "elapsed_s":      round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms":        round(float(latencies.mean()), 2),
+        "p50_ms":         round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms":         round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms":         round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+async def benchmark(port, pid, endpoints, concurrency_levels, requests, warmup):
+    limits = httpx.Limits(max_connections=max(concurrency_levels), max_keepalive_connections=max(concurrency_levels))
+    results = {}
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+        for name in endpoints:
+            build = ENDPOINTS[name]
+            await drive(client, build, warmup, 1, seed=-1)
+
+            results[name] = {}
+            for concurrency in concurrency_levels:
+                latencies, statuses, elapsed = await drive(client, build, requests, concurrency, seed=concurrency)
+                stats = summarise(latencies, statuses, elapsed)
+                stats["memory"] = process_memory(pid)
+                results[name][str(concurrency)] = stats
+
+                print(
+                    f"  {name:<22} c={concurrency:<4} {stats['throughput_rps']:>8} req/s   "
+                    f"p50 {stats['p50_ms']:>8} ms   p95 {stats['p95_ms']:>8} ms   p99 {stats['p99_ms']:>8} ms   "
+                    f"{statuses}"
+                )
+
+    return results
+
+
+def run(endpoints, concurrency_levels, requests, warmup=20, llm_delay=0.0, env=None):
+    """
+    This runs the load benchmark against a fresh server, returning the results for
+    every endpoint and concurrency level along with the server's memory use.
+    """
+    port = free_port()
+    server = start_server(port, {"LLM_FAKE_DELAY": str(llm_delay), **(env or {})})
+    try:
+        memory = {"idle": process_memory(server.pid)}
+        print(f"\nLoad benchmark, {requests} requests per level, LLM delay {llm_delay} s\n")
+        results = asyncio.run(benchmark(port, server.pid, endpoints, concurrency_levels, requests, warmup))
+        memory["final"] = process_memory(server.pid)
+        print()
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {"endpoints": results, "memory": memory, "llm_delay_s": llm_delay, "env": env or {}}
+
+
+def parse_env(values):
+    return dict(value.split("=", 1) for value in values)
+
+
+def add_arguments(parser):
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="Simulated Gemini latency in seconds")
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="Extra server environment, such as SUGGEST_CACHE_SIZE=0")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend load benchmark")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    run(args.endpoints, args.concurrency, args.requests, args.warmup, args.llm_delay, parse_env(args.env))
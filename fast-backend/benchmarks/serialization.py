@@ -0,0 +1,99 @@
+"""
+Micro-benchmark for serialising /analyse-vitals responses, comparing the typed
+response models dumped by pydantic-core with the previous path of plain dicts
+run through jsonable_encoder and JSONResponse. Run from the fast-backend
+directory:
+
+    python -m benchmarks.serialization --iterations 5000
+"""
+import argparse
+import datetime as dt
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+import main
+import scoring
+
+from benchmarks.inference import SAMPLE_USER, measure
+
+
+def encode_dict(body):
+    """
+    This is the previous path: FastAPI walked the returned dict with
+    jsonable_encoder, then JSONResponse rendered it with json.dumps.
+    """
+    return JSONResponse(jsonable_encoder(body)).body
+
+
+def dict_prediction(result, user):
+    return {**result.dict(), "risk_score": scoring.calculate_framingham_score(user)}
+
+
+def dict_body(data):
+    return {"data": data, "message": "Prediction complete", "timestamp": dt.datetime.now()}
+
+
+def run(iterations, batch_size=100):
+    main.model_registry.load()
+    result = main.run_inference(SAMPLE_USER)
+
+    single = TypeAdapter(main.VitalsResponse)
+    batch = TypeAdapter(main.VitalsBatchResponse)
+
+    def encode_model(adapter, model):
+        # FastAPI validates the returned model against the response model, which
+        # passes instances through, then dumps it straight to JSON bytes
+        return adapter.dump_json(adapter.validate_python(model))
+
+    # Both paths include adding the risk score to the prediction, as the
+    # endpoint does
+    def prediction():
+        return main.VitalsPrediction.model_construct(
+            **result.__dict__, risk_score=scoring.calculate_framingham_score(SAMPLE_USER)
+        )
+
+    def single_model():
+        return main.VitalsResponse.model_construct(
+            data=prediction(), message="Prediction complete", timestamp=dt.datetime.now()
+        )
+
+    def batch_model():
+        return main.VitalsBatchResponse.model_construct(
+            data=[prediction() for _ in range(batch_size)], message="Prediction complete", timestamp=dt.datetime.now()
+        )
+
+    cases = {
+        "single, before: dict + jsonable_encoder": (
+            lambda: encode_dict(dict_body(dict_prediction(result, SAMPLE_USER))), iterations
+        ),
+        "single, after: typed + pydantic-core": (
+            lambda: encode_model(single, single_model()), iterations
+        ),
+        f"batch of {batch_size}, before: dict + jsonable_encoder": (
+            lambda: encode_dict(dict_body([dict_prediction(result, SAMPLE_USER) for _ in range(batch_size)])), iterations // 10
+        ),
+        f"batch of {batch_size}, after: typed + pydantic-core": (
+            lambda: encode_model(batch, batch_model()), iterations // 10
+        ),
+    }
+
+    results = {}
+    for name, (fn, n) in cases.items():
+        results[name] = {"bytes": len(fn()), **measure(fn, n)}
+
+    print(f"\nResponse serialisation, {iterations} iterations\n")
+    for name, stats in results.items():
+        print(f"  {name:<46} {stats['bytes']:>7} bytes   mean {stats['mean_us']:>9} us   p50 {stats['p50_us']:>9} us   p99 {stats['p99_us']:>9} us")
+    print()
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Response serialisation micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    run(args.iterations)
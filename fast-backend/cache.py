@@ -0,0 +1,323 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+
+from metrics import Counter, Gauge
+
+
+CACHE_REQUESTS = Counter(
+    "cache_requests",
+    "Cache lookups by cache and result (hit, miss or coalesced)",
+    labelnames=("cache", "result")
+)
+
+CACHE_ENTRIES = Gauge(
+    "cache_entries",
+    "Entries held by each in-process cache",
+    labelnames=("cache",)
+)
+CACHE_BYTES = Gauge(
+    "cache_bytes",
+    "Approximate memory held by each in-process cache",
+    labelnames=("cache",)
+)
+CACHE_HIT_RATIO = Gauge(
+    "cache_hit_ratio",
+    "Fraction of lookups served from each in-process cache since startup",
+    labelnames=("cache",)
+)
+
+MISSING = object()
+
+
+class MemoryBackend:
+    """
+    This is an in-process cache backend with per-entry expiry and least recently
+    used eviction once max_entries is reached.
+    """
+
+    # Lookups only take a lock briefly, so they are made on the event loop
+    blocking = False
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return MISSING
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskBackend:
+    """
+    This is an on-disk cache backend stored in SQLite, so it can be shared by every
+    worker on the same host and survives restarts. Values must be JSON
+    serialisable. Expired entries are dropped on read, and the least recently
+    used entries are evicted once max_entries is reached.
+    """
+
+    # SQLite calls can wait up to 5 seconds on a locked database, so they are
+    # made in a worker thread rather than on the event loop
+    blocking = True
+
+    def __init__(self, path, max_entries=1024):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        # SQLite connections may not be shared across threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        connection = self._connection()
+        now = time.time()
+
+        row = connection.execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return MISSING
+
+        value, expires_at = row
+        if expires_at < now:
+            connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return MISSING
+
+        connection.execute("UPDATE cache SET used_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key, value, ttl):
+        connection = self._connection()
+        now = time.time()
+
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + ttl, now)
+        )
+        connection.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    This caches the results of slow async calls, such as LLM responses.
+
+    Concurrent misses for the same key are coalesced, so only one upstream call is
+    made and every caller awaits that same result. Failures are never cached.
+    """
+
+    def __init__(self, name, backend, ttl):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight = {}
+
+        self._hits = CACHE_REQUESTS.labels(name, "hit")
+        self._misses = CACHE_REQUESTS.labels(name, "miss")
+        self._coalesced = CACHE_REQUESTS.labels(name, "coalesced")
+
+    async def get_or_compute(self, key, compute):
+        """
+        This returns the cached value for key, or awaits compute() to fill it.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            value = await self._backend_call(self.backend.get, key)
+            if value is not MISSING:
+                self._hits.inc()
+                return value
+            # Another caller may have started filling the key during the lookup
+            task = self._inflight.get(key)
+
+        if task is None:
+            self._misses.inc()
+            task = asyncio.ensure_future(self._fill(key, compute))
+            # Failures are still retrieved when every caller has gone away
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        else:
+            self._coalesced.inc()
+
+        # The upstream call is shielded, so one caller disconnecting does not
+        # cancel it for the others.
+        return await asyncio.shield(task)
+
+    async def _backend_call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def _fill(self, key, compute):
+        try:
+            value = await compute()
+            await self._backend_call(self.backend.set, key, value, self.ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+
+def deep_sizeof(value):
+    """
+    This estimates the memory held by a value made of dicts, lists, scalars and
+    models.
+    """
+    size = sys.getsizeof(value)
+    if hasattr(value, "__dict__"):
+        size += deep_sizeof(vars(value))
+    elif isinstance(value, dict):
+        size += sum(deep_sizeof(k) + deep_sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(deep_sizeof(v) for v in value)
+    return size
+
+
+class PredictionCache:
+    """
+    This is an in-process least recently used cache for model predictions, bounded
+    by both entry count and approximate memory.
+
+    Lookups are synchronous and cheap, so they can sit in front of the inference
+    executor and skip it entirely on a hit. Every entry's size is estimated once
+    when it is stored, and the least recently used entries are evicted until both
+    limits hold.
+    """
+
+    def __init__(self, name, max_entries=4096, max_bytes=16 * 1024 * 1024):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hit_counter = CACHE_REQUESTS.labels(name, "hit")
+        self._miss_counter = CACHE_REQUESTS.labels(name, "miss")
+        self._entry_gauge = CACHE_ENTRIES.labels(name)
+        self._byte_gauge = CACHE_BYTES.labels(name)
+        self._ratio_gauge = CACHE_HIT_RATIO.labels(name)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            self._miss_counter.inc()
+        else:
+            self._hit_counter.inc()
+        self._ratio_gauge.set(self.hit_rate)
+
+        return MISSING if entry is None else entry[1]
+
+    def set(self, key, value, size):
+        """
+        This stores value under key, where size is its approximate size in bytes.
+        """
+        if not self.enabled or size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[0]
+
+            self._entries[key] = (size, value)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)[1]
+                self._bytes -= evicted
+
+            self._entry_gauge.set(len(self._entries))
+            self._byte_gauge.set(self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._entry_gauge.set(0)
+            self._byte_gauge.set(0)
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def create_backend(kind, max_entries, path=None):
+    """
+    This builds a cache backend by name, either "memory" or "disk".
+    """
+    if kind == "memory":
+        return MemoryBackend(max_entries)
+    if kind == "disk":
+        return DiskBackend(path, max_entries)
+
+    raise ValueError(f"Unknown cache backend: {kind}")
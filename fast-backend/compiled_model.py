@@ -0,0 +1,218 @@
+import json
+import os
+import numpy as np
+
+
+class CompiledBooster:
+    """
+    This is a lightweight inference engine for the multi-class XGBoost booster.
+
+    The JSON booster is parsed once into flat node tables shared by every tree.
+    A prediction then walks all trees together, one level at a time, with NumPy
+    indexing, and returns softmax probabilities from a single pass.
+
+    The node tables can be saved as plain .npy files and memory-mapped back, so
+    every worker on a host shares the same pages instead of parsing JSON.
+    """
+
+    ARRAYS = (
+        "left", "right", "feature", "threshold",
+        "default_left", "roots", "class_matrix", "base_score"
+    )
+
+    def __init__(self, path):
+        with open(path) as f:
+            model = json.load(f)
+
+        learner = model["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "multi:softprob":
+            raise ValueError(f"Unsupported objective: {objective}")
+
+        params = learner["learner_model_param"]
+        self.num_class = int(params["num_class"])
+        self.num_feature = int(params["num_feature"])
+
+        # Newer XGBoost versions store one intercept per class, already in margin space
+        base_score = json.loads(params["base_score"])
+        self.base_score = np.broadcast_to(
+            np.asarray(base_score, dtype=np.float64), (self.num_class,)
+        ).copy()
+
+        trees = learner["gradient_booster"]["model"]["trees"]
+        tree_info = learner["gradient_booster"]["model"]["tree_info"]
+
+        lefts, rights, features, thresholds, defaults, roots = [], [], [], [], [], []
+        depth = 0
+        offset = 0
+
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported")
+
+            left  = np.asarray(tree["left_children"], dtype=np.int32)
+            right = np.asarray(tree["right_children"], dtype=np.int32)
+            nodes = np.arange(len(left), dtype=np.int32)
+            leaf  = left == -1
+
+            # Leaves point back at themselves, so walking past a leaf is a no-op
+            lefts.append(np.where(leaf, nodes, left) + offset)
+            rights.append(np.where(leaf, nodes, right) + offset)
+            features.append(np.where(leaf, 0, tree["split_indices"]).astype(np.int32))
+            thresholds.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+            defaults.append(np.asarray(tree["default_left"], dtype=bool))
+            roots.append(offset)
+
+            depth = max(depth, _tree_depth(left, right))
+            offset += len(left)
+
+        self.left = np.concatenate(lefts)
+        self.right = np.concatenate(rights)
+        self.feature = np.concatenate(features)
+        # Leaf nodes keep their leaf value in the split condition slot
+        self.threshold = np.concatenate(thresholds)
+        self.default_left = np.concatenate(defaults)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.depth = depth
+
+        # This maps each tree's leaf value onto the margin of its class
+        self.class_matrix = np.zeros((len(trees), self.num_class), dtype=np.float64)
+        self.class_matrix[np.arange(len(trees)), tree_info] = 1.0
+
+    def save(self, directory):
+        """
+        This writes the node tables to a directory of .npy files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({
+                "num_class": self.num_class,
+                "num_feature": self.num_feature,
+                "depth": self.depth,
+            }, f)
+
+    @classmethod
+    def load(cls, directory):
+        """
+        This memory-maps node tables previously written by save.
+        """
+        engine = cls.__new__(cls)
+        with open(os.path.join(directory, "meta.json")) as f:
+            for key, value in json.load(f).items():
+                setattr(engine, key, value)
+
+        for name in cls.ARRAYS:
+            table = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            # A plain ndarray view over the mapping avoids memmap overhead per call
+            setattr(engine, name, np.asarray(table))
+
+        return engine
+
+    def margins(self, X):
+        """
+        This computes the raw per-class margins for a matrix of feature rows.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+
+        rows  = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.roots.size))
+
+        for _ in range(self.depth):
+            values = X[rows, self.feature[nodes]]
+            go_left = np.where(
+                np.isnan(values),
+                self.default_left[nodes],
+                values < self.threshold[nodes]
+            )
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.threshold[nodes] @ self.class_matrix + self.base_score
+
+    def predict_proba(self, X):
+        """
+        This returns softmax probabilities for a matrix of feature rows.
+        """
+        margins = self.margins(X)
+        margins -= margins.max(axis=1, keepdims=True)
+
+        exp = np.exp(margins)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_row(self, x):
+        """
+        This scores a single feature row, returning the most probable stage along
+        with the probabilities of every stage.
+        """
+        x = np.asarray(x, dtype=np.float32).reshape(-1)
+
+        # A single row skips the 2D row indexing and walks flat node vectors
+        nodes = self.roots
+        for _ in range(self.depth):
+            values = x[self.feature[nodes]]
+            go_left = np.where(
+                np.isnan(values),
+                self.default_left[nodes],
+                values < self.threshold[nodes]
+            )
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        margins = self.threshold[nodes] @ self.class_matrix + self.base_score
+        exp = np.exp(margins - margins.max())
+        probs = exp / exp.sum()
+
+        return int(probs.argmax()), probs
+
+    def check_against(self, model, X, tolerance=1e-5):
+        """
+        This checks that the engine reproduces the stock XGBoost probabilities on
+        the given rows, raising when any probability drifts beyond the tolerance.
+        """
+        expected = model.predict_proba(X)
+        actual   = self.predict_proba(X)
+
+        drift = float(np.abs(expected - actual).max())
+        if drift > tolerance:
+            raise ValueError(
+                f"Compiled booster drifts {drift:.2e} from XGBoost, tolerance is {tolerance:.0e}"
+            )
+
+        return drift
+
+
+def _tree_depth(left, right):
+    """
+    This finds the depth of a single tree from its child tables.
+    """
+    depth = 0
+    level = [0]
+
+    while level:
+        level = [
+            child
+            for node in level
+            for child in (left[node], right[node])
+            if child != -1
+        ]
+        if level:
+            depth += 1
+
+    return depth
+
+
+def probe_rows(medians, count=256, seed=0):
+    """
+    This builds a deterministic set of feature rows spread around the training
+    medians, with some values missing, for checking engine equivalence.
+    """
+    rng = np.random.default_rng(seed)
+    medians = np.asarray(medians, dtype=np.float32)
+
+    X = medians * rng.uniform(0.25, 2.0, size=(count, medians.size)).astype(np.float32)
+    X[rng.random(X.shape) < 0.1] = np.nan
+
+    return X
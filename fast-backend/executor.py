@@ -0,0 +1,99 @@
+import asyncio
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+# Calls allowed to run or wait per worker when no queue limit is given. Queued
+# calls are cheap, so the default only sheds load once the backlog would take
+# seconds to clear, with a floor so single-CPU hosts absorb short bursts.
+QUEUE_PER_WORKER = 16
+MIN_QUEUE = 64
+
+
+class ExecutorSaturated(Exception):
+    """
+    This is raised when the inference executor already holds as many calls as
+    its queue allows.
+    """
+
+
+class InferenceExecutor:
+    """
+    This runs CPU-bound model inference off the asyncio event loop.
+
+    A thread pool is used by default, as XGBoost and NumPy release the GIL while
+    predicting. A process pool may be used instead, where every worker runs the
+    initializer once to preload the model. Calls beyond the queue limit are
+    rejected rather than queued, so the server sheds load instead of stalling.
+    """
+
+    def __init__(self, kind="thread", workers=None, max_pending=None, initializer=None, initargs=()):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or max(self.workers * QUEUE_PER_WORKER, MIN_QUEUE)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.pending = 0
+        self._pool = None
+
+    def _create_pool(self):
+        if self.kind == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer,
+                initargs=self.initargs,
+            )
+
+        return ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="inference",
+            initializer=self.initializer,
+            initargs=self.initargs,
+        )
+
+    async def run(self, fn, *args):
+        """
+        This awaits fn(*args) on the pool, raising ExecutorSaturated when the
+        queue is full. Callables and arguments must be picklable for processes.
+        """
+        if self.pending >= self.max_pending:
+            raise ExecutorSaturated(
+                f"Inference queue is full ({self.max_pending} pending), try again shortly"
+            )
+
+        # The pool is created lazily, so importing this module in a worker
+        # process never spawns a pool of its own.
+        if self._pool is None:
+            self._pool = self._create_pool()
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def restart(self, *initargs):
+        """
+        This replaces the process pool with fresh workers initialised with the
+        given arguments, such as after a model reload. Calls already running finish
+        on the old workers. Threads share the parent's state, so a thread pool
+        is kept as it is.
+        """
+        self.initargs = initargs
+        if self.kind != "process" or self._pool is None:
+            return
+
+        previous, self._pool = self._pool, self._create_pool()
+        previous.shutdown(wait=False)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
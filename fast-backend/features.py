@@ -0,0 +1,124 @@
+import numpy as np
+
+
+def _lab(name):
+    """
+    This returns a getter for an optional lab value, which is missing (NaN) when
+    it is not provided.
+    """
+    def getter(data):
+        value = getattr(data, name)
+        return value if value else np.nan
+
+    return getter
+
+
+def _pulse_pressure(data):
+    return data.systolic_bp - data.diastolic_bp
+
+
+def _map(data):
+    return data.diastolic_bp + (_pulse_pressure(data) / 3)
+
+
+def _chol_ratio(data):
+    if data.total_cholesterol and data.hdl_cholesterol:
+        return data.total_cholesterol / data.hdl_cholesterol
+    return np.nan
+
+
+# Every feature the model may be trained on, mapped to how it is read from the
+# user's data. Lab values are optional and left missing for the imputer.
+FEATURE_GETTERS = {
+    "age":               lambda data: data.age,
+    "gender":            lambda data: data.gender,
+    "smoking_status":    lambda data: data.smoking_status,
+    "bmi":               lambda data: data.bmi,
+    "systolic_bp":       lambda data: data.systolic_bp,
+    "diastolic_bp":      lambda data: data.diastolic_bp,
+    "heart_rate":        lambda data: data.heart_rate,
+    "pulse_pressure":    _pulse_pressure,
+    "map":               _map,
+    "total_cholesterol": _lab("total_cholesterol"),
+    "hdl_cholesterol":   _lab("hdl_cholesterol"),
+    "fasting_glucose":   _lab("fasting_glucose"),
+    "creatinine":        _lab("creatinine"),
+    "chol_ratio":        _chol_ratio,
+    "avg_sleep_hours":   lambda data: data.avg_sleep_hours,
+    "stress_level":      lambda data: data.stress_level,
+    "spo2":              lambda data: data.spo2,
+    "breathing_rate":    lambda data: data.breathing_rate,
+    "hrv":               lambda data: data.hrv,
+}
+
+
+def derived_values(data):
+    """
+    This computes the derived values that are reported back to the user alongside
+    the prediction.
+    """
+    pulse_pressure = _pulse_pressure(data)
+    chol_ratio     = _chol_ratio(data)
+
+    return {
+        "pulse_pressure": round(pulse_pressure, 1),
+        "map":            round(_map(data), 1),
+        "chol_ratio":     round(chol_ratio, 2) if not np.isnan(chol_ratio) else None
+    }
+
+
+class FeatureAssembler:
+    """
+    This writes user data straight into float32 feature rows, ordered by the
+    feature schema, and imputes missing values with the imputer's medians.
+
+    The getters are resolved once up front, so assembling a row is a single pass
+    over the schema with no DataFrame construction or column selection.
+    """
+
+    def __init__(self, features, imputer):
+        names = getattr(imputer, "feature_names_in_", None)
+        if names is not None and list(names) != list(features):
+            raise ValueError("Imputer features do not match the feature schema")
+
+        unknown = [name for name in features if name not in FEATURE_GETTERS]
+        if unknown:
+            raise ValueError(f"No getter for features: {', '.join(unknown)}")
+
+        self.features = list(features)
+        self.medians  = np.asarray(imputer.statistics_, dtype=np.float32)
+        self._getters = [FEATURE_GETTERS[name] for name in self.features]
+
+    def assemble(self, data, out=None):
+        """
+        This fills a single raw feature row, leaving missing values as NaN.
+        """
+        if out is None:
+            out = np.empty(len(self._getters), dtype=np.float32)
+
+        for i, getter in enumerate(self._getters):
+            out[i] = getter(data)
+
+        return out
+
+    def impute(self, X):
+        """
+        This replaces missing values in a row or matrix with the training medians.
+        """
+        return np.where(np.isnan(X), self.medians, X)
+
+    def transform(self, data):
+        """
+        This assembles and imputes a single row, ready for the booster.
+        """
+        return self.impute(self.assemble(data))
+
+    def transform_many(self, records):
+        """
+        This assembles and imputes many rows into one preallocated matrix.
+        """
+        X = np.empty((len(records), len(self._getters)), dtype=np.float32)
+        for i, data in enumerate(records):
+            self.assemble(data, out=X[i])
+
+        return self.impute(X)
@@ -0,0 +1,117 @@
+import hashlib
+import io
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+class UploadTooLarge(Exception):
+    """
+    This is raised when an upload exceeds the allowed size.
+    """
+
+
+class InvalidImage(Exception):
+    """
+    This is raised when an upload cannot be decoded as an image.
+    """
+
+
+def too_large_message(max_bytes):
+    return f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit"
+
+
+class UploadLimitMiddleware:
+    """
+    This ASGI middleware rejects request bodies larger than max_bytes on the given
+    paths with a 413, before the endpoint parses the form. Starlette spools the
+    whole multipart body before the endpoint runs, so this is the only place an
+    oversized upload can be stopped early. A Content-Length over the limit is
+    rejected without reading any of the body, and a body sent without one is
+    counted as it arrives and cut off once it passes the limit.
+    """
+
+    def __init__(self, app, paths, max_bytes):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": too_large_message(self.max_bytes)}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI passes HTTPExceptions raised while reading the body
+                    # through, rather than reporting a parsing error
+                    raise HTTPException(status_code=413, detail=too_large_message(self.max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def read_upload(file, max_bytes, chunk_size=64 * 1024):
+    """
+    This reads an already received upload in fixed-size chunks, hashing it as it
+    goes, and raises UploadTooLarge once it grows past max_bytes. The request
+    body as a whole is bounded earlier by UploadLimitMiddleware.
+    Returns the raw bytes and their SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+
+    while chunk := await file.read(chunk_size):
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(too_large_message(max_bytes))
+
+        digest.update(chunk)
+        chunks.append(chunk)
+
+    return b"".join(chunks), digest.hexdigest()
+
+
+def downscale(contents, max_dimension=1024, quality=85):
+    """
+    This bounds an image to max_dimension pixels on its longest side and
+    re-encodes it as JPEG. Images that are already small JPEGs are passed through
+    untouched, as re-encoding them would only lose quality.
+    Returns the image bytes and their mime type.
+    """
+    try:
+        image = Image.open(io.BytesIO(contents))
+        image.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise InvalidImage("Uploaded file is not a valid image") from e
+    except Image.DecompressionBombError as e:
+        # Pillow refuses images with far more pixels than any photo, which would
+        # otherwise take gigabytes to decode
+        raise InvalidImage("Uploaded image is too large to decode") from e
+
+    if image.format == "JPEG" and max(image.size) <= max_dimension:
+        return contents, "image/jpeg"
+
+    # Camera photos often store their rotation in EXIF, which is lost on re-encode
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue(), "image/jpeg"
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import time
+
+from types import SimpleNamespace
+
+from metrics import Counter, Histogram
+
+
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds",
+    "Time for a complete LLM response, by call type",
+    labelnames=("call",)
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from starting a streamed LLM call to its first chunk of text"
+)
+LLM_ERRORS = Counter(
+    "llm_errors",
+    "Failed LLM calls, by call type and kind of failure",
+    labelnames=("call", "kind")
+)
+
+
+class LLMClient:
+    """
+    This wraps the Gemini model with non-blocking calls.
+
+    Every call goes through the async generation API, so a slow response only
+    suspends its own request instead of freezing the worker. Whole responses are
+    bounded by a timeout, and streams are bounded per chunk. Cancelling the
+    awaiting task, such as when an SSE client disconnects, also closes the
+    upstream stream.
+    """
+
+    def __init__(self, model, timeout=60.0, chunk_timeout=30.0):
+        self.model = model
+        self.timeout = timeout
+        self.chunk_timeout = chunk_timeout
+
+    async def generate(self, contents):
+        """
+        This generates a complete response, raising TimeoutError when it takes
+        longer than the timeout.
+        """
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.timeout):
+                response = await self.model.generate_content_async(contents)
+            text = response.text
+        except TimeoutError:
+            LLM_ERRORS.labels("generate", "timeout").inc()
+            raise
+        except Exception:
+            LLM_ERRORS.labels("generate", "error").inc()
+            raise
+
+        LLM_LATENCY.labels("generate").observe(time.perf_counter() - start)
+        return text
+
+    async def stream(self, contents):
+        """
+        This yields response text chunk by chunk, raising TimeoutError when the
+        next chunk takes longer than the chunk timeout.
+        """
+        start = time.perf_counter()
+        first = True
+        chunks = None
+        try:
+            async with asyncio.timeout(self.chunk_timeout):
+                response = await self.model.generate_content_async(contents, stream=True)
+
+            chunks = aiter(response)
+            while True:
+                try:
+                    async with asyncio.timeout(self.chunk_timeout):
+                        chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    LLM_LATENCY.labels("stream").observe(time.perf_counter() - start)
+                    return
+
+                if chunk.text:
+                    if first:
+                        LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start)
+                        first = False
+                    yield chunk.text
+        except TimeoutError:
+            LLM_ERRORS.labels("stream", "timeout").inc()
+            raise
+        except Exception:
+            LLM_ERRORS.labels("stream", "error").inc()
+            raise
+        finally:
+            close = getattr(chunks, "aclose", None)
+            if close is not None:
+                await close()
+
+
+class FakeModel:
+    """
+    This is a deterministic, local stand-in for the Gemini model, used for local
+    development, tests and benchmarks. Responses depend only on the prompt, and
+    an optional delay simulates upstream latency.
+    """
+
+    def __init__(self, delay=0.0, chunks=4):
+        self.delay = delay
+        self.chunks = chunks
+
+    def _text(self, contents):
+        digest = hashlib.sha256(repr(contents).encode("utf-8")).hexdigest()[:12]
+        return f"This is a generated response ({digest}). Please consult a physician if symptoms worsen."
+
+    async def generate_content_async(self, contents, stream=False):
+        await asyncio.sleep(self.delay)
+        text = self._text(contents)
+
+        if stream:
+            return self._stream(text)
+        return SimpleNamespace(text=text)
+
+    async def _stream(self, text):
+        size = -(-len(text) // self.chunks)
+        for i in range(0, len(text), size):
+            await asyncio.sleep(self.delay / self.chunks)
+            yield SimpleNamespace(text=text[i:i + size])
@@ -1,56 +1,149 @@
-import base64
 import asyncio
+import hashlib
+import hmac
 import os
 import datetime
 import time
-import json
-import joblib
-import xgboost as xgb
 import numpy as np
-import pandas as pd
 import datetime as dt
 import google.generativeai as genai
+import metrics
 
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
-from pydantic.v1 import validator
+from executor import InferenceExecutor, ExecutorSaturated
+from batcher import MicroBatcher
+from llm import LLMClient, FakeModel
+from cache import ResponseCache, PredictionCache, MISSING, create_backend, deep_sizeof
+from images import read_upload, downscale, UploadTooLarge, InvalidImage, UploadLimitMiddleware
+from sessions import SessionStore
+from readings import ReadingStore, SIGNALS
+from scoring import (
+    MODEL_DIRECTORY, INFERENCE_SECONDS, model_registry, check_blood_pressure, UserData, PredictionResult,
+    VitalsPrediction, ExplainedPrediction, complete_prediction, run_inference, run_batch_inference,
+    run_batch_explanations, warm_up_worker
+)
 from fastapi import FastAPI
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Header
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Union
+from contextlib import asynccontextmanager
 from datetime import date
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="Team LightX API", description="Swagger Open API Specification")
-
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-llm = genai.GenerativeModel('gemini-3-flash-preview')
-
-vitals_model = xgb.XGBClassifier()
-
-MODEL_DIRECTORY="./models/vitals"
-vitals_model.load_model(f"{MODEL_DIRECTORY}/hypertension_model.json")
-vitals_imputer = joblib.load(f"{MODEL_DIRECTORY}/imputer.pkl")
-vitals_schema = json.load(open(f"{MODEL_DIRECTORY}/feature_schema.json"))
-
-FEATURES = vitals_schema["features"]
-
-STAGE_ADVICE = {
-    0: "Blood pressure is healthy. You may maintain your current lifestyle. Be sure to check-in annually.",
-    1: "Slightly elevated. Reduce sodium, increase and gradually increase exercise. Recheck in 3-6 months.",
-    2: "Stage 1 Hypertension, we recommend consulting a physician. Lifestyle changes required at this stage.",
-    3: "Stage 2 Hypertension, we recommend seeking medical attention promptly. Medication is likely needed."
-}
-
-STAGE_NAMES = {
-    0: "Normal",
-    1: "Elevated",
-    2: "Stage 1 HTN",
-    3: "Stage 2 HTN"
-}
-
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(model_registry.load)
+    
+    watcher = None
+    if MODEL_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(
+            model_registry.watch(MODEL_WATCH_INTERVAL, on_reload=restart_inference_workers)
+        )
+        
+    yield
+    
+    if watcher is not None:
+        watcher.cancel()
+    inference_executor.shutdown()
+    explanation_executor.shutdown()
+
+
+app = FastAPI(
+    title="Team LightX API",
+    description="Swagger Open API Specification",
+    lifespan=lifespan
+)
+
+# LLM calls are made through the async client so they never block the event loop.
+# LLM_BACKEND=fake swaps Gemini for a deterministic local stand-in.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CHUNK_TIMEOUT = float(os.getenv("LLM_CHUNK_TIMEOUT", "30"))
+
+if os.getenv("LLM_BACKEND", "gemini") == "fake":
+    llm_model = FakeModel(delay=float(os.getenv("LLM_FAKE_DELAY", "0")))
+else:
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    llm_model = genai.GenerativeModel('gemini-3-flash-preview')
+
+llm = LLMClient(llm_model, timeout=LLM_TIMEOUT, chunk_timeout=LLM_CHUNK_TIMEOUT)
+
+# Suggestions only depend on the set of active symptoms, so they are cached by it.
+# SUGGEST_CACHE_BACKEND may be "memory" (default) or "disk", which is shared by
+# every worker on the host.
+suggest_cache = ResponseCache(
+    "suggest",
+    create_backend(
+        os.getenv("SUGGEST_CACHE_BACKEND", "memory"),
+        max_entries=int(os.getenv("SUGGEST_CACHE_SIZE", "64")),
+        path=os.getenv("SUGGEST_CACHE_PATH", "./cache/suggest.sqlite3")
+    ),
+    ttl=float(os.getenv("SUGGEST_CACHE_TTL", "3600"))
+)
+
+# Chat sessions keep prior turns server-side. Once a session's history grows
+# past its token budget, older turns are summarised into a running context.
+chat_sessions = SessionStore(
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", "1000")),
+    ttl=float(os.getenv("CHAT_SESSION_TTL", "1800")),
+    token_budget=int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500")),
+    keep_turns=int(os.getenv("CHAT_KEEP_TURNS", "4"))
+)
+
+# Facial uploads are size-limited and downscaled before they are sent to the LLM,
+# and analyses are cached by the hash of the raw upload.
+FACIAL_MAX_UPLOAD_BYTES = int(os.getenv("FACIAL_MAX_UPLOAD_MB", "10")) * 1024 * 1024
+FACIAL_MAX_DIMENSION = int(os.getenv("FACIAL_MAX_DIMENSION", "1024"))
+FACIAL_JPEG_QUALITY = int(os.getenv("FACIAL_JPEG_QUALITY", "85"))
+
+# The whole request body is bounded before the form is parsed, with some room for
+# the multipart headers around the file.
+app.add_middleware(
+    UploadLimitMiddleware,
+    paths={"/analyse-facial"},
+    max_bytes=FACIAL_MAX_UPLOAD_BYTES + 64 * 1024
+)
+
+# Per-endpoint metrics are only collected when METRICS_ENABLED is on (default).
+# Added last, so they wrap the other middleware and count the requests it rejects.
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, routes=app.router.routes)
+
+facial_cache = ResponseCache(
+    "facial",
+    create_backend(
+        os.getenv("FACIAL_CACHE_BACKEND", "memory"),
+        max_entries=int(os.getenv("FACIAL_CACHE_SIZE", "256")),
+        path=os.getenv("FACIAL_CACHE_PATH", "./cache/facial.sqlite3")
+    ),
+    ttl=float(os.getenv("FACIAL_CACHE_TTL", "86400"))
+)
+
+# A new model bundle can be deployed by copying it under MODEL_ROOT and calling
+# the admin reload endpoint, or by overwriting MODEL_DIRECTORY when
+# MODEL_WATCH_INTERVAL (seconds) is set.
+MODEL_ROOT = os.getenv("MODEL_ROOT", "./models")
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+
+# The admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# This caps how many records a single batch request may score
+MAX_BATCH_SIZE = int(os.getenv("VITALS_MAX_BATCH_SIZE", "1000"))
+
+# Raw watch readings are kept per user in fixed-size rolling windows, so vitals
+# can be scored from their averages without the app re-sending its history.
+# Memory is bounded by READINGS_MAX_USERS windows of READINGS_WINDOW readings.
+READINGS_MAX_BATCH = int(os.getenv("READINGS_MAX_BATCH", "5000"))
+
+reading_store = ReadingStore(
+    max_users=int(os.getenv("READINGS_MAX_USERS", "10000")),
+    window=int(os.getenv("READINGS_WINDOW", "256")),
+    ttl=float(os.getenv("READINGS_TTL", str(7 * 86400)))
+)
 
 class SymptomsData(BaseModel):
     anxiety: bool = False
@@ -60,51 +153,53 @@ class SymptomsData(BaseModel):
     shortness_of_breath: bool = False
 
 
-class UserData(BaseModel):
-    # These values are gotten from onboarding
-    age:            int     = Field(..., ge=1,   le=120, description="Age in years")
-    gender:         int     = Field(..., ge=0,   le=1,   description="0=Male, 1=Female")
-    smoking_status: int     = Field(..., ge=0,   le=2,   description="0=Never, 1=Former, 2=Current")
-    bmi:            float   = Field(..., gt=0,   lt=100, description="Body Mass Index")
-    avg_sleep_hours:float   = Field(..., ge=0,   le=24,  description="Average sleep hours per night")
-    stress_level:   int     = Field(..., ge=1,   le=10,  description="Self-reported stress level 1-10")
-    diabetic:       int     = Field(..., ge=0,   le=1,  description="Self-reported diabetic status level 0-1")
-
-    # These values are gotten from the smart watch
-    systolic_bp:    float   = Field(..., gt=0,   description="Average systolic BP (mmHg)")
-    diastolic_bp:   float   = Field(..., gt=0,   description="Average diastolic BP (mmHg)") 
-    heart_rate:     float   = Field(..., gt=0,   description="Resting heart rate (BPM)")
-    spo2:           float   = Field(..., ge=50,  le=100, description="Blood oxygen saturation (%)")
-    breathing_rate: float   = Field(..., gt=0,   description="Breathing rate (breaths/min)") 
-    hrv:            float   = Field(..., gt=0,   description="Heart rate variability (ms)")
-
-    # These values are optional to include, default values provided
-    total_cholesterol: float = Field(180.0, gt=0, description="Total cholesterol (mg/dL)")
-    hdl_cholesterol:   float = Field(50.0,  gt=0, description="HDL cholesterol (mg/dL)")
-    fasting_glucose:   float = Field(90.0,  gt=0, description="Fasting blood glucose (mg/dL)")
-    creatinine:        float = Field(1.0,   gt=0, description="Serum creatinine (mg/dL)")
-
-    @validator('systolic_bp')
-    def systolic_must_exceed_diastolic(cls, v, values):
-        if 'diastolic_bp' in values and v <= values['diastolic_bp']:
-            raise ValueError("systolic_bp must be greater than diastolic_bp")
-        return v
-
-
-class PredictionResult(BaseModel):
-    stage:          int
-    stage_name:     str
-    confidence:     float
-    probabilities:  dict
-    advice:         str
-    derived:        dict
+class WatchReading(BaseModel):
+    systolic_bp:    Optional[float] = Field(None, gt=0)
+    diastolic_bp:   Optional[float] = Field(None, gt=0)
+    heart_rate:     Optional[float] = Field(None, gt=0)
+    spo2:           Optional[float] = Field(None, ge=50, le=100)
+    breathing_rate: Optional[float] = Field(None, gt=0)
+    hrv:            Optional[float] = Field(None, gt=0)
+
+
+class ReadingsUpload(BaseModel):
+    user_id:  str = Field(..., min_length=1, max_length=128)
+    # Readings are in the order they were taken, oldest first
+    readings: List[WatchReading]
+
+
+# Endpoints returning these are serialised straight to JSON bytes by pydantic-core,
+# instead of being walked by jsonable_encoder and then json.dumps.
+class VitalsResponse(BaseModel):
+    data:       Union[ExplainedPrediction, VitalsPrediction]
+    message:    str
+    timestamp:  dt.datetime
+
+
+class VitalsBatchResponse(BaseModel):
+    data:       List[Union[ExplainedPrediction, VitalsPrediction]]
+    message:    str
+    timestamp:  dt.datetime
     
 
+class ReloadRequest(BaseModel):
+    directory: Optional[str] = Field(None, description="Model bundle directory under MODEL_ROOT, defaults to the live one")
+
+
 class ChatRequest(BaseModel):
     message: str
     context: Optional[str] = "No previous context found."
+    # Prior turns are kept on the server. The first message of a conversation is
+    # sent without a session id, and the X-Session-Id response header gives the
+    # id to send with every later message, so the context is only sent once.
+    session_id: Optional[str] = Field(None, max_length=128)
     
     
+EXPLANATIONS_SKIPPED = metrics.Counter(
+    "vitals_explanations_skipped",
+    "Requested explanations left out of responses, by reason (over_budget, saturated or failed)",
+    labelnames=("reason",)
+)
 def calculate_bmi(weight: float, height_cm: float):
     """
     This helper function calculates the Body-Mass Index.
@@ -113,72 +208,222 @@ def calculate_bmi(weight: float, height_cm: float):
     return round(weight / (height_m * height_m), 1)
 
 
-def calculate_framingham_score(data: UserData):
+def fill_from_readings(data: UserData):
     """
-    This helper function calculates framingham risk score based on onboarding and
-    smart watch data.
+    This helper function fills in watch values left out of a request with the
+    averages of the readings recorded for the user.
     """
-    age_factor = (data.age - 20) / 10
-    chol_factor = (data.total_cholesterol - 160) / 40
+    missing = [name for name in SIGNALS if getattr(data, name) is None]
+    if not missing:
+        return data
     
-    hdl = data.hdl_cholesterol
-    hdl_factor = (hdl - (40 if data.gender == 0 else 50)) / 10
+    if data.user_id is None:
+        raise HTTPException(status_code=422, detail=f"Missing {', '.join(missing)}, send them or a user_id with recorded readings")
     
-    sbp_factor = (data.systolic_bp - 120) / 10
-    smoker_factor = 0 if data.smoking_status == 0 else 1
-    diabetic_factor = data.diabetic
+    window = reading_store.get(data.user_id)
+    if window is None:
+        raise HTTPException(status_code=404, detail="No readings recorded for this user")
     
-    return age_factor + chol_factor + hdl_factor + sbp_factor + smoker_factor + diabetic_factor
+    means = window.means()
+    unrecorded = [name for name in missing if means[name] is None]
+    if unrecorded:
+        raise HTTPException(status_code=422, detail=f"No readings recorded for {', '.join(unrecorded)}")
+    
+    filled = data.model_copy(update={name: round(means[name], 1) for name in missing})
+    try:
+        check_blood_pressure(filled.systolic_bp, filled.diastolic_bp)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{e}, but the recorded readings give {filled.systolic_bp}/{filled.diastolic_bp}"
+        )
+    return filled
 
 
-def run_inference(data: UserData):
-    pulse_pressure = data.systolic_bp - data.diastolic_bp
-    map_value      = data.diastolic_bp + (pulse_pressure / 3)
-    chol_ratio     = (
-        data.total_cholesterol / data.hdl_cholesterol
-        if data.total_cholesterol and data.hdl_cholesterol
-        else np.nan
-    )
-    row = {
-        "age":               data.age,
-        "gender":            data.gender,
-        "smoking_status":    data.smoking_status,
-        "bmi":               data.bmi,
-        "systolic_bp":       data.systolic_bp,
-        "diastolic_bp":      data.diastolic_bp,
-        "heart_rate":        data.heart_rate,
-        "pulse_pressure":    pulse_pressure,
-        "map":               map_value,
-        "total_cholesterol": data.total_cholesterol if data.total_cholesterol else np.nan,
-        "hdl_cholesterol":   data.hdl_cholesterol   if data.hdl_cholesterol   else np.nan,
-        "fasting_glucose":   data.fasting_glucose   if data.fasting_glucose   else np.nan,
-        "creatinine":        data.creatinine         if data.creatinine        else np.nan,
-        "chol_ratio":        chol_ratio,
-        "avg_sleep_hours":   data.avg_sleep_hours,
-        "stress_level":      data.stress_level,
-        "spo2":              data.spo2,
-        "breathing_rate":    data.breathing_rate,
-        "hrv":               data.hrv,
-    }
+def restart_inference_workers(bundle):
+    """
+    This points inference workers at a newly loaded bundle. Process workers keep
+    their own copy of the model, so they are replaced with fresh ones.
+    """
+    inference_executor.restart(bundle.directory)
+    explanation_executor.restart(bundle.directory)
+    # Entries are keyed by model version, so old ones can never be served, but
+    # they would otherwise hold memory until evicted.
+    prediction_cache.clear()
+    explanation_cache.clear()
+
+
+def prediction_key(data: UserData):
+    """
+    This helper function builds the prediction cache key for a user: the model
+    version, and a hash of their quantized feature row.
+    """
+    bundle = model_registry.get()
+    row = bundle.assembler.assemble(data)
+    if PREDICTION_CACHE_QUANTUM > 0:
+        row = np.round(row / PREDICTION_CACHE_QUANTUM)
     
-    X = pd.DataFrame([row])[FEATURES]
-    X_imp = vitals_imputer.transform(X)
+    return bundle.version, hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+
+
+def cache_prediction(key, result: PredictionResult):
+    """
+    This helper function caches the model's output for a prediction, unless the
+    model was swapped while it was being scored.
+    """
+    if key is not None and key[0] == result.model_version:
+        prediction_cache.set(key, result, deep_sizeof(result))
+
+
+# Model inference is awaited through this executor so it never blocks the
+# event loop. VITALS_EXECUTOR may be "thread" (default) or "process", and
+# VITALS_EXECUTOR_QUEUE caps the calls running or waiting, beyond which
+# requests get a 503 (0 keeps the executor's default).
+inference_executor = InferenceExecutor(
+    kind=os.getenv("VITALS_EXECUTOR", "thread"),
+    workers=int(os.getenv("VITALS_EXECUTOR_WORKERS", "0")) or None,
+    max_pending=int(os.getenv("VITALS_EXECUTOR_QUEUE", "0")) or None,
+    initializer=warm_up_worker,
+    initargs=(MODEL_DIRECTORY,)
+)
+
+
+async def run_inference_call(fn, *args):
+    """
+    This awaits an inference function on the executor, timing the whole call
+    from the event loop, queueing included, as the executor phase. Worker
+    processes record the imputer and booster phases in their own metrics, which
+    are never exported, so with the process executor this is the only inference
+    timing /metrics reports.
+    """
+    start = time.perf_counter()
+    try:
+        return await inference_executor.run(fn, *args)
+    finally:
+        INFERENCE_SECONDS.labels("executor").observe(time.perf_counter() - start)
+
+
+# Vitals predictions are cached by a hash of the feature row and the model
+# version, so repeated scans skip the booster. Features are rounded to multiples
+# of PREDICTION_CACHE_QUANTUM first, so near-identical rows share an entry; the
+# default of 0 only shares rows identical at the model's float32 precision.
+PREDICTION_CACHE_QUANTUM = float(os.getenv("PREDICTION_CACHE_QUANTUM", "0"))
+
+prediction_cache = PredictionCache(
+    "predictions",
+    max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "4096")),
+    max_bytes=int(float(os.getenv("PREDICTION_CACHE_MAX_MB", "16")) * 1024 * 1024)
+)
+
+# Concurrent /analyse-vitals requests can be scored together in micro-batches.
+# A window of 0 ms disables batching and scores each request on its own.
+VITALS_BATCH_WINDOW_MS = float(os.getenv("VITALS_BATCH_WINDOW_MS", "0"))
+VITALS_BATCH_MAX_SIZE = int(os.getenv("VITALS_BATCH_MAX_SIZE", "64"))
+
+vitals_batcher = MicroBatcher(
+    run_batch_inference,
+    run=run_inference_call,
+    max_size=VITALS_BATCH_MAX_SIZE,
+    max_wait=VITALS_BATCH_WINDOW_MS / 1000
+)
+
+# Explanations are opt-in with ?explain=true. They run alongside the prediction,
+# batched across concurrent requests and cached like predictions. The response
+# waits at most EXPLAIN_BUDGET_MS past the prediction for its explanation, and
+# leaves it null beyond that, while it finishes in the background for next time.
+EXPLAIN_BUDGET_MS = float(os.getenv("EXPLAIN_BUDGET_MS", "25"))
+
+# Explanations have an executor and queue limit of their own, so explanations
+# still running past their budget never take queue slots from predictions. When
+# it is full, explanations are left out rather than the request being rejected.
+EXPLAIN_EXECUTOR_WORKERS = int(os.getenv("EXPLAIN_EXECUTOR_WORKERS", "1"))
+
+explanation_executor = InferenceExecutor(
+    kind=os.getenv("VITALS_EXECUTOR", "thread"),
+    workers=EXPLAIN_EXECUTOR_WORKERS,
+    max_pending=int(os.getenv("EXPLAIN_EXECUTOR_QUEUE", "0")) or EXPLAIN_EXECUTOR_WORKERS * 4,
+    initializer=warm_up_worker,
+    initargs=(MODEL_DIRECTORY,)
+)
+
+explanation_cache = PredictionCache(
+    "explanations",
+    max_entries=int(os.getenv("EXPLAIN_CACHE_SIZE", "4096")),
+    max_bytes=int(float(os.getenv("EXPLAIN_CACHE_MAX_MB", "16")) * 1024 * 1024)
+)
+
+explain_batcher = MicroBatcher(
+    run_batch_explanations,
+    run=explanation_executor.run,
+    max_size=VITALS_BATCH_MAX_SIZE,
+    max_wait=float(os.getenv("EXPLAIN_BATCH_WINDOW_MS", "2")) / 1000,
+    name="explanations"
+)
+
+
+async def explain_user(data: UserData, key):
+    """
+    This returns the explanation for a user's prediction, from the cache or else
+    from a micro-batch.
+    """
+    explanation = explanation_cache.get(key) if explanation_cache.enabled else MISSING
+    if explanation is MISSING:
+        explanation = await explain_batcher.submit(data)
+        explanation_cache.set(key, explanation, deep_sizeof(explanation))
+    return explanation
+
+
+async def explain_records(records: List[UserData], keys: list):
+    """
+    This returns the explanations for many users, explaining those missing from
+    the cache in a single call. When the explanation executor is full, those
+    missing are left as None.
+    """
+    explanations = [explanation_cache.get(key) if explanation_cache.enabled else MISSING for key in keys]
     
-    stage = int(vitals_model.predict(X_imp)[0])
-    probs = vitals_model.predict_proba(X_imp)[0].tolist()
+    misses = [i for i, explanation in enumerate(explanations) if explanation is MISSING]
+    try:
+        results = await explanation_executor.run(run_batch_explanations, [records[i] for i in misses]) if misses else []
+    except ExecutorSaturated:
+        EXPLANATIONS_SKIPPED.labels("saturated").inc(len(misses))
+        return [None if explanation is MISSING else explanation for explanation in explanations]
+    for i, explanation in zip(misses, results):
+        explanation_cache.set(keys[i], explanation, deep_sizeof(explanation))
+        explanations[i] = explanation
+        
+    return explanations
+
+
+async def within_budget(explanation: asyncio.Future):
+    """
+    This waits up to EXPLAIN_BUDGET_MS for an explanation, returning None if it
+    takes longer or fails, so it never holds a response up past the budget.
+    """
+    try:
+        return await asyncio.wait_for(asyncio.shield(explanation), EXPLAIN_BUDGET_MS / 1000)
+    except TimeoutError:
+        EXPLANATIONS_SKIPPED.labels("over_budget").inc()
+    except ExecutorSaturated:
+        EXPLANATIONS_SKIPPED.labels("saturated").inc()
+    except Exception:
+        EXPLANATIONS_SKIPPED.labels("failed").inc()
+    return None
+
+
+async def score_records(records: List[UserData], keys: list):
+    """
+    This returns the predictions for many users. Cached records are answered
+    straight away, and only the rest are scored, in a single call.
+    """
+    results = [prediction_cache.get(key) if prediction_cache.enabled else MISSING for key in keys]
     
-    return PredictionResult(
-        stage = stage,
-        stage_name = STAGE_NAMES[stage],
-        confidence = round(max(probs) * 100, 1),
-        probabilities = {STAGE_NAMES[i]: round(p * 100, 1) for i, p in enumerate(probs)},
-        advice = STAGE_ADVICE[stage],
-        derived = {
-            "pulse_pressure": round(pulse_pressure, 1),
-            "map":            round(map_value, 1),
-            "chol_ratio":     round(chol_ratio, 2) if not np.isnan(chol_ratio) else None
-        }
-    )
+    misses = [i for i, result in enumerate(results) if result is MISSING]
+    scored = await run_inference_call(run_batch_inference, [records[i] for i in misses]) if misses else []
+    for i, result in zip(misses, scored):
+        cache_prediction(keys[i], result)
+        results[i] = result
+        
+    return [complete_prediction(result, data) for result, data in zip(results, records)]
 
 
 @app.get("/", tags=["Health"])
@@ -193,37 +438,186 @@ async def base():
     }
 
 
-@app.post("/analyse-vitals", tags=["Health"])
-async def analyse_vitals(data: UserData):
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def get_metrics():
     """
-    This endpoint runs inference on the Machine Learning model using smartwatch and
-    onboarding data.
+    This endpoint exposes service metrics in the Prometheus text format.
     """
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+        
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/admin/reload-model", tags=["Admin"])
+async def reload_model(req: Optional[ReloadRequest] = None, x_admin_token: Optional[str] = Header(None)):
+    """
+    This endpoint loads a model bundle, warms it up and swaps it in without
+    dropping in-flight requests. The live bundle keeps serving if loading fails.
+    """
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin access denied")
+        
+    directory = None
+    if req and req.directory:
+        root = os.path.realpath(MODEL_ROOT)
+        directory = os.path.realpath(os.path.join(root, req.directory))
+        if os.path.commonpath([root, directory]) != root or not os.path.isdir(directory):
+            raise HTTPException(status_code=400, detail="Model directory must exist under the model root")
+            
     try:
-        result = run_inference(data)
-        framingham_score = calculate_framingham_score(data)
+        bundle, previous = await asyncio.to_thread(model_registry.reload, directory)
+        restart_inference_workers(bundle)
+        
         return {
             "data": {
-                **result.dict(),
-                "risk_score": framingham_score,
+                "model_version": bundle.version,
+                "previous_version": previous.version if previous else None,
+                "load_ms": {name: round(seconds * 1000, 1) for name, seconds in bundle.timings.items()},
             },
-            "message": "Prediction complete",
+            "message": "Model reloaded",
             "timestamp": dt.datetime.now()
         }
         
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed, keeping the live model: {str(e)}")
+
+
+@app.post("/analyse-vitals", tags=["Health"], response_model=VitalsResponse)
+async def analyse_vitals(data: UserData, explain: bool = False):
+    """
+    This endpoint runs inference on the Machine Learning model using smartwatch and
+    onboarding data. Watch values that are left out are taken from the user's
+    recorded readings. With explain, the features that contributed most to the
+    predicted stage are included.
+    """
+    data = fill_from_readings(data)
+    
+    try:
+        key = prediction_key(data) if prediction_cache.enabled or explain else None
+        
+        explanation = None
+        if explain:
+            explanation = asyncio.ensure_future(explain_user(data, key))
+            # Failures are still retrieved when the response has gone without it
+            explanation.add_done_callback(lambda t: t.cancelled() or t.exception())
+            
+        result = prediction_cache.get(key) if prediction_cache.enabled else MISSING
+        if result is MISSING:
+            if VITALS_BATCH_WINDOW_MS > 0:
+                result = await vitals_batcher.submit(data)
+            else:
+                result = await run_inference_call(run_inference, data)
+            cache_prediction(key, result)
+        payload = complete_prediction(result, data)
+            
+        if explanation is not None:
+            payload = ExplainedPrediction.model_construct(
+                **payload.__dict__,
+                explanation=await within_budget(explanation)
+            )
+            
+        return VitalsResponse.model_construct(
+            data=payload,
+            message="Prediction complete",
+            timestamp=dt.datetime.now()
+        )
+        
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/analyse-vitals/batch", tags=["Health"], response_model=VitalsBatchResponse)
+async def analyse_vitals_batch(records: List[UserData], explain: bool = False):
+    """
+    This endpoint runs inference on the Machine Learning model for many users in a
+    single call, used for bulk re-scoring of watch history. With explain, every
+    record is explained, without a latency budget.
+    """
+    if len(records) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large, at most {MAX_BATCH_SIZE} records are allowed"
+        )
+        
+    records = [fill_from_readings(data) for data in records]
+    
+    try:
+        keys = [prediction_key(data) if prediction_cache.enabled or explain else None for data in records]
+        
+        if explain:
+            payloads, explanations = await asyncio.gather(score_records(records, keys), explain_records(records, keys))
+            payloads = [
+                ExplainedPrediction.model_construct(**payload.__dict__, explanation=explanation)
+                for payload, explanation in zip(payloads, explanations)
+            ]
+        else:
+            payloads = await score_records(records, keys)
+            
+        return VitalsBatchResponse.model_construct(
+            data=payloads,
+            message="Batch prediction complete",
+            timestamp=dt.datetime.now()
+        )
+        
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/readings", tags=["Health"])
+async def upload_readings(upload: ReadingsUpload):
+    """
+    This endpoint records a batch of raw smartwatch readings for a user, keeping
+    the latest READINGS_WINDOW of them, and returns the user's rolling statistics.
+    """
+    if len(upload.readings) > READINGS_MAX_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many readings, at most {READINGS_MAX_BATCH} are allowed per upload"
+        )
+        
+    samples = np.array(
+        [[getattr(reading, name) for name in SIGNALS] for reading in upload.readings],
+        dtype=np.float64
+    ).reshape(-1, len(SIGNALS))
+    window = reading_store.ingest(upload.user_id, samples)
+    
+    return {
+        "data": {"window": window.size, "signals": window.summary()},
+        "message": f"Recorded {len(upload.readings)} readings",
+        "timestamp": dt.datetime.now()
+    }
+
+
+@app.get("/readings/{user_id}", tags=["Health"])
+async def get_readings(user_id: str):
+    """
+    This endpoint returns the rolling statistics of a user's recorded readings.
+    """
+    window = reading_store.get(user_id)
+    if window is None:
+        raise HTTPException(status_code=404, detail="No readings recorded for this user")
+        
+    return {
+        "data": {"window": window.size, "signals": window.summary()},
+        "message": "Readings found",
+        "timestamp": dt.datetime.now()
+    }
+
+
 @app.post("/analyse-facial", tags=["Health"])
 async def analyse_facial(file: UploadFile = File(...)):
     """
     This endpoint gives preliminary comments of diabetic risk based on facial image.
     """
     try:
-        contents = await file.read()
-        image_data = base64.b64encode(contents).decode("utf-8")
-        mime_type = file.content_type or "image/jpeg"
+        contents, digest = await read_upload(file, FACIAL_MAX_UPLOAD_BYTES)
 
         prompt = """
         You are a medical AI assistant for a cardiovascular health app. 
@@ -238,17 +632,35 @@ async def analyse_facial(file: UploadFile = File(...)):
         Keep the response concise and non-alarming.
         """
 
-        response = llm.generate_content([
-            {"mime_type": mime_type, "data": image_data},
-            prompt
-        ])
+        async def analyse():
+            # Decoding and resizing are CPU-bound, so they run off the event loop
+            image, mime_type = await asyncio.to_thread(
+                downscale, contents, FACIAL_MAX_DIMENSION, FACIAL_JPEG_QUALITY
+            )
+            return await llm.generate([
+                {"mime_type": mime_type, "data": image},
+                prompt
+            ])
+
+        # Retries from the app resend identical photos, so results are cached by
+        # the hash of the raw upload.
+        analysis = await facial_cache.get_or_compute(digest, analyse)
 
         return {
-            "data": {"analysis": response.text},
+            "data": {"analysis": analysis},
             "message": "Facial analysis complete",
             "timestamp": dt.datetime.now()
         }
 
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+        
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+        
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="AI Service Error: the response timed out")
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI Service Error: {str(e)}")
 
@@ -276,27 +688,56 @@ async def suggest_tips(symptoms: SymptomsData):
         Always include a brief disclaimer to seek medical attention if symptoms worsen.
         """
         
-        response = llm.generate_content(prompt)
+        cache_key = ",".join(sorted(active_symptoms))
+        suggestions = await suggest_cache.get_or_compute(cache_key, lambda: llm.generate(prompt))
         
         return {
-            "data": {"suggestions": response.text},
+            "data": {"suggestions": suggestions},
             "message": "Tips generated successfully",
             "timestamp": dt.datetime.now()
         }
         
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="AI Service Error: the response timed out")
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI Service Error: {str(e)}")
 
 
-async def chat_streamer(prompt: str):
+async def summarize_history(summary: str, transcript: str):
+    """
+    This folds older chat turns into the running summary of a conversation.
+    """
+    prompt = f"""
+    You are summarising a conversation between a user and a medical assistant for a 
+    cardiovascular health app. Combine the existing summary with the new turns into 
+    one short summary that keeps every health detail, symptom and reading the user mentioned.
+
+    Existing summary: {summary}
+
+    New turns:
+    {transcript}
+    """
+    return await llm.generate(prompt)
+
+
+async def chat_streamer(prompt: str, conversation=None, message: str = None):
     """Generator function to stream AI responses chunk-based"""
+    reply = []
     try:
-        response = llm.generate_content(prompt, stream=True)
-        for chunk in response:
-            if chunk.text:
-                yield f"data: {chunk.text}\n\n"
+        async for text in llm.stream(prompt):
+            reply.append(text)
+            yield f"data: {text}\n\n"
+    except TimeoutError:
+        yield "data: [Error communicating with AI: the response timed out]\n\n"
+        return
     except Exception as e:
         yield f"data: [Error communicating with AI: {str(e)}]\n\n"
+        return
+
+    # Only completed replies are remembered in the session
+    if conversation is not None:
+        chat_sessions.record(conversation, message, "".join(reply))
 
 
 @app.post("/chat", tags=["Health"])
@@ -305,18 +746,38 @@ async def chat(req: ChatRequest):
     This endpoint uses the LLM chat interface via Server-Sent Events (SSE)
     for instant streaming responses to the mobile app.
     """
+    if req.session_id:
+        session_id = req.session_id
+        conversation = chat_sessions.get(session_id)
+        if conversation is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Chat session not found or expired, send the message without a session_id to start a new one"
+            )
+    else:
+        session_id, conversation = chat_sessions.create(context=req.context)
+
+    context = conversation.summary
+    history = conversation.transcript()
+    background = BackgroundTask(chat_sessions.compact, conversation, summarize_history)
+        
     system_prompt = f"""
     You are a helpful medical assistant for a cardiovascular health app.
-    Here is the user's recent health context: {req.context}
+    Here is the user's recent health context: {context}
+    
+    Conversation so far:
+    {history or "This is the start of the conversation."}
 
     User message: {req.message}
     """
 
     return StreamingResponse(
-        chat_streamer(system_prompt),
+        chat_streamer(system_prompt, conversation, req.message),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "X-Accel-Buffering": "no",
-        }
+            "X-Session-Id": session_id,
+        },
+        background=background
     )
@@ -0,0 +1,202 @@
+import threading
+import time
+import numpy as np
+
+from collections import OrderedDict
+
+
+# The smartwatch signals kept per user, in buffer column order
+SIGNALS = ("systolic_bp", "diastolic_bp", "heart_rate", "hrv", "spo2", "breathing_rate")
+
+
+def _moments(x):
+    """
+    This returns the count, mean and sum of squared deviations of each column,
+    ignoring missing values.
+    """
+    present = ~np.isnan(x)
+    count = present.sum(axis=0).astype(np.float64)
+    total = np.where(present, x, 0.0).sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, total / count, 0.0)
+    m2 = np.where(present, (x - mean) ** 2, 0.0).sum(axis=0)
+    return count, mean, m2
+
+
+class RollingWindow:
+    """
+    This holds one user's latest readings in a fixed-size ring buffer, along with
+    the running count, mean and variance of each signal over the window.
+
+    The buffer is a preallocated float32 array, so memory per user is fixed. New
+    readings overwrite the oldest, and the running statistics are updated by
+    merging in the new readings and taking out the overwritten ones, without
+    rescanning the window. Readings may leave any signal missing. To stop
+    rounding errors building up, the statistics are recomputed exactly from the
+    buffer once every window's worth of evictions.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.buffer = np.full((capacity, len(SIGNALS)), np.nan, dtype=np.float32)
+        self.head = 0
+        self.size = 0
+        self.count = np.zeros(len(SIGNALS))
+        self.mean = np.zeros(len(SIGNALS))
+        self.m2 = np.zeros(len(SIGNALS))
+        self.latest = np.full(len(SIGNALS), np.nan)
+        self._evicted = 0
+
+    def extend(self, samples):
+        """
+        This appends readings, an array with one row per reading and one column
+        per signal in SIGNALS order, oldest first.
+        """
+        samples = np.asarray(samples, dtype=np.float32)[-self.capacity:]
+        k = len(samples)
+        if not k:
+            return
+
+        overflow = self.size + k - self.capacity
+        if overflow > 0:
+            oldest = (self.head - self.size + np.arange(overflow)) % self.capacity
+            self._remove(self.buffer[oldest].astype(np.float64))
+            self._evicted += overflow
+
+        slots = (self.head + np.arange(k)) % self.capacity
+        self.buffer[slots] = samples
+        self.head = (self.head + k) % self.capacity
+        self.size = min(self.capacity, self.size + k)
+
+        values = samples.astype(np.float64)
+        self._add(values)
+
+        present = ~np.isnan(values)
+        has_value = present.any(axis=0)
+        last = k - 1 - np.argmax(present[::-1], axis=0)
+        self.latest = np.where(has_value, values[last, np.arange(len(SIGNALS))], self.latest)
+
+        if self._evicted >= self.capacity:
+            self._recompute()
+
+    def _add(self, values):
+        # Chan et al.'s parallel update merges the new readings' moments in
+        count, mean, m2 = _moments(values)
+        total = self.count + count
+        delta = mean - self.mean
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean = np.where(total > 0, self.mean + delta * count / total, 0.0)
+            self.m2 = np.where(total > 0, self.m2 + m2 + delta ** 2 * self.count * count / total, 0.0)
+        self.count = total
+
+    def _remove(self, values):
+        # The same update in reverse takes the evicted readings' moments out
+        count, mean, m2 = _moments(values)
+        remaining = self.count - count
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            kept_mean = np.where(remaining > 0, (self.count * self.mean - count * mean) / remaining, 0.0)
+            delta = mean - kept_mean
+            self.m2 = np.where(
+                remaining > 0,
+                np.maximum(self.m2 - m2 - delta ** 2 * remaining * count / self.count, 0.0),
+                0.0
+            )
+        self.mean = kept_mean
+        self.count = remaining
+
+    def _recompute(self):
+        self.count, self.mean, self.m2 = _moments(self.buffer[:self.size].astype(np.float64))
+        self._evicted = 0
+
+    def means(self):
+        """
+        This returns the mean of each signal over the window, or None for signals
+        without readings.
+        """
+        return {
+            name: float(self.mean[i]) if self.count[i] else None
+            for i, name in enumerate(SIGNALS)
+        }
+
+    def summary(self):
+        """
+        This summarises each signal over the window: reading count, mean,
+        standard deviation, minimum, maximum and latest reading.
+        """
+        window = self.buffer[:self.size]
+        present = ~np.isnan(window)
+        minimum = np.where(present, window, np.inf).min(axis=0, initial=np.inf)
+        maximum = np.where(present, window, -np.inf).max(axis=0, initial=-np.inf)
+
+        summary = {}
+        for i, name in enumerate(SIGNALS):
+            count = int(self.count[i])
+            if not count:
+                summary[name] = {"count": 0}
+                continue
+
+            summary[name] = {
+                "count":  count,
+                "mean":   round(float(self.mean[i]), 2),
+                "std":    round(float(np.sqrt(self.m2[i] / (count - 1))) if count > 1 else 0.0, 2),
+                "min":    round(float(minimum[i]), 2),
+                "max":    round(float(maximum[i]), 2),
+                "latest": round(float(self.latest[i]), 2),
+            }
+        return summary
+
+
+class ReadingStore:
+    """
+    This is a bounded in-memory store of per-user reading windows, keyed by user
+    id.
+
+    Each user keeps their latest window readings. Users expire after ttl seconds
+    without new readings, and the least recently updated user is evicted once
+    max_users is reached, so memory is bounded by max_users windows.
+    """
+
+    def __init__(self, max_users=10000, window=256, ttl=7 * 86400):
+        self.max_users = max_users
+        self.window = window
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ingest(self, user_id, samples):
+        """
+        This appends readings to a user's window, starting a new window when the
+        user has none, and returns the window.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._users.pop(user_id, None)
+            if entry is None or entry[0] + self.ttl < now:
+                window = RollingWindow(self.window)
+            else:
+                window = entry[1]
+
+            window.extend(samples)
+            self._users[user_id] = (now, window)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+        return window
+
+    def get(self, user_id):
+        """
+        This returns a user's window, or None when they have no recent readings.
+        """
+        with self._lock:
+            entry = self._users.get(user_id)
+
+        if entry is None or entry[0] + self.ttl < time.monotonic():
+            return None
+        return entry[1]
+
+    def __len__(self):
+        return len(self._users)
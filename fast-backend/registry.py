@@ -0,0 +1,360 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import numpy as np
+
+from contextlib import contextmanager
+
+from compiled_model import CompiledBooster, probe_rows
+from features import FeatureAssembler
+from metrics import Gauge
+
+
+MODEL_LOAD_SECONDS = Gauge(
+    "model_load_seconds",
+    "Time spent loading each model artifact on startup",
+    labelnames=("artifact",)
+)
+
+ENGINES = ("xgboost", "compiled")
+
+# Startup timings are logged alongside uvicorn's own startup messages
+logger = logging.getLogger("uvicorn.error")
+
+
+def file_digest(path):
+    """
+    This hashes a file's contents, used to key converted artifacts.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImputerMedians:
+    """
+    This stands in for the fitted SimpleImputer once its medians are cached, as
+    the feature assembler only needs the medians and feature names.
+    """
+
+    def __init__(self, statistics, feature_names):
+        self.statistics_ = statistics
+        self.feature_names_in_ = feature_names if len(feature_names) else None
+
+
+class ModelBundle:
+    """
+    This holds everything needed to score vitals: the schema, imputer, feature
+    assembler and booster, plus the compiled engine when it is selected.
+
+    Artifacts are converted once and cached under cache_directory by content hash:
+    the JSON booster as XGBoost's binary UBJSON format, the compiled engine's node
+    tables as memory-mapped .npy files shared by every worker on the host, and the
+    imputer medians as a small .npz. With the compiled engine and a warm cache,
+    neither XGBoost nor scikit-learn is imported at all, and the booster is only
+    loaded when something asks for it. Load time is recorded per artifact.
+    """
+
+    def __init__(self, directory, engine="xgboost", tolerance=1e-5, cache_directory=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown VITALS_ENGINE: {engine}")
+
+        self.directory = directory
+        self.engine = engine
+        self.tolerance = tolerance
+        self.cache_directory = cache_directory or os.path.join(directory, ".cache")
+        self.model_path = os.path.join(directory, "hypertension_model.json")
+        self.timings = {}
+        self._model = None
+        self._model_lock = threading.Lock()
+
+        schema_path  = os.path.join(directory, "feature_schema.json")
+        imputer_path = os.path.join(directory, "imputer.pkl")
+
+        with self._timed("schema"):
+            with open(schema_path) as f:
+                self.schema = json.load(f)
+            self.features = self.schema["features"]
+            self.digest = file_digest(self.model_path)
+            self.imputer_digest = file_digest(imputer_path)
+
+        # The version names the whole bundle, so a change to any one artifact
+        # yields a new version.
+        self.version = self.schema.get("version") or hashlib.sha256(
+            (self.digest + self.imputer_digest + file_digest(schema_path)).encode()
+        ).hexdigest()[:12]
+
+        with self._timed("imputer"):
+            self.assembler = FeatureAssembler(self.features, self._load_imputer(imputer_path))
+
+        self.compiled = None
+        if engine == "compiled":
+            with self._timed("compiled"):
+                self.compiled = self._load_compiled()
+        else:
+            self.model
+
+    @contextmanager
+    def _timed(self, artifact):
+        start = time.perf_counter()
+        yield
+        self.timings[artifact] = time.perf_counter() - start
+        MODEL_LOAD_SECONDS.labels(artifact).set(self.timings[artifact])
+
+    def _cached_path(self, name, digest, suffix):
+        os.makedirs(self.cache_directory, exist_ok=True)
+        return os.path.join(self.cache_directory, f"{name}-{digest[:16]}{suffix}")
+
+    def _load_imputer(self, path):
+        medians_path = self._cached_path("imputer", self.imputer_digest, ".npz")
+
+        if os.path.exists(medians_path):
+            with np.load(medians_path) as cached:
+                return ImputerMedians(cached["statistics"], list(cached["feature_names"]))
+
+        import joblib
+
+        imputer = joblib.load(path)
+        temporary = f"{medians_path}.{os.getpid()}.npz"
+        np.savez(
+            temporary,
+            statistics=imputer.statistics_,
+            feature_names=np.asarray(getattr(imputer, "feature_names_in_", []), dtype=str)
+        )
+        os.replace(temporary, medians_path)
+        return imputer
+
+    @property
+    def model(self):
+        """
+        This is the stock XGBoost classifier, loaded on first use.
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    with self._timed("model"):
+                        self._model = self._load_booster()
+        return self._model
+
+    def _load_booster(self):
+        import xgboost as xgb
+
+        model = xgb.XGBClassifier()
+        binary_path = self._cached_path("hypertension_model", self.digest, ".ubj")
+
+        if os.path.exists(binary_path):
+            model.load_model(binary_path)
+            return model
+
+        model.load_model(self.model_path)
+        # Written under a temporary name first, so concurrent workers never read
+        # a partially written file.
+        temporary = f"{binary_path}.{os.getpid()}.ubj"
+        model.save_model(temporary)
+        os.replace(temporary, binary_path)
+        return model
+
+    def _load_compiled(self):
+        tables_path = self._cached_path("hypertension_model", self.digest, ".compiled")
+        verified_path = os.path.join(tables_path, "verified.json")
+
+        if not os.path.exists(tables_path):
+            temporary = f"{tables_path}.{os.getpid()}"
+            try:
+                CompiledBooster(self.model_path).save(temporary)
+                os.rename(temporary, tables_path)
+            except OSError:
+                # Another worker got there first, its tables are just as good
+                if not os.path.exists(tables_path):
+                    raise
+            finally:
+                # Nothing is left here once renamed, only a partial or losing copy
+                shutil.rmtree(temporary, ignore_errors=True)
+
+        compiled = CompiledBooster.load(tables_path)
+
+        # The compiled engine must match XGBoost before it may serve. The measured
+        # drift is kept with the tables, so the check only runs once per model.
+        if os.path.exists(verified_path):
+            with open(verified_path) as f:
+                if json.load(f)["drift"] <= self.tolerance:
+                    return compiled
+
+        drift = compiled.check_against(
+            self.model,
+            probe_rows(self.assembler.medians),
+            tolerance=self.tolerance
+        )
+        with open(verified_path, "w") as f:
+            json.dump({"drift": drift}, f)
+
+        return compiled
+
+    def predict_stages(self, X_imp):
+        """
+        This is the single prediction entry point for imputed feature rows. The
+        booster is traversed once for the probabilities, and each stage is taken as
+        the most probable class, which is exactly what the softprob objective
+        predicts.
+        """
+        if self.compiled is not None:
+            if X_imp.shape[0] == 1:
+                stage, probs = self.compiled.predict_row(X_imp[0])
+                return np.array([stage]), probs[np.newaxis, :]
+            probs = self.compiled.predict_proba(X_imp)
+        else:
+            probs = self.model.predict_proba(X_imp)
+
+        return probs.argmax(axis=1), probs
+
+    def explain(self, X_imp):
+        """
+        This attributes each row's prediction to its features with XGBoost's exact
+        TreeSHAP. It returns the predicted stages, each feature's contribution to
+        the predicted stage's log-odds, and the base value the contributions add
+        to. Explanations always use the stock booster, whichever engine serves.
+        """
+        import xgboost as xgb
+
+        contributions = self.model.get_booster().predict(xgb.DMatrix(X_imp), pred_contribs=True)
+        # The contributions and bias of each class sum to its margin, and the
+        # largest margin is the most probable stage
+        stages = contributions.sum(axis=2).argmax(axis=1)
+        rows = np.arange(len(X_imp))
+        return stages, contributions[rows, stages, :-1], contributions[rows, stages, -1]
+
+    def warm_up(self):
+        """
+        This runs one prediction, so the first real request does not pay for any
+        lazy initialisation inside the booster.
+        """
+        with self._timed("warm_up"):
+            self.predict_stages(self.assembler.medians[np.newaxis, :].copy())
+
+
+class ModelRegistry:
+    """
+    This holds the live model bundle. The bundle is loaded lazily, on first use,
+    so importing the app stays cheap. Call load on startup to load and warm it
+    before serving.
+
+    Reloading builds and warms a complete new bundle alongside the live one, then
+    swaps it in with a single assignment. Requests already in flight finish on the
+    bundle they started with, and a bundle that fails to load never replaces the
+    live one.
+    """
+
+    ARTIFACTS = ("hypertension_model.json", "imputer.pkl", "feature_schema.json")
+
+    def __init__(self, directory, **options):
+        self.directory = directory
+        self.options = options
+        # The artifacts' signature when the live bundle was loaded from them
+        self.loaded_signature = None
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._bundle is not None
+
+    def get(self):
+        bundle = self._bundle
+        if bundle is None:
+            with self._lock:
+                if self._bundle is None:
+                    signature = self.signature()
+                    self._bundle = ModelBundle(self.directory, **self.options)
+                    self.loaded_signature = signature
+                bundle = self._bundle
+        return bundle
+
+    def load(self):
+        bundle = self.get()
+        if "warm_up" not in bundle.timings:
+            bundle.warm_up()
+
+        logger.info(
+            f"Loaded vitals model {bundle.version}: "
+            + ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in bundle.timings.items())
+        )
+        return bundle
+
+    def reload(self, directory=None):
+        """
+        This loads and warms the bundle in directory, defaulting to the current one,
+        then atomically makes it the live bundle. Returns the new and previous
+        bundles.
+        """
+        with self._reload_lock:
+            directory = directory or self.directory
+
+            # Taken before loading, so changes made while loading are still seen
+            signature = self.signature(directory)
+            bundle = ModelBundle(directory, **self.options)
+            bundle.warm_up()
+
+            previous = self._bundle
+            self.directory = directory
+            self._bundle = bundle
+            self.loaded_signature = signature
+
+        logger.info(
+            f"Reloaded vitals model {previous.version if previous else None} -> {bundle.version}"
+        )
+        return bundle, previous
+
+    def signature(self, directory=None):
+        """
+        This fingerprints the artifacts in directory, defaulting to the current
+        one, used to notice when they change.
+        """
+        signature = []
+        for name in self.ARTIFACTS:
+            try:
+                stat = os.stat(os.path.join(directory or self.directory, name))
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    async def watch(self, interval, on_reload=None):
+        """
+        This polls the model directory and reloads once its artifacts change and
+        have stayed unchanged for one more interval, so partially copied files are
+        never loaded. on_reload is called with the new bundle after each swap.
+
+        Changes are measured against the live bundle's signature, which every
+        reload updates, so a reload through the admin endpoint is not repeated
+        here. Artifacts that failed to load are not retried until they change.
+        """
+        if self.loaded_signature is None:
+            self.loaded_signature = self.signature()
+        failed = None
+
+        while True:
+            await asyncio.sleep(interval)
+
+            current = self.signature()
+            if current in (self.loaded_signature, failed) or None in current:
+                continue
+
+            await asyncio.sleep(interval)
+            if self.signature() != current:
+                continue
+
+            try:
+                bundle, _ = await asyncio.to_thread(self.reload)
+                if on_reload is not None:
+                    on_reload(bundle)
+            except Exception as e:
+                logger.error(f"Could not reload vitals model, keeping the live one: {e}")
+                failed = current
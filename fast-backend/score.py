@@ -0,0 +1,162 @@
+"""
+Offline bulk scoring of vitals records with the live model bundle, without going
+through HTTP. Records are read from CSV or Parquet in fixed-size chunks, scored
+across a pool of worker processes, and written as JSON Lines in input order, one
+/analyse-vitals result per record. Run from the fast-backend directory:
+
+    python score.py ../machine-learning/vitals/output/combined_dataset.csv scores.jsonl --id-column SEQN
+
+Columns are named like the /analyse-vitals request fields. Lab values that are
+missing take the same defaults as the endpoint, so any record the endpoint would
+accept is scored exactly as it would be there. Other missing values are imputed
+for the model, and the derived values and risk score that depend on them are
+left null.
+"""
+import argparse
+import json
+import os
+import time
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import scoring
+
+from features import derived_values
+
+
+# Every request field a record may have, with the defaults of those that have one
+FIELDS = [name for name in scoring.UserData.model_fields if name != "user_id"]
+DEFAULTS = {
+    name: field.default
+    for name, field in scoring.UserData.model_fields.items()
+    if name in FIELDS and field.default is not None and not field.is_required()
+}
+
+# Records are read with attribute access, like the request models
+Record = namedtuple("Record", FIELDS)
+
+# The Framingham score is only given for records with all of its inputs
+FRAMINGHAM_INPUTS = ["age", "gender", "total_cholesterol", "hdl_cholesterol", "systolic_bp", "smoking_status", "diabetic"]
+
+
+def read_chunks(path, chunk_size):
+    """
+    This yields a file's records as DataFrames of at most chunk_size rows, as
+    Parquet or else CSV, so only one chunk is held in memory at a time.
+    """
+    if path.endswith(".parquet"):
+        # pyarrow is only needed for Parquet input
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def nullable(value):
+    return None if value is None or value != value else value
+
+
+def score_chunk(chunk, id_column=None, explain=False):
+    """
+    This scores one chunk of records, returning them as JSON Lines along with the
+    number of records. It uses the same feature assembly, imputer, booster and
+    result building as /analyse-vitals, and the same explanations with explain.
+    """
+    records = chunk.reindex(columns=FIELDS).astype(np.float64).fillna(DEFAULTS)
+    # Rows hold plain Python floats, as the endpoint's requests do, rather than
+    # NumPy scalars
+    rows = list(map(Record._make, records.to_numpy().tolist()))
+
+    bundle = scoring.model_registry.get()
+    stages, probs = bundle.predict_stages(bundle.assembler.transform_many(rows))
+    stages, probs = stages.tolist(), probs.tolist()
+    complete = records[FRAMINGHAM_INPUTS].notna().all(axis=1).to_numpy()
+    ids = chunk[id_column].tolist() if id_column else None
+    explanations = scoring.run_batch_explanations(rows) if explain else None
+
+    lines = []
+    for i, row in enumerate(rows):
+        derived = {name: nullable(value) for name, value in derived_values(row).items()}
+        result = scoring.build_prediction(int(stages[i]), probs[i], derived, bundle.version)
+
+        payload = {id_column: nullable(ids[i])} if id_column else {}
+        payload.update(result.__dict__)
+        payload["risk_score"] = scoring.calculate_framingham_score(row) if complete[i] else None
+        if explain:
+            payload["explanation"] = explanations[i].model_dump()
+        lines.append(json.dumps(payload, allow_nan=False))
+
+    lines.append("")
+    return "\n".join(lines), len(rows)
+
+
+def scored_chunks(chunks, workers, id_column=None, explain=False):
+    """
+    This scores chunks across worker processes, yielding their output in input
+    order. At most two chunks per worker are in flight, so memory stays bounded
+    however large the input is.
+    """
+    if workers <= 1:
+        scoring.warm_up_worker()
+        for chunk in chunks:
+            yield score_chunk(chunk, id_column, explain)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=scoring.warm_up_worker,
+        initargs=(scoring.model_registry.directory,),
+    ) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(score_chunk, chunk, id_column, explain))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def run(source, output, chunk_size=50000, workers=None, id_column=None, explain=False):
+    """
+    This scores every record in source into output, printing progress and the
+    overall rows per second.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    total = 0
+
+    print(f"\nScoring {source} with model {scoring.model_registry.directory}, {workers} workers\n")
+    with open(output, "w") as f:
+        for text, rows in scored_chunks(read_chunks(source, chunk_size), workers, id_column, explain):
+            f.write(text)
+            total += rows
+            elapsed = time.perf_counter() - start
+            print(f"  {total:>12,} rows   {elapsed:>8.1f} s   {total / elapsed:>10,.0f} rows/s")
+
+    elapsed = time.perf_counter() - start
+    print(f"\nScored {total:,} rows into {output} in {elapsed:.1f} s, {total / max(elapsed, 1e-9):,.0f} rows/s\n")
+    return {"rows": total, "elapsed_s": round(elapsed, 3), "rows_per_s": round(total / max(elapsed, 1e-9), 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score vitals records in bulk with the live model")
+    parser.add_argument("source", help="CSV or Parquet file of records")
+    parser.add_argument("output", help="Where to write the results as JSON Lines")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Records per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to the CPU count")
+    parser.add_argument("--id-column", default=None, help="A column copied into each result, such as a user id")
+    parser.add_argument("--explain", action="store_true", help="Include each record's top contributing features")
+    parser.add_argument("--model", default=None, help="The model bundle to use, defaults to MODEL_DIRECTORY")
+    args = parser.parse_args()
+
+    if args.model:
+        scoring.model_registry.directory = args.model
+    run(args.source, args.output, args.chunk_size, args.workers, args.id_column, args.explain)
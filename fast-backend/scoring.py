@@ -0,0 +1,290 @@
+"""
+The vitals model and everything needed to score it, shared by the web app and
+the offline scoring CLI: the live model registry, the request and prediction
+models, inference and explanation over feature rows, and the Framingham score.
+Importing it loads nothing and creates no app, executors or caches.
+"""
+import os
+import sys
+import time
+import numpy as np
+import metrics
+
+from dotenv import load_dotenv
+from features import derived_values
+from registry import ModelRegistry
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Optional
+
+load_dotenv()
+
+# The model bundle served, which the app's admin endpoint and watcher may change
+MODEL_DIRECTORY = os.getenv("MODEL_DIRECTORY", "./models/vitals")
+
+# The inference engine is selectable so the compiled booster can be A/B tested
+# against stock XGBoost. Either way, the compiled engine must match XGBoost on a
+# fixed set of probe rows before it is allowed to serve.
+VITALS_ENGINE = os.getenv("VITALS_ENGINE", "xgboost")
+VITALS_ENGINE_TOLERANCE = float(os.getenv("VITALS_ENGINE_TOLERANCE", "1e-5"))
+
+# Model artifacts are loaded lazily and warmed up on startup. Converted binary
+# artifacts are cached by content hash under MODEL_CACHE_DIRECTORY.
+model_registry = ModelRegistry(
+    MODEL_DIRECTORY,
+    engine=VITALS_ENGINE,
+    tolerance=VITALS_ENGINE_TOLERANCE,
+    cache_directory=os.getenv("MODEL_CACHE_DIRECTORY", "./cache/models")
+)
+
+# This is how many of the largest feature contributions each explanation keeps
+EXPLAIN_TOP_FEATURES = int(os.getenv("EXPLAIN_TOP_FEATURES", "5"))
+
+STAGE_ADVICE = {
+    0: "Blood pressure is healthy. You may maintain your current lifestyle. Be sure to check-in annually.",
+    1: "Slightly elevated. Reduce sodium, increase and gradually increase exercise. Recheck in 3-6 months.",
+    2: "Stage 1 Hypertension, we recommend consulting a physician. Lifestyle changes required at this stage.",
+    3: "Stage 2 Hypertension, we recommend seeking medical attention promptly. Medication is likely needed."
+}
+
+STAGE_NAMES = {
+    0: "Normal",
+    1: "Elevated",
+    2: "Stage 1 HTN",
+    3: "Stage 2 HTN"
+}
+
+# The stage names and advice are interned once, so every prediction and cached
+# result shares the same string objects, and the probability keys are prebuilt
+# in class order.
+STAGE_NAMES  = {stage: sys.intern(name) for stage, name in STAGE_NAMES.items()}
+STAGE_ADVICE = {stage: sys.intern(advice) for stage, advice in STAGE_ADVICE.items()}
+PROBABILITY_KEYS = tuple(STAGE_NAMES[stage] for stage in sorted(STAGE_NAMES))
+
+
+def check_blood_pressure(systolic, diastolic):
+    """
+    This helper function raises ValueError unless systolic exceeds diastolic,
+    when both are known.
+    """
+    if systolic is not None and diastolic is not None and systolic <= diastolic:
+        raise ValueError("systolic_bp must be greater than diastolic_bp")
+
+
+class UserData(BaseModel):
+    # These values are gotten from onboarding
+    age:            int     = Field(..., ge=1,   le=120, description="Age in years")
+    gender:         int     = Field(..., ge=0,   le=1,   description="0=Male, 1=Female")
+    smoking_status: int     = Field(..., ge=0,   le=2,   description="0=Never, 1=Former, 2=Current")
+    bmi:            float   = Field(..., gt=0,   lt=100, description="Body Mass Index")
+    avg_sleep_hours:float   = Field(..., ge=0,   le=24,  description="Average sleep hours per night")
+    stress_level:   int     = Field(..., ge=1,   le=10,  description="Self-reported stress level 1-10")
+    diabetic:       int     = Field(..., ge=0,   le=1,  description="Self-reported diabetic status level 0-1")
+
+    # These values are gotten from the smart watch. Any left out are filled in
+    # from the averages of the readings recorded for user_id.
+    user_id:        Optional[str]   = Field(None, max_length=128, description="User whose recorded readings fill in missing watch values")
+    systolic_bp:    Optional[float] = Field(None, gt=0,   description="Average systolic BP (mmHg)")
+    diastolic_bp:   Optional[float] = Field(None, gt=0,   description="Average diastolic BP (mmHg)") 
+    heart_rate:     Optional[float] = Field(None, gt=0,   description="Resting heart rate (BPM)")
+    spo2:           Optional[float] = Field(None, ge=50,  le=100, description="Blood oxygen saturation (%)")
+    breathing_rate: Optional[float] = Field(None, gt=0,   description="Breathing rate (breaths/min)") 
+    hrv:            Optional[float] = Field(None, gt=0,   description="Heart rate variability (ms)")
+
+    # These values are optional to include, default values provided
+    total_cholesterol: float = Field(180.0, gt=0, description="Total cholesterol (mg/dL)")
+    hdl_cholesterol:   float = Field(50.0,  gt=0, description="HDL cholesterol (mg/dL)")
+    fasting_glucose:   float = Field(90.0,  gt=0, description="Fasting blood glucose (mg/dL)")
+    creatinine:        float = Field(1.0,   gt=0, description="Serum creatinine (mg/dL)")
+
+    # This runs once every field is validated, as the pydantic v1 field
+    # validator it replaces was never called on this v2 model. Either value may
+    # still be filled in from readings, which are checked the same way then.
+    @model_validator(mode="after")
+    def systolic_must_exceed_diastolic(self):
+        check_blood_pressure(self.systolic_bp, self.diastolic_bp)
+        return self
+
+
+class PredictionResult(BaseModel):
+    stage:          int
+    stage_name:     str
+    confidence:     float
+    probabilities:  Dict[str, float]
+    advice:         str
+    derived:        Dict[str, Optional[float]]
+    model_version:  str
+
+
+class VitalsPrediction(PredictionResult):
+    risk_score:     float
+
+
+class FeatureContribution(BaseModel):
+    feature:        str
+    value:          Optional[float] = Field(description="The feature's value, or null when it was imputed")
+    contribution:   float           = Field(description="Contribution to the predicted stage's log-odds")
+
+
+class Explanation(BaseModel):
+    stage:          int
+    stage_name:     str
+    base_value:     float           = Field(description="The predicted stage's log-odds before any feature is considered")
+    features:       List[FeatureContribution]
+
+
+class ExplainedPrediction(VitalsPrediction):
+    # This is null when the explanation did not finish within its latency budget
+    explanation:    Optional[Explanation]
+
+
+INFERENCE_SECONDS = metrics.Histogram(
+    "vitals_inference_seconds",
+    "Time spent per vitals inference call: the imputer and booster phases, and the whole executor call",
+    labelnames=("phase",)
+)
+EXPLANATION_SECONDS = metrics.Histogram(
+    "vitals_explanation_seconds",
+    "Time spent per batch of vitals explanations"
+)
+FRAMINGHAM_SECONDS = metrics.Histogram(
+    "framingham_score_seconds",
+    "Time spent calculating the Framingham risk score"
+)
+
+
+def calculate_framingham_score(data: UserData):
+    """
+    This helper function calculates framingham risk score based on onboarding and
+    smart watch data.
+    """
+    start = time.perf_counter()
+    
+    age_factor = (data.age - 20) / 10
+    chol_factor = (data.total_cholesterol - 160) / 40
+    
+    hdl = data.hdl_cholesterol
+    hdl_factor = (hdl - (40 if data.gender == 0 else 50)) / 10
+    
+    sbp_factor = (data.systolic_bp - 120) / 10
+    smoker_factor = 0 if data.smoking_status == 0 else 1
+    diabetic_factor = data.diabetic
+    
+    score = age_factor + chol_factor + hdl_factor + sbp_factor + smoker_factor + diabetic_factor
+    FRAMINGHAM_SECONDS.observe(time.perf_counter() - start)
+    
+    return score
+
+
+def build_prediction(stage: int, probs: list, derived: dict, model_version: str):
+    """
+    This helper function turns the model's output for a single row into a prediction
+    result.
+    """
+    return PredictionResult(
+        stage = stage,
+        stage_name = STAGE_NAMES[stage],
+        confidence = round(max(probs) * 100, 1),
+        probabilities = dict(zip(PROBABILITY_KEYS, (round(p * 100, 1) for p in probs))),
+        advice = STAGE_ADVICE[stage],
+        derived = derived,
+        model_version = model_version
+    )
+
+
+def complete_prediction(result: PredictionResult, data: UserData):
+    """
+    This helper function builds the response payload for a prediction. Only the
+    model's output may come from the cache, as it only depends on the feature row.
+    The derived values and risk score also use inputs the model does not, such as
+    blood pressure outside the model's features, so they are always computed from
+    this request.
+    """
+    # The result was validated when it was built, so it is not validated again
+    return VitalsPrediction.model_construct(
+        **{**result.__dict__, "derived": derived_values(data)},
+        risk_score=calculate_framingham_score(data)
+    )
+
+
+def run_inference(data: UserData):
+    bundle = model_registry.get()
+    
+    start = time.perf_counter()
+    X_imp = bundle.assembler.transform(data)[np.newaxis, :]
+    imputed = time.perf_counter()
+    stages, probs = bundle.predict_stages(X_imp)
+    
+    INFERENCE_SECONDS.labels("imputer").observe(imputed - start)
+    INFERENCE_SECONDS.labels("booster").observe(time.perf_counter() - imputed)
+    
+    return build_prediction(int(stages[0]), probs[0].tolist(), derived_values(data), bundle.version)
+
+
+def run_batch_inference(records: List[UserData]):
+    """
+    This runs inference over many users at once. All feature rows are stacked into a
+    single matrix, so the imputer and the booster are each called only once.
+    """
+    if not records:
+        return []
+    
+    bundle = model_registry.get()
+    
+    start = time.perf_counter()
+    X_imp = bundle.assembler.transform_many(records)
+    imputed = time.perf_counter()
+    stages, probs = bundle.predict_stages(X_imp)
+    
+    INFERENCE_SECONDS.labels("imputer").observe(imputed - start)
+    INFERENCE_SECONDS.labels("booster").observe(time.perf_counter() - imputed)
+    
+    return [
+        build_prediction(int(stage), p.tolist(), derived_values(data), bundle.version)
+        for stage, p, data in zip(stages, probs, records)
+    ]
+
+
+def run_batch_explanations(records: List[UserData]):
+    """
+    This explains the predicted stage for many users at once with TreeSHAP,
+    returning each user's EXPLAIN_TOP_FEATURES largest contributions.
+    """
+    if not records:
+        return []
+    
+    bundle = model_registry.get()
+    
+    start = time.perf_counter()
+    X = np.empty((len(records), len(bundle.features)), dtype=np.float32)
+    for i, data in enumerate(records):
+        bundle.assembler.assemble(data, out=X[i])
+    stages, contributions, base_values = bundle.explain(bundle.assembler.impute(X))
+    EXPLANATION_SECONDS.observe(time.perf_counter() - start)
+    
+    top = np.argsort(-np.abs(contributions), axis=1)[:, :EXPLAIN_TOP_FEATURES]
+    return [
+        Explanation(
+            stage = int(stages[i]),
+            stage_name = STAGE_NAMES[int(stages[i])],
+            base_value = round(float(base_values[i]), 4),
+            features = [
+                FeatureContribution(
+                    feature = bundle.features[j],
+                    value = None if np.isnan(X[i, j]) else round(float(X[i, j]), 2),
+                    contribution = round(float(contributions[i, j]), 4)
+                )
+                for j in top[i]
+            ]
+        )
+        for i in range(len(records))
+    ]
+
+
+def warm_up_worker(directory: str = None):
+    """
+    This runs once in every inference worker, so the first real request does not
+    pay for loading the model or warming up the booster.
+    """
+    if directory and not model_registry.loaded:
+        model_registry.directory = directory
+    model_registry.load()
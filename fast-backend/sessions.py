@@ -0,0 +1,132 @@
+import logging
+import secrets
+import threading
+import time
+
+from collections import OrderedDict
+
+
+def estimate_tokens(text):
+    """
+    This roughly estimates the token count of a piece of text, at about four
+    characters per token.
+    """
+    return len(text) // 4 + 1
+
+
+class Conversation:
+    """
+    This holds one chat session: a running summary of older turns plus the most
+    recent turns kept verbatim.
+    """
+
+    def __init__(self, summary=""):
+        self.summary = summary
+        self.turns = []
+        self.compacting = False
+
+    def add_turn(self, role, text):
+        self.turns.append((role, text))
+
+    def history_tokens(self):
+        return sum(estimate_tokens(text) for _, text in self.turns)
+
+    def transcript(self, turns=None):
+        return "\n".join(f"{role}: {text}" for role, text in (turns or self.turns))
+
+
+class SessionStore:
+    """
+    This is a bounded in-memory store of chat sessions keyed by session id.
+
+    Session ids are random tokens issued by create, so clients cannot pick or
+    guess another conversation's id. Sessions expire after ttl seconds of
+    inactivity, and the least recently used session is evicted once
+    max_sessions is reached. Once a session's verbatim
+    history grows past token_budget, its older turns are folded into the running
+    summary, keeping only the latest keep_turns. max_turns is a hard cap on
+    history in case summarisation keeps failing.
+    """
+
+    def __init__(self, max_sessions=1000, ttl=1800, token_budget=1500, keep_turns=4, max_turns=50):
+        # Compacting must leave the latest turn verbatim, or the next message
+        # would lose what it is replying to
+        if keep_turns < 1:
+            raise ValueError("keep_turns must be at least 1")
+
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.max_turns = max_turns
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, context=None):
+        """
+        This starts a new session seeded with the given context, returning its
+        newly issued id along with the session.
+        """
+        session_id = secrets.token_urlsafe(24)
+        conversation = Conversation(summary=context or "")
+
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic(), conversation)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+        return session_id, conversation
+
+    def get(self, session_id):
+        """
+        This returns the session for session_id, or None when it is unknown or
+        has expired.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is None or entry[0] + self.ttl < now:
+                return None
+
+            self._sessions[session_id] = (now, entry[1])
+
+        return entry[1]
+
+    def record(self, conversation, message, reply):
+        """
+        This appends a completed exchange to the session history.
+        """
+        conversation.add_turn("User", message)
+        conversation.add_turn("Assistant", reply)
+
+        if len(conversation.turns) > self.max_turns:
+            del conversation.turns[:len(conversation.turns) - self.max_turns]
+
+    async def compact(self, conversation, summarize):
+        """
+        This folds older turns into the running summary once the history is over
+        the token budget. summarize(summary, transcript) must return the new summary.
+        """
+        if conversation.compacting or conversation.history_tokens() <= self.token_budget:
+            return
+
+        older = conversation.turns[:-self.keep_turns]
+        if not older:
+            return
+
+        conversation.compacting = True
+        try:
+            conversation.summary = await summarize(conversation.summary, conversation.transcript(older))
+            # Turns recorded while summarising are kept, only the folded ones go.
+            # They are matched by identity, as record may have trimmed some of
+            # them meanwhile, shifting the rest.
+            folded = {id(turn) for turn in older}
+            conversation.turns[:] = [turn for turn in conversation.turns if id(turn) not in folded]
+        except Exception as e:
+            logging.warning(f"Could not summarise chat history: {e}")
+        finally:
+            conversation.compacting = False
+
+    def __len__(self):
+        return len(self._sessions)
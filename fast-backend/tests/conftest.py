@@ -0,0 +1,91 @@
+import httpx
+import numpy as np
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app is configured from the environment when main is imported, so the tests
+# pin it to the fake LLM and the shipped model before anything imports it.
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("MODEL_ROOT", os.path.join(BACKEND_DIRECTORY, "models"))
+os.environ.setdefault("MODEL_DIRECTORY", os.path.join(BACKEND_DIRECTORY, "models", "vitals"))
+os.environ.setdefault("MODEL_CACHE_DIRECTORY", tempfile.mkdtemp(prefix="model-cache-"))
+sys.path.insert(0, BACKEND_DIRECTORY)
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+SAMPLE_VITALS = {
+    "age":             52,
+    "gender":          0,
+    "smoking_status":  1,
+    "bmi":             28.4,
+    "avg_sleep_hours": 6.5,
+    "stress_level":    6,
+    "diabetic":        0,
+    "systolic_bp":     134.0,
+    "diastolic_bp":    86.0,
+    "heart_rate":      72.0,
+    "spo2":            97.0,
+    "breathing_rate":  15.0,
+    "hrv":             38.0,
+}
+
+
+LABS = ["total_cholesterol", "hdl_cholesterol", "fasting_glucose", "creatinine"]
+
+
+def random_records(count, seed=0):
+    """
+    This draws valid request bodies, leaving each lab value out a quarter of the
+    time so the endpoint's defaults are used.
+    """
+    rng = np.random.default_rng(seed)
+    records = []
+    for i in range(count):
+        diastolic = round(float(rng.uniform(50, 110)), 1)
+        record = {
+            "record_id":       f"r{i}",
+            "age":             int(rng.integers(18, 90)),
+            "gender":          int(rng.integers(0, 2)),
+            "smoking_status":  int(rng.integers(0, 3)),
+            "bmi":             round(float(rng.uniform(16, 45)), 1),
+            "avg_sleep_hours": round(float(rng.uniform(4, 10)), 1),
+            "stress_level":    int(rng.integers(1, 11)),
+            "diabetic":        int(rng.integers(0, 2)),
+            "systolic_bp":     round(diastolic + float(rng.uniform(10, 80)), 1),
+            "diastolic_bp":    diastolic,
+            "heart_rate":      round(float(rng.uniform(50, 110)), 1),
+            "spo2":            round(float(rng.uniform(90, 100)), 1),
+            "breathing_rate":  round(float(rng.uniform(10, 22)), 1),
+            "hrv":             round(float(rng.uniform(15, 100)), 1),
+        }
+        for lab, (low, high) in zip(LABS, [(120, 300), (25, 100), (70, 200), (0.5, 2.0)]):
+            if rng.random() >= 0.25:
+                record[lab] = round(float(rng.uniform(low, high)), 2)
+        records.append(record)
+    return records
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def async_client():
+    # The transport does not run the lifespan, which only loads the vitals model
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
@@ -0,0 +1,94 @@
+import os
+import shutil
+import pytest
+
+import main
+
+from conftest import SAMPLE_VITALS
+from scoring import MODEL_DIRECTORY, model_registry
+
+TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def model_root(tmp_path, monkeypatch):
+    root = tmp_path / "models"
+    root.mkdir()
+    monkeypatch.setattr(main, "MODEL_ROOT", str(root))
+    monkeypatch.setattr(main, "ADMIN_TOKEN", TOKEN)
+    return root
+
+
+def reload(client, directory, token=TOKEN):
+    headers = {"X-Admin-Token": token} if token is not None else {}
+    return client.post("/admin/reload-model", json={"directory": directory}, headers=headers)
+
+
+@pytest.mark.parametrize("token", [None, "", "wrong-token"])
+def test_bad_or_missing_token_is_rejected(client, model_root, token):
+    shutil.copytree(MODEL_DIRECTORY, model_root / "next")
+    bundle = model_registry.get()
+    
+    response = reload(client, "next", token=token)
+    
+    assert response.status_code == 403
+    assert model_registry.get() is bundle
+
+
+def test_admin_is_disabled_without_a_token(client, model_root, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    shutil.copytree(MODEL_DIRECTORY, model_root / "next")
+    
+    assert reload(client, "next", token="").status_code == 403
+
+
+@pytest.mark.parametrize("link", [False, True])
+def test_directory_outside_the_root_is_rejected(client, model_root, tmp_path, link):
+    outside = tmp_path / "outside"
+    shutil.copytree(MODEL_DIRECTORY, outside)
+    directory = "../outside"
+    if link:
+        # A link under the root is resolved before it is checked
+        os.symlink(outside, model_root / "linked")
+        directory = "linked"
+    bundle = model_registry.get()
+    
+    response = reload(client, directory)
+    
+    assert response.status_code == 400
+    assert model_registry.get() is bundle
+
+
+def test_failed_load_keeps_the_live_bundle(client, model_root):
+    broken = model_root / "broken"
+    shutil.copytree(MODEL_DIRECTORY, broken)
+    (broken / "hypertension_model.json").write_text("{ not a model")
+    bundle, directory = model_registry.get(), model_registry.directory
+    
+    response = reload(client, "broken")
+    
+    assert response.status_code == 500
+    assert "keeping the live model" in response.json()["detail"]
+    assert model_registry.get() is bundle
+    assert model_registry.directory == directory
+    
+    main.prediction_cache.clear()
+    assert client.post("/analyse-vitals", json=SAMPLE_VITALS).status_code == 200
+
+
+def test_reload_swaps_in_the_new_bundle(client, model_root):
+    shutil.copytree(MODEL_DIRECTORY, model_root / "next")
+    previous = model_registry.get()
+    
+    try:
+        response = reload(client, "next")
+        
+        assert response.status_code == 200
+        assert response.json()["data"]["previous_version"] == previous.version
+        assert model_registry.directory == os.path.realpath(model_root / "next")
+        
+        main.prediction_cache.clear()
+        assert client.post("/analyse-vitals", json=SAMPLE_VITALS).status_code == 200
+    finally:
+        model_registry.reload(MODEL_DIRECTORY)
+        main.restart_inference_workers(model_registry.get())
@@ -0,0 +1,61 @@
+import main
+
+from conftest import SAMPLE_VITALS, random_records
+
+
+def single_results(client, records):
+    main.prediction_cache.clear()
+    results = []
+    for record in records:
+        response = client.post("/analyse-vitals", json=record)
+        assert response.status_code == 200
+        results.append(response.json()["data"])
+    return results
+
+
+def test_batch_matches_single_requests(client):
+    records = random_records(30, seed=7)
+    
+    main.prediction_cache.clear()
+    response = client.post("/analyse-vitals/batch", json=records)
+    assert response.status_code == 200
+    
+    assert response.json()["data"] == single_results(client, records)
+
+
+def test_batch_keeps_order_with_repeated_records(client):
+    records = random_records(5, seed=8)
+    records = [records[2], records[0], records[2], records[4], records[0]]
+    
+    main.prediction_cache.clear()
+    response = client.post("/analyse-vitals/batch", json=records)
+    assert response.status_code == 200
+    
+    assert response.json()["data"] == single_results(client, records)
+
+
+def test_mixed_batch_rejects_invalid_records(client):
+    records = random_records(4, seed=9)
+    records[1] = {**records[1], "systolic_bp": 70.0, "diastolic_bp": 90.0}
+    records[3] = {**records[3], "age": 500}
+    
+    response = client.post("/analyse-vitals/batch", json=records)
+    assert response.status_code == 422
+    
+    invalid = sorted({error["loc"][1] for error in response.json()["detail"]})
+    assert invalid == [1, 3]
+    
+    for index in invalid:
+        assert client.post("/analyse-vitals", json=records[index]).status_code == 422
+        
+    valid = [records[0], records[2]]
+    response = client.post("/analyse-vitals/batch", json=valid)
+    assert response.status_code == 200
+    assert response.json()["data"] == single_results(client, valid)
+
+
+def test_batch_too_large(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", 2)
+    
+    response = client.post("/analyse-vitals/batch", json=[SAMPLE_VITALS] * 3)
+    assert response.status_code == 413
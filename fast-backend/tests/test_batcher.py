@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from batcher import MicroBatcher
+
+
+class Recorder:
+    """
+    This stands in for a batch model, recording every batch it is called with.
+    """
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+        
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if self.error is not None:
+            raise self.error
+        return [item * 10 for item in items]
+
+
+async def run(fn, *args):
+    await asyncio.sleep(0)
+    return fn(*args)
+
+
+@pytest.mark.anyio
+async def test_results_go_back_to_their_callers():
+    model = Recorder()
+    batcher = MicroBatcher(model, run, max_size=4, max_wait=0.01, name="test")
+    
+    results = await asyncio.gather(*[batcher.submit(item) for item in [3, 1, 4, 1, 5, 9, 2]])
+    
+    assert results == [30, 10, 40, 10, 50, 90, 20]
+    assert sorted(item for batch in model.batches for item in batch) == [1, 1, 2, 3, 4, 5, 9]
+
+
+@pytest.mark.anyio
+async def test_full_batch_flushes_without_waiting():
+    model = Recorder()
+    batcher = MicroBatcher(model, run, max_size=3, max_wait=60, name="test")
+    
+    results = await asyncio.wait_for(asyncio.gather(*[batcher.submit(item) for item in range(3)]), timeout=1)
+    
+    assert results == [0, 10, 20]
+    assert model.batches == [[0, 1, 2]]
+    assert batcher._timer is None
+
+
+@pytest.mark.anyio
+async def test_partial_batch_flushes_after_the_window():
+    model = Recorder()
+    batcher = MicroBatcher(model, run, max_size=64, max_wait=0.05, name="test")
+    
+    waiting = [asyncio.ensure_future(batcher.submit(item)) for item in range(2)]
+    await asyncio.sleep(0.01)
+    assert model.batches == []
+    
+    waiting.append(asyncio.ensure_future(batcher.submit(2)))
+    assert await asyncio.wait_for(asyncio.gather(*waiting), timeout=1) == [0, 10, 20]
+    assert model.batches == [[0, 1, 2]]
+
+
+@pytest.mark.anyio
+async def test_burst_beyond_max_size_is_split():
+    model = Recorder()
+    batcher = MicroBatcher(model, run, max_size=2, max_wait=0.01, name="test")
+    
+    results = await asyncio.gather(*[batcher.submit(item) for item in range(5)])
+    
+    assert results == [0, 10, 20, 30, 40]
+    assert [len(batch) for batch in model.batches] == [2, 2, 1]
+
+
+@pytest.mark.anyio
+async def test_batch_error_reaches_every_caller():
+    error = RuntimeError("model failed")
+    batcher = MicroBatcher(Recorder(error), run, max_size=3, max_wait=0.01, name="test")
+    
+    results = await asyncio.gather(*[batcher.submit(item) for item in range(3)], return_exceptions=True)
+    
+    assert results == [error, error, error]
+
+
+@pytest.mark.anyio
+async def test_cancelled_callers_are_dropped():
+    model = Recorder()
+    batcher = MicroBatcher(model, run, max_size=64, max_wait=0.02, name="test")
+    
+    waiting = [asyncio.ensure_future(batcher.submit(item)) for item in range(3)]
+    await asyncio.sleep(0)
+    waiting[1].cancel()
+    
+    assert await asyncio.gather(waiting[0], waiting[2]) == [0, 20]
+    assert model.batches == [[0, 2]]
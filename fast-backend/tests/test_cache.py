@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import pytest
+
+from cache import DiskBackend, MemoryBackend, ResponseCache
+
+pytestmark = pytest.mark.anyio
+
+
+class ThreadRecordingBackend(DiskBackend):
+    """
+    This is the disk backend, recording which thread every call is made on.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, value, ttl):
+        self.threads.append(threading.get_ident())
+        super().set(key, value, ttl)
+
+
+async def test_disk_backend_calls_run_off_the_event_loop(tmp_path):
+    backend = ThreadRecordingBackend(str(tmp_path / "cache.sqlite3"))
+    cache = ResponseCache("test-disk", backend, ttl=60)
+
+    async def compute():
+        return {"text": "fresh"}
+
+    assert await cache.get_or_compute("key", compute) == {"text": "fresh"}
+    assert await cache.get_or_compute("key", compute) == {"text": "fresh"}
+
+    assert len(backend.threads) == 3
+    assert threading.get_ident() not in backend.threads
+
+
+async def test_disk_backend_coalesces_concurrent_misses(tmp_path):
+    cache = ResponseCache("test-disk", DiskBackend(str(tmp_path / "cache.sqlite3")), ttl=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "value"
+
+    results = await asyncio.gather(*[cache.get_or_compute("key", compute) for _ in range(10)])
+
+    assert results == ["value"] * 10
+    assert calls == 1
+
+
+async def test_failures_are_not_cached():
+    cache = ResponseCache("test-memory", MemoryBackend(), ttl=60)
+
+    async def fail():
+        raise RuntimeError("upstream")
+
+    async def compute():
+        return "value"
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_compute("key", fail)
+    assert await cache.get_or_compute("key", compute) == "value"
@@ -0,0 +1,82 @@
+import os
+import joblib
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from compiled_model import CompiledBooster, probe_rows
+from conftest import BACKEND_DIRECTORY
+
+MODEL_DIRECTORY = os.path.join(BACKEND_DIRECTORY, "models", "vitals")
+
+# float32 thresholds and float64 sums differ from XGBoost by about 3e-7
+TOLERANCE = 1e-5
+
+
+@pytest.fixture(scope="module")
+def shipped():
+    model = xgb.XGBClassifier()
+    model.load_model(os.path.join(MODEL_DIRECTORY, "hypertension_model.json"))
+    imputer = joblib.load(os.path.join(MODEL_DIRECTORY, "imputer.pkl"))
+    return model, CompiledBooster(os.path.join(MODEL_DIRECTORY, "hypertension_model.json")), imputer.statistics_
+
+
+@pytest.fixture(scope="module")
+def trained_with_missing(tmp_path_factory):
+    # The shipped model is trained on imputed rows, so this one is trained with
+    # missing values to learn real default directions at its splits
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(600, 6)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int) + 2 * (X[:, 3] > 0.5)
+    X[rng.random(X.shape) < 0.2] = np.nan
+
+    model = xgb.XGBClassifier(objective="multi:softprob", n_estimators=30, max_depth=4, tree_method="hist")
+    model.fit(X, y)
+    path = str(tmp_path_factory.mktemp("model") / "model.json")
+    model.save_model(path)
+    return model, CompiledBooster(path), X
+
+
+def assert_equivalent(model, engine, X):
+    expected = model.predict_proba(X)
+
+    np.testing.assert_allclose(engine.predict_proba(X), expected, atol=TOLERANCE, rtol=0)
+    for x, probs in zip(X, expected):
+        stage, row_probs = engine.predict_row(x)
+        np.testing.assert_allclose(row_probs, probs, atol=TOLERANCE, rtol=0)
+        assert stage == probs.argmax()
+
+
+def test_random_rows_match_xgboost(shipped):
+    model, engine, medians = shipped
+    rng = np.random.default_rng(0)
+    X = (medians * rng.uniform(0.25, 2.0, size=(500, medians.size))).astype(np.float32)
+
+    assert_equivalent(model, engine, X)
+
+
+def test_rows_with_missing_values_match_xgboost(shipped):
+    model, engine, medians = shipped
+    X = probe_rows(medians, count=500, seed=3)
+    X[0] = np.nan
+    X[1, ::2] = np.nan
+
+    assert np.isnan(X).any()
+    assert_equivalent(model, engine, X)
+
+
+def test_missing_value_defaults_match_xgboost(trained_with_missing):
+    model, engine, X = trained_with_missing
+
+    assert_equivalent(model, engine, X)
+    assert_equivalent(model, engine, np.full((3, X.shape[1]), np.nan, dtype=np.float32))
+
+
+def test_saved_tables_match_the_parsed_model(shipped, tmp_path):
+    model, engine, medians = shipped
+    engine.save(str(tmp_path))
+    loaded = CompiledBooster.load(str(tmp_path))
+    X = probe_rows(medians, count=200, seed=4)
+
+    np.testing.assert_array_equal(loaded.predict_proba(X), engine.predict_proba(X))
+    assert_equivalent(model, loaded, X)
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import pytest
+
+import main
+
+from conftest import SAMPLE_VITALS
+from executor import ExecutorSaturated, InferenceExecutor
+
+
+def test_default_queue_scales_with_workers():
+    assert InferenceExecutor(workers=1).max_pending == 64
+    assert InferenceExecutor(workers=8).max_pending == 128
+    assert InferenceExecutor(workers=8, max_pending=3).max_pending == 3
+
+
+@pytest.mark.anyio
+async def test_calls_beyond_the_queue_are_rejected():
+    executor = InferenceExecutor(workers=1, max_pending=2)
+    release = threading.Event()
+    try:
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert executor.pending == 2
+        
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(release.wait)
+            
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        assert executor.pending == 0
+        assert await executor.run(sum, [1, 2]) == 3
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_saturated_executor_returns_503(client, monkeypatch):
+    main.prediction_cache.clear()
+    monkeypatch.setattr(main.inference_executor, "max_pending", 0)
+    
+    for path, body in [("/analyse-vitals", SAMPLE_VITALS), ("/analyse-vitals/batch", [SAMPLE_VITALS])]:
+        response = client.post(path, json=body)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert "queue is full" in response.json()["detail"]
@@ -0,0 +1,105 @@
+import asyncio
+import numpy as np
+import xgboost as xgb
+
+import main
+import scoring
+
+from conftest import SAMPLE_VITALS
+
+
+def skipped(reason):
+    return main.EXPLANATIONS_SKIPPED.labels(reason)
+
+
+def test_contributions_add_up_to_the_predicted_margin(client):
+    bundle = main.model_registry.get()
+    users = [main.UserData(**{**SAMPLE_VITALS, "age": age, "systolic_bp": 100.0 + age}) for age in range(20, 80, 6)]
+    X = bundle.assembler.impute(np.array([bundle.assembler.assemble(user) for user in users]))
+
+    stages, contributions, base_values = bundle.explain(X)
+    margins = bundle.model.get_booster().predict(xgb.DMatrix(X), output_margin=True)
+
+    np.testing.assert_array_equal(stages, margins.argmax(axis=1))
+    np.testing.assert_allclose(
+        contributions.sum(axis=1) + base_values,
+        margins[np.arange(len(X)), stages],
+        atol=1e-4
+    )
+
+
+def test_explanation_matches_the_prediction(client):
+    main.explanation_cache.clear()
+    data = client.post("/analyse-vitals?explain=true", json=SAMPLE_VITALS).json()["data"]
+    explanation = data["explanation"]
+
+    assert explanation["stage"] == data["stage"]
+    assert len(explanation["features"]) == scoring.EXPLAIN_TOP_FEATURES
+    contributions = [abs(feature["contribution"]) for feature in explanation["features"]]
+    assert contributions == sorted(contributions, reverse=True)
+
+
+def test_explanations_are_cached_by_feature_row(client):
+    main.explanation_cache.clear()
+    other = {**SAMPLE_VITALS, "bmi": 35.0}
+
+    first = client.post("/analyse-vitals?explain=true", json=SAMPLE_VITALS).json()["data"]["explanation"]
+    hits = main.explanation_cache.hits
+    # Fields outside the model's features do not change the key
+    again = client.post("/analyse-vitals?explain=true", json={**SAMPLE_VITALS, "diabetic": 1}).json()["data"]["explanation"]
+    assert main.explanation_cache.hits == hits + 1
+    assert again == first
+
+    client.post("/analyse-vitals?explain=true", json=other).raise_for_status()
+    assert main.explanation_cache.hits == hits + 1
+
+    key = main.prediction_key(main.UserData(**SAMPLE_VITALS))
+    assert key[0] == main.model_registry.get().version
+    assert key != main.prediction_key(main.UserData(**other))
+    assert main.explanation_cache.get(key) is not main.MISSING
+
+
+def test_explanation_past_its_budget_is_null(client, monkeypatch):
+    async def slow_explanation(data, key):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(main, "explain_user", slow_explanation)
+    monkeypatch.setattr(main, "EXPLAIN_BUDGET_MS", 10)
+    over_budget = skipped("over_budget").value
+
+    response = client.post("/analyse-vitals?explain=true", json=SAMPLE_VITALS)
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["explanation"] is None
+    assert data["stage_name"] in scoring.STAGE_NAMES.values()
+    assert skipped("over_budget").value == over_budget + 1
+
+
+def test_failed_explanation_is_null(client, monkeypatch):
+    async def failing_explanation(data, key):
+        raise RuntimeError("explanation failed")
+
+    monkeypatch.setattr(main, "explain_user", failing_explanation)
+    failed = skipped("failed").value
+
+    response = client.post("/analyse-vitals?explain=true", json=SAMPLE_VITALS)
+
+    assert response.status_code == 200
+    assert response.json()["data"]["explanation"] is None
+    assert skipped("failed").value == failed + 1
+
+
+def test_full_explanation_queue_drops_explanations_not_predictions(client, monkeypatch):
+    main.explanation_cache.clear()
+    monkeypatch.setattr(main.explanation_executor, "max_pending", 0)
+    saturated = skipped("saturated").value
+    records = [{**SAMPLE_VITALS, "age": 30}, {**SAMPLE_VITALS, "age": 70}]
+
+    single = client.post("/analyse-vitals?explain=true", json=SAMPLE_VITALS)
+    batch = client.post("/analyse-vitals/batch?explain=true", json=records)
+
+    assert single.status_code == batch.status_code == 200
+    assert single.json()["data"]["explanation"] is None
+    assert [data["explanation"] for data in batch.json()["data"]] == [None, None]
+    assert skipped("saturated").value == saturated + 3
@@ -0,0 +1,117 @@
+import io
+import pytest
+
+from PIL import Image
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import main
+import metrics
+
+from cache import MemoryBackend, ResponseCache
+from images import UploadLimitMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+def image_bytes(size=(64, 48), format="PNG"):
+    output = io.BytesIO()
+    Image.new("RGB", size, (200, 120, 90)).save(output, format=format)
+    return output.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def facial_cache(monkeypatch):
+    monkeypatch.setattr(main, "facial_cache", ResponseCache("facial", MemoryBackend(), ttl=60))
+
+
+async def test_image_is_analysed(async_client):
+    response = await async_client.post("/analyse-facial", files={"file": ("face.png", image_bytes(), "image/png")})
+
+    assert response.status_code == 200
+    assert response.json()["data"]["analysis"].startswith("This is a generated response")
+
+
+async def test_body_over_the_limit_is_rejected_from_its_content_length(async_client):
+    body = b"x" * (main.FACIAL_MAX_UPLOAD_BYTES + 128 * 1024)
+    response = await async_client.post("/analyse-facial", files={"file": ("face.png", body, "image/png")})
+
+    assert response.status_code == 413
+
+
+async def test_rejected_uploads_are_counted_in_request_metrics(async_client):
+    requests = metrics.HTTP_REQUESTS.labels("POST", "/analyse-facial", "413")
+    before = requests.value
+    body = b"x" * (main.FACIAL_MAX_UPLOAD_BYTES + 128 * 1024)
+
+    response = await async_client.post("/analyse-facial", files={"file": ("face.png", body, "image/png")})
+
+    assert response.status_code == 413
+    assert requests.value == before + 1
+
+
+async def test_body_over_the_limit_without_a_content_length_is_cut_off(async_client):
+    chunk = b"x" * (1024 * 1024)
+    limit = main.FACIAL_MAX_UPLOAD_BYTES // len(chunk)
+    sent = 0
+
+    async def chunks():
+        nonlocal sent
+        yield b'--x\r\nContent-Disposition: form-data; name="file"; filename="face.png"\r\nContent-Type: image/png\r\n\r\n'
+        for _ in range(limit * 4):
+            sent += 1
+            yield chunk
+
+    response = await async_client.post(
+        "/analyse-facial", content=chunks(), headers={"content-type": "multipart/form-data; boundary=x"}
+    )
+
+    assert response.status_code == 413
+    assert sent <= limit + 2
+
+
+async def test_content_length_over_the_limit_is_not_read():
+    reads = []
+
+    async def endpoint(request):
+        reads.append(await request.body())
+        return PlainTextResponse("ok")
+
+    app = UploadLimitMiddleware(Starlette(routes=[Route("/upload", endpoint, methods=["POST"])]), {"/upload"}, 100)
+    received = []
+
+    async def receive():
+        received.append(True)
+        return {"type": "http.request", "body": b"x" * 1000, "more_body": False}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/upload", "headers": [(b"content-length", b"1000")],
+        "query_string": b"", "root_path": "", "scheme": "http", "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+
+    assert sent[0]["status"] == 413
+    assert not received and not reads
+
+
+async def test_decompression_bomb_is_a_400(async_client, monkeypatch):
+    # Pillow refuses images over twice MAX_IMAGE_PIXELS
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    response = await async_client.post(
+        "/analyse-facial", files={"file": ("face.png", image_bytes((100, 100)), "image/png")}
+    )
+
+    assert response.status_code == 400
+    assert "too large" in response.json()["detail"]
+
+
+async def test_non_image_is_a_400(async_client):
+    response = await async_client.post("/analyse-facial", files={"file": ("face.png", b"not an image", "image/png")})
+
+    assert response.status_code == 400
@@ -0,0 +1,138 @@
+import joblib
+import json
+import numpy as np
+import os
+import pandas as pd
+import pytest
+
+from sklearn.impute import SimpleImputer
+
+import main
+
+from conftest import BACKEND_DIRECTORY
+from features import FEATURE_GETTERS, FeatureAssembler
+
+MODEL_DIRECTORY = os.path.join(BACKEND_DIRECTORY, "models", "vitals")
+LABS = ["total_cholesterol", "hdl_cholesterol", "fasting_glucose", "creatinine"]
+
+
+def prepare_features(data, features, imputer):
+    """
+    This is the pandas path /analyse-vitals used before FeatureAssembler, kept
+    here as the reference it has to match.
+    """
+    pulse_pressure = data.systolic_bp - data.diastolic_bp
+    map_value      = data.diastolic_bp + (pulse_pressure / 3)
+    chol_ratio     = (
+        data.total_cholesterol / data.hdl_cholesterol
+        if data.total_cholesterol and data.hdl_cholesterol
+        else np.nan
+    )
+    row = {
+        "age":               data.age,
+        "gender":            data.gender,
+        "smoking_status":    data.smoking_status,
+        "bmi":               data.bmi,
+        "systolic_bp":       data.systolic_bp,
+        "diastolic_bp":      data.diastolic_bp,
+        "heart_rate":        data.heart_rate,
+        "pulse_pressure":    pulse_pressure,
+        "map":               map_value,
+        "total_cholesterol": data.total_cholesterol if data.total_cholesterol else np.nan,
+        "hdl_cholesterol":   data.hdl_cholesterol   if data.hdl_cholesterol   else np.nan,
+        "fasting_glucose":   data.fasting_glucose   if data.fasting_glucose   else np.nan,
+        "creatinine":        data.creatinine         if data.creatinine        else np.nan,
+        "chol_ratio":        chol_ratio,
+        "avg_sleep_hours":   data.avg_sleep_hours,
+        "stress_level":      data.stress_level,
+        "spo2":              data.spo2,
+        "breathing_rate":    data.breathing_rate,
+        "hrv":               data.hrv,
+    }
+
+    X = pd.DataFrame([row])[features]
+    return imputer.transform(X)[0]
+
+
+def random_users(count, seed=0):
+    """
+    This draws users across the request's valid ranges. Each optional lab value
+    is left out a third of the time, either unset or as zero, both of which the
+    endpoint treats as missing.
+    """
+    rng = np.random.default_rng(seed)
+    users = []
+    for _ in range(count):
+        diastolic = float(rng.uniform(40, 120))
+        values = {
+            "age":             int(rng.integers(18, 90)),
+            "gender":          int(rng.integers(0, 2)),
+            "smoking_status":  int(rng.integers(0, 3)),
+            "bmi":             float(rng.uniform(15, 50)),
+            "avg_sleep_hours": float(rng.uniform(3, 11)),
+            "stress_level":    int(rng.integers(1, 11)),
+            "diabetic":        int(rng.integers(0, 2)),
+            "systolic_bp":     diastolic + float(rng.uniform(10, 90)),
+            "diastolic_bp":    diastolic,
+            "heart_rate":      float(rng.uniform(45, 120)),
+            "spo2":            float(rng.uniform(85, 100)),
+            "breathing_rate":  float(rng.uniform(10, 25)),
+            "hrv":             float(rng.uniform(10, 120)),
+        }
+        for lab, (low, high) in zip(LABS, [(120, 300), (25, 100), (70, 200), (0.5, 2.0)]):
+            missing = rng.random()
+            if missing < 1 / 6:
+                values[lab] = None
+            elif missing < 1 / 3:
+                values[lab] = 0.0
+            else:
+                values[lab] = float(rng.uniform(low, high))
+
+        # Construction skips validation, so missing labs stay missing rather
+        # than taking their defaults
+        users.append(main.UserData.model_construct(**values))
+    return users
+
+
+def every_feature_imputer():
+    rng = np.random.default_rng(1)
+    frame = pd.DataFrame(rng.uniform(1, 200, size=(50, len(FEATURE_GETTERS))), columns=list(FEATURE_GETTERS))
+    return list(FEATURE_GETTERS), SimpleImputer(strategy="median").fit(frame)
+
+
+def shipped_imputer():
+    with open(os.path.join(MODEL_DIRECTORY, "feature_schema.json")) as f:
+        features = json.load(f)["features"]
+    return features, joblib.load(os.path.join(MODEL_DIRECTORY, "imputer.pkl"))
+
+
+@pytest.mark.parametrize("schema", [shipped_imputer, every_feature_imputer], ids=["shipped", "every-feature"])
+def test_assembler_matches_pandas_path(schema):
+    features, imputer = schema()
+    assembler = FeatureAssembler(features, imputer)
+    users = random_users(300)
+
+    expected = np.array([prepare_features(user, features, imputer) for user in users])
+    rows = np.array([assembler.transform(user) for user in users])
+
+    # The assembler writes float32 rows, as the booster reads them
+    np.testing.assert_allclose(rows, expected.astype(np.float32), rtol=1e-6)
+    np.testing.assert_array_equal(assembler.transform_many(users), rows)
+
+
+def test_missing_labs_take_the_imputer_medians():
+    features, imputer = every_feature_imputer()
+    assembler = FeatureAssembler(features, imputer)
+    user = random_users(1)[0].model_copy(update={lab: None for lab in LABS})
+    row = assembler.transform(user)
+
+    for name in LABS + ["chol_ratio"]:
+        i = features.index(name)
+        assert row[i] == np.float32(imputer.statistics_[i])
+
+
+def test_mismatched_imputer_is_rejected():
+    features, imputer = every_feature_imputer()
+
+    with pytest.raises(ValueError):
+        FeatureAssembler(list(reversed(features)), imputer)
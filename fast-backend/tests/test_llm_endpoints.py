@@ -0,0 +1,147 @@
+import asyncio
+import time
+import pytest
+
+from types import SimpleNamespace
+
+import main
+
+from cache import MemoryBackend, ResponseCache
+from llm import FakeModel
+
+pytestmark = pytest.mark.anyio
+
+
+class CountingModel(FakeModel):
+    """
+    This is the fake model, counting how many calls reach it.
+    """
+
+    def __init__(self, delay=0.0):
+        super().__init__(delay=delay)
+        self.calls = 0
+
+    async def generate_content_async(self, contents, stream=False):
+        self.calls += 1
+        return await super().generate_content_async(contents, stream=stream)
+
+
+class FailingModel:
+    """
+    This fails every call, or for streams, after the first chunk.
+    """
+
+    async def generate_content_async(self, contents, stream=False):
+        if stream:
+            return self._stream()
+        raise RuntimeError("upstream unavailable")
+
+    async def _stream(self):
+        yield SimpleNamespace(text="Partial")
+        raise RuntimeError("upstream unavailable")
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = CountingModel()
+    monkeypatch.setattr(main.llm, "model", model)
+    monkeypatch.setattr(main, "suggest_cache", ResponseCache("suggest", MemoryBackend(), ttl=60))
+    return model
+
+
+def events(body):
+    return [line[len("data: "):] for line in body.split("\n\n") if line.startswith("data: ")]
+
+
+async def test_suggest_returns_generated_tips(async_client, model):
+    response = await async_client.post("/suggest", json={"headaches": True, "nausea": True})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["message"] == "Tips generated successfully"
+    assert body["data"]["suggestions"].startswith("This is a generated response")
+
+
+async def test_suggest_without_symptoms_skips_the_llm(async_client, model):
+    response = await async_client.post("/suggest", json={})
+
+    assert response.json()["message"] == "No active symptoms"
+    assert model.calls == 0
+
+
+async def test_suggest_is_cached_by_symptom_set(async_client, model):
+    first = await async_client.post("/suggest", json={"anxiety": True, "chest_pain": True})
+    second = await async_client.post("/suggest", json={"chest_pain": True, "anxiety": True, "nausea": False})
+
+    assert first.json()["data"] == second.json()["data"]
+    assert model.calls == 1
+
+
+async def test_concurrent_suggests_share_one_llm_call(async_client, model):
+    model.delay = 0.1
+    responses = await asyncio.gather(*[
+        async_client.post("/suggest", json={"shortness_of_breath": True}) for _ in range(5)
+    ])
+
+    assert {r.json()["data"]["suggestions"] for r in responses} == {responses[0].json()["data"]["suggestions"]}
+    assert model.calls == 1
+
+
+async def test_slow_llm_calls_do_not_block_each_other(async_client, model):
+    model.delay = 0.3
+    start = time.perf_counter()
+    responses = await asyncio.gather(
+        async_client.post("/suggest", json={"anxiety": True}),
+        async_client.post("/suggest", json={"headaches": True}),
+        async_client.post("/suggest", json={"nausea": True}),
+    )
+
+    assert all(r.status_code == 200 for r in responses)
+    assert time.perf_counter() - start < 0.6
+
+
+async def test_suggest_timeout_is_a_504(async_client, model, monkeypatch):
+    model.delay = 1.0
+    monkeypatch.setattr(main.llm, "timeout", 0.05)
+    response = await async_client.post("/suggest", json={"headaches": True})
+
+    assert response.status_code == 504
+    assert "timed out" in response.json()["detail"]
+
+
+async def test_suggest_error_is_a_500_and_not_cached(async_client, model, monkeypatch):
+    monkeypatch.setattr(main.llm, "model", FailingModel())
+    response = await async_client.post("/suggest", json={"headaches": True})
+
+    assert response.status_code == 500
+    assert "upstream unavailable" in response.json()["detail"]
+
+    monkeypatch.setattr(main.llm, "model", model)
+    response = await async_client.post("/suggest", json={"headaches": True})
+    assert response.status_code == 200
+
+
+async def test_chat_streams_the_reply(async_client, model):
+    response = await async_client.post("/chat", json={"message": "Is 130/85 high?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    chunks = events(response.text)
+    assert len(chunks) == model.chunks
+    assert "".join(chunks).startswith("This is a generated response")
+
+
+async def test_chat_timeout_ends_the_stream_with_an_error(async_client, model, monkeypatch):
+    model.delay = 1.0
+    monkeypatch.setattr(main.llm, "chunk_timeout", 0.05)
+    response = await async_client.post("/chat", json={"message": "Hello"})
+
+    assert response.status_code == 200
+    assert events(response.text) == ["[Error communicating with AI: the response timed out]"]
+
+
+async def test_chat_error_ends_the_stream_with_an_error(async_client, model, monkeypatch):
+    monkeypatch.setattr(main.llm, "model", FailingModel())
+    response = await async_client.post("/chat", json={"message": "Hello"})
+
+    assert events(response.text) == ["Partial", "[Error communicating with AI: upstream unavailable]"]
@@ -0,0 +1,55 @@
+import sys
+import threading
+import pytest
+
+import main
+import metrics
+
+from conftest import SAMPLE_VITALS
+
+
+@pytest.fixture
+def frequent_switches():
+    # Switching threads often makes unlocked updates lose increments quickly
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def hammer(fn, threads=8, calls=20000):
+    workers = [
+        threading.Thread(target=lambda: [fn() for _ in range(calls)])
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * calls
+
+
+@pytest.mark.skipif(not metrics.ENABLED, reason="metrics are disabled")
+def test_updates_from_threads_are_not_lost(frequent_switches):
+    counter = metrics.Counter("test_thread_counter", "Counter updated from threads")
+    histogram = metrics.Histogram("test_thread_histogram", "Histogram updated from threads")
+
+    total = hammer(counter.inc)
+    assert counter.labels().value == total
+
+    hammer(lambda: histogram.observe(0.001))
+    assert sum(histogram.labels().counts) == total
+    assert histogram.labels().sum == pytest.approx(total * 0.001)
+
+
+@pytest.mark.skipif(not metrics.ENABLED, reason="metrics are disabled")
+def test_inference_calls_are_timed_from_the_event_loop(client):
+    main.prediction_cache.clear()
+    timed = main.INFERENCE_SECONDS.labels("executor")
+    calls = sum(timed.counts)
+
+    client.post("/analyse-vitals", json=SAMPLE_VITALS).raise_for_status()
+    client.post("/analyse-vitals/batch", json=[{**SAMPLE_VITALS, "age": 60}]).raise_for_status()
+
+    assert sum(timed.counts) == calls + 2
+    assert 'vitals_inference_seconds_count{phase="executor"}' in client.get("/metrics").text
@@ -0,0 +1,43 @@
+import main
+import scoring
+
+from conftest import SAMPLE_VITALS
+
+
+def test_cache_hit_recomputes_values_outside_the_model(client):
+    main.prediction_cache.clear()
+    low  = {**SAMPLE_VITALS, "systolic_bp": 118.0, "diastolic_bp": 76.0}
+    high = {**SAMPLE_VITALS, "systolic_bp": 185.0, "diastolic_bp": 110.0}
+
+    client.post("/analyse-vitals", json=low).raise_for_status()
+    response = client.post("/analyse-vitals", json=high)
+    response.raise_for_status()
+    data = response.json()["data"]
+
+    user = main.UserData(**high)
+    assert data["derived"] == {"pulse_pressure": 75.0, "map": 135.0, "chol_ratio": 3.6}
+    assert data["risk_score"] == scoring.calculate_framingham_score(user)
+
+
+def test_cached_and_uncached_results_match(client):
+    main.prediction_cache.clear()
+    first = client.post("/analyse-vitals", json=SAMPLE_VITALS).json()["data"]
+    hits = main.prediction_cache.hits
+    second = client.post("/analyse-vitals", json=SAMPLE_VITALS).json()["data"]
+
+    assert main.prediction_cache.hits == hits + 1
+    assert first == second
+
+
+def test_batch_recomputes_values_outside_the_model(client):
+    main.prediction_cache.clear()
+    records = [
+        {**SAMPLE_VITALS, "systolic_bp": 118.0, "diastolic_bp": 76.0, "diabetic": 0},
+        {**SAMPLE_VITALS, "systolic_bp": 185.0, "diastolic_bp": 110.0, "diabetic": 1},
+    ]
+    data = client.post("/analyse-vitals/batch", json=records).json()["data"]
+
+    for record, result in zip(records, data):
+        user = main.UserData(**record)
+        assert result["derived"]["pulse_pressure"] == round(user.systolic_bp - user.diastolic_bp, 1)
+        assert result["risk_score"] == scoring.calculate_framingham_score(user)
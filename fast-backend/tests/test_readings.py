@@ -0,0 +1,186 @@
+import uuid
+import numpy as np
+import pytest
+
+import main
+
+from conftest import SAMPLE_VITALS
+from readings import SIGNALS, ReadingStore, RollingWindow
+
+WATCH_FIELDS = list(SIGNALS)
+
+
+def random_readings(rng, count, missing=0.2):
+    samples = rng.uniform(40, 160, size=(count, len(SIGNALS))).astype(np.float32)
+    samples[rng.random(samples.shape) < missing] = np.nan
+    return samples
+
+
+def window_contents(window):
+    """
+    This returns the window's readings oldest first, unwinding the ring buffer.
+    """
+    order = (window.head - window.size + np.arange(window.size)) % window.capacity
+    return window.buffer[order]
+
+
+def assert_matches_brute_force(window, readings):
+    expected = readings[-window.capacity:].astype(np.float64)
+    np.testing.assert_array_equal(window_contents(window), readings[-window.capacity:])
+
+    summary = window.summary()
+    for i, name in enumerate(SIGNALS):
+        present = expected[:, i][~np.isnan(expected[:, i])]
+        assert summary[name]["count"] == len(present)
+        if not len(present):
+            continue
+
+        assert window.means()[name] == pytest.approx(present.mean(), rel=1e-9)
+        assert summary[name]["mean"] == pytest.approx(present.mean(), abs=0.01)
+        std = present.std(ddof=1) if len(present) > 1 else 0.0
+        assert window.m2[i] == pytest.approx(std ** 2 * (len(present) - 1), rel=1e-6, abs=1e-6)
+        assert summary[name]["std"] == pytest.approx(std, abs=0.01)
+        assert summary[name]["min"] == pytest.approx(present.min(), abs=0.01)
+        assert summary[name]["max"] == pytest.approx(present.max(), abs=0.01)
+
+        latest = readings[:, i][~np.isnan(readings[:, i])][-1]
+        assert summary[name]["latest"] == pytest.approx(latest, abs=0.01)
+
+
+def test_ring_buffer_wraps_around():
+    window = RollingWindow(capacity=8)
+    readings = np.arange(21 * len(SIGNALS), dtype=np.float32).reshape(21, len(SIGNALS))
+
+    for start, stop in [(0, 5), (5, 11), (11, 12), (12, 21)]:
+        window.extend(readings[start:stop])
+        assert window.size == min(8, stop)
+        assert_matches_brute_force(window, readings[:stop])
+
+
+def test_batch_larger_than_the_window_keeps_its_latest_readings():
+    window = RollingWindow(capacity=8)
+    readings = random_readings(np.random.default_rng(0), 30)
+
+    window.extend(readings)
+
+    assert window.size == 8
+    assert_matches_brute_force(window, readings)
+
+
+def test_rolling_statistics_match_brute_force():
+    rng = np.random.default_rng(1)
+    window = RollingWindow(capacity=32)
+    readings = np.empty((0, len(SIGNALS)), dtype=np.float32)
+
+    # Uneven batches wrap the buffer many times and pass several exact
+    # recomputations along the way
+    for size in rng.integers(1, 20, size=60):
+        batch = random_readings(rng, size)
+        readings = np.vstack([readings, batch])
+        window.extend(batch)
+        assert_matches_brute_force(window, readings)
+
+
+def test_signal_without_readings_has_no_mean():
+    window = RollingWindow(capacity=4)
+    readings = random_readings(np.random.default_rng(2), 3, missing=0)
+    readings[:, SIGNALS.index("hrv")] = np.nan
+
+    window.extend(readings)
+
+    assert window.means()["hrv"] is None
+    assert window.summary()["hrv"] == {"count": 0}
+
+
+def test_store_evicts_the_least_recently_updated_user():
+    store = ReadingStore(max_users=2, window=4)
+    readings = random_readings(np.random.default_rng(3), 2)
+
+    for user in ("a", "b", "a", "c"):
+        store.ingest(user, readings)
+
+    assert store.get("b") is None
+    assert store.get("a").size == 4
+    assert len(store) == 2
+
+
+def upload(client, user_id, readings):
+    body = {
+        "user_id": user_id,
+        "readings": [
+            {name: None if np.isnan(value) else float(value) for name, value in zip(SIGNALS, reading)}
+            for reading in readings
+        ],
+    }
+    return client.post("/readings", json=body)
+
+
+def profile(**values):
+    data = {name: value for name, value in SAMPLE_VITALS.items() if name not in WATCH_FIELDS}
+    return {**data, **values}
+
+
+# Plausible ranges for each watch signal
+SIGNAL_RANGES = {
+    "systolic_bp":    (120, 140),
+    "diastolic_bp":   (70, 85),
+    "heart_rate":     (60, 80),
+    "hrv":            (30, 50),
+    "spo2":           (95, 99),
+    "breathing_rate": (12, 18),
+}
+
+
+def watch_readings(count=10):
+    rng = np.random.default_rng(4)
+    return np.column_stack([rng.uniform(*SIGNAL_RANGES[name], count) for name in SIGNALS]).astype(np.float32)
+
+
+def test_unknown_user_is_not_found(client):
+    user_id = str(uuid.uuid4())
+
+    assert client.get(f"/readings/{user_id}").status_code == 404
+    assert client.post("/analyse-vitals", json=profile(user_id=user_id)).status_code == 404
+
+
+def test_missing_watch_values_without_a_user_are_rejected(client):
+    response = client.post("/analyse-vitals", json=profile())
+
+    assert response.status_code == 422
+    assert "user_id" in response.json()["detail"]
+
+
+def test_missing_watch_values_are_filled_from_readings(client):
+    user_id = str(uuid.uuid4())
+    readings = watch_readings()
+    response = upload(client, user_id, readings)
+    response.raise_for_status()
+    signals = response.json()["data"]["signals"]
+    assert client.get(f"/readings/{user_id}").json()["data"]["signals"] == signals
+
+    # Supplied values are kept, and only the rest come from the window
+    filled = client.post("/analyse-vitals", json=profile(user_id=user_id, heart_rate=90.0))
+    filled.raise_for_status()
+
+    means = readings.astype(np.float64).mean(axis=0)
+    explicit = profile(**{name: round(float(means[i]), 1) for i, name in enumerate(SIGNALS)})
+    explicit["heart_rate"] = 90.0
+    expected = client.post("/analyse-vitals", json=explicit).json()["data"]
+    assert filled.json()["data"] == expected
+
+
+def test_inconsistent_filled_blood_pressure_is_rejected(client):
+    user_id = str(uuid.uuid4())
+    upload(client, user_id, watch_readings()).raise_for_status()
+
+    # The recorded systolic average is under 140, so it cannot exceed this
+    response = client.post("/analyse-vitals", json=profile(user_id=user_id, diastolic_bp=150.0))
+
+    assert response.status_code == 422
+    assert "systolic_bp must be greater than diastolic_bp" in response.json()["detail"]
+
+
+def test_inconsistent_supplied_blood_pressure_is_rejected(client):
+    response = client.post("/analyse-vitals", json={**SAMPLE_VITALS, "systolic_bp": 80.0, "diastolic_bp": 90.0})
+
+    assert response.status_code == 422
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import shutil
+import pytest
+
+import registry
+
+from compiled_model import CompiledBooster
+from conftest import BACKEND_DIRECTORY
+from registry import ModelRegistry
+
+MODEL_DIRECTORY = os.path.join(BACKEND_DIRECTORY, "models", "vitals")
+
+
+@pytest.fixture
+def bundles(tmp_path):
+    directories = []
+    for name in ("a", "b"):
+        directory = tmp_path / name
+        shutil.copytree(MODEL_DIRECTORY, directory)
+        directories.append(str(directory))
+    return directories
+
+
+@pytest.mark.anyio
+async def test_watch_does_not_repeat_an_admin_reload(bundles, tmp_path):
+    first, second = bundles
+    model_registry = ModelRegistry(first, cache_directory=str(tmp_path / "cache"))
+    model_registry.load()
+    reloads = []
+
+    watcher = asyncio.create_task(model_registry.watch(0.01, on_reload=reloads.append))
+    try:
+        await asyncio.to_thread(model_registry.reload, second)
+        await asyncio.sleep(0.1)
+        assert reloads == []
+
+        # A change to the new directory is still picked up
+        schema = os.path.join(second, "feature_schema.json")
+        stat = os.stat(schema)
+        os.utime(schema, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        for _ in range(100):
+            if reloads:
+                break
+            await asyncio.sleep(0.01)
+        assert len(reloads) == 1
+        assert model_registry.loaded_signature == model_registry.signature(second)
+    finally:
+        watcher.cancel()
+
+
+def test_losing_the_compiled_tables_race_leaves_nothing_behind(tmp_path, monkeypatch):
+    save = CompiledBooster.save
+
+    def save_after_another_worker(self, path):
+        # Another worker renames its tables into place while these are written
+        save(self, path.rsplit(".", 1)[0])
+        save(self, path)
+
+    monkeypatch.setattr(registry.CompiledBooster, "save", save_after_another_worker)
+    cache = tmp_path / "cache"
+    model_registry = ModelRegistry(MODEL_DIRECTORY, engine="compiled", cache_directory=str(cache))
+
+    assert model_registry.load().compiled is not None
+    assert [path.suffix for path in cache.iterdir() if path.is_dir()] == [".compiled"]
@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from conftest import BACKEND_DIRECTORY, random_records
+
+
+def run_cli(*args):
+    return subprocess.run(
+        [sys.executable, "score.py", *args],
+        cwd=BACKEND_DIRECTORY, env=os.environ.copy(), capture_output=True, text=True, check=True
+    )
+
+
+def test_cli_matches_the_endpoint(client, tmp_path):
+    records = random_records(40)
+    source, output = tmp_path / "records.csv", tmp_path / "scores.jsonl"
+    pd.DataFrame(records).to_csv(source, index=False)
+
+    # Small chunks over two workers, so results are gathered from several
+    # processes and must still come back in input order
+    run_cli(str(source), str(output), "--id-column", "record_id", "--chunk-size", "7", "--workers", "2")
+    with open(output) as f:
+        scored = [json.loads(line) for line in f]
+
+    assert [result["record_id"] for result in scored] == [record["record_id"] for record in records]
+    for record, result in zip(records, scored):
+        body = {name: value for name, value in record.items() if name != "record_id"}
+        expected = client.post("/analyse-vitals", json=body).json()["data"]
+        assert {name: value for name, value in result.items() if name != "record_id"} == expected
+
+
+def test_cli_does_not_import_the_app():
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, score; print('main' in sys.modules, 'google.generativeai' in sys.modules)"],
+        cwd=BACKEND_DIRECTORY, env=os.environ.copy(), capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ["False", "False"]
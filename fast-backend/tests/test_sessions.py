@@ -0,0 +1,115 @@
+import pytest
+
+import main
+
+from llm import FakeModel
+from sessions import SessionStore
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingModel(FakeModel):
+    """
+    This is the fake model, keeping every prompt it is sent.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    async def generate_content_async(self, contents, stream=False):
+        self.prompts.append(contents)
+        return await super().generate_content_async(contents, stream=stream)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = RecordingModel()
+    monkeypatch.setattr(main.llm, "model", model)
+    return model
+
+
+async def test_first_message_starts_a_session(async_client, model):
+    response = await async_client.post("/chat", json={"message": "Hello", "context": "BP 150/95 last week"})
+    session_id = response.headers["x-session-id"]
+
+    assert len(session_id) >= 32
+    assert main.chat_sessions.get(session_id).summary == "BP 150/95 last week"
+
+
+async def test_later_messages_continue_the_session(async_client, model):
+    first = await async_client.post("/chat", json={"message": "My head hurts"})
+    session_id = first.headers["x-session-id"]
+    second = await async_client.post("/chat", json={"message": "Still hurts", "session_id": session_id})
+
+    assert second.headers["x-session-id"] == session_id
+    assert "User: My head hurts" in model.prompts[-1]
+    assert [role for role, _ in main.chat_sessions.get(session_id).turns] == ["User", "Assistant"] * 2
+
+
+async def test_unknown_session_is_rejected(async_client, model):
+    response = await async_client.post("/chat", json={"message": "Hello", "session_id": "made-up"})
+
+    assert response.status_code == 404
+    assert main.chat_sessions.get("made-up") is None
+    assert not model.prompts
+
+
+async def test_each_session_gets_its_own_id(async_client, model):
+    ids = set()
+    for _ in range(5):
+        response = await async_client.post("/chat", json={"message": "Hello"})
+        ids.add(response.headers["x-session-id"])
+
+    assert len(ids) == 5
+
+
+def test_expired_session_is_not_found(monkeypatch):
+    store = SessionStore(ttl=60)
+    session_id, _ = store.create()
+    now = main.time.monotonic()
+    monkeypatch.setattr("sessions.time.monotonic", lambda: now + 61)
+
+    assert store.get(session_id) is None
+
+
+def test_keep_turns_must_be_at_least_one():
+    with pytest.raises(ValueError):
+        SessionStore(keep_turns=0)
+
+
+async def test_compacting_keeps_the_latest_turns():
+    store = SessionStore(token_budget=10, keep_turns=1)
+    _, conversation = store.create(context="Start")
+    for i in range(3):
+        store.record(conversation, f"Question {i} " * 10, f"Answer {i} " * 10)
+
+    async def summarize(summary, transcript):
+        return f"{summary} + {transcript.count('User:')} questions"
+
+    await store.compact(conversation, summarize)
+
+    assert conversation.summary == "Start + 3 questions"
+    assert conversation.turns == [("Assistant", "Answer 2 " * 10)]
+
+
+async def test_compacting_keeps_turns_recorded_while_summarising():
+    store = SessionStore(token_budget=10, keep_turns=2, max_turns=6)
+    _, conversation = store.create(context="Start")
+    for i in range(3):
+        store.record(conversation, f"Question {i} " * 10, f"Answer {i} " * 10)
+
+    async def summarize(summary, transcript):
+        # Two more exchanges arrive, pushing the oldest turns past max_turns
+        for i in range(3, 5):
+            store.record(conversation, f"Question {i}", f"Answer {i}")
+        return f"{summary} + {transcript.count('User:')} questions"
+
+    await store.compact(conversation, summarize)
+
+    assert conversation.summary == "Start + 2 questions"
+    assert conversation.turns == [
+        ("User", "Question 2 " * 10), ("Assistant", "Answer 2 " * 10),
+        ("User", "Question 3"), ("Assistant", "Answer 3"),
+        ("User", "Question 4"), ("Assistant", "Answer 4"),
+    ]
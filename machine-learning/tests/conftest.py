@@ -0,0 +1,8 @@
+import os
+import sys
+
+VITALS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vitals")
+
+# The training scripts are run from the machine-learning directory and import
+# each other as top-level modules
+sys.path.insert(0, VITALS_DIRECTORY)
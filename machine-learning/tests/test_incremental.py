@@ -0,0 +1,136 @@
+import json
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+import incremental
+import train
+
+
+def cohort(count, seed):
+    """
+    This draws rows with every feature, staged mostly by age and BMI so a small
+    model can learn them.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "age":               rng.uniform(18, 90, count),
+        # An even split of genders gives a quantile sketch a median between codes
+        "gender":            (np.arange(count) % 2).astype(float),
+        "smoking_status":    rng.choice([0.0, 1.0, 2.0], count, p=[0.2, 0.3, 0.5]),
+        "bmi":               rng.uniform(16, 45, count),
+        "heart_rate":        rng.uniform(50, 110, count),
+        "total_cholesterol": rng.uniform(120, 300, count),
+        "hdl_cholesterol":   rng.uniform(25, 100, count),
+        "fasting_glucose":   rng.uniform(70, 200, count),
+        "creatinine":        rng.uniform(0.5, 2.0, count),
+    })
+    df["chol_ratio"] = df["total_cholesterol"] / df["hdl_cholesterol"]
+    risk = df["age"] / 72 + df["bmi"] / 29 + rng.normal(0, 0.15, count)
+    df["hypertension_stage"] = np.digitize(risk, [1.4, 1.75, 2.1])
+    return df
+
+
+@pytest.fixture
+def lenient(monkeypatch):
+    # Recall on a few hundred held out rows moves by more than the default
+    # tolerance from a handful of rows, so tests of what is saved let the
+    # update through. The gate itself is tested on its own.
+    monkeypatch.setattr(train, "AUC_TOLERANCE", 1.0)
+    monkeypatch.setattr(train, "RECALL_TOLERANCE", 1.0)
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    df = cohort(1500, seed=0)
+    X = df[train.FEATURES]
+    imputer, sketches = train.fit_imputer(X)
+    model = xgb.XGBClassifier(
+        objective="multi:softprob", n_estimators=20, max_depth=3, learning_rate=0.05, tree_method="hist"
+    )
+    model.fit(imputer.transform(X), df["hypertension_stage"])
+
+    directory = str(tmp_path / "model")
+    params = train.training_params(model)
+    train.save(model, imputer, {}, sketches, params, directory=directory)
+    return directory
+
+
+def write_readings(tmp_path, df, name="readings.csv"):
+    path = str(tmp_path / name)
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_update_saves_the_bundle(bundle, tmp_path, lenient):
+    path = write_readings(tmp_path, cohort(1000, seed=1))
+    output = str(tmp_path / "updated")
+
+    assert incremental.update(bundle, [path], output, rounds=10) == output
+
+    with open(os.path.join(output, "feature_schema.json")) as f:
+        update = json.load(f)["incremental"]["updates"][-1]
+    assert update["rows"] + update["holdout_rows"] == 1000
+    assert update["holdout_rows"] == 200
+    assert set(update["holdout"]["after"]["recall"]) == set(train.STAGE_NAMES.values())
+
+
+def test_update_refuses_to_save_a_regression(bundle, tmp_path):
+    # Many rounds on a few rows overfit them
+    path = write_readings(tmp_path, cohort(60, seed=1))
+    output = str(tmp_path / "updated")
+
+    with pytest.raises(SystemExit, match="regresses"):
+        incremental.update(bundle, [path], output, rounds=300)
+    assert not os.path.exists(output)
+
+
+def test_rows_with_too_few_features_are_left_out():
+    readings = cohort(10, seed=2)
+    watch_only = readings[["heart_rate", "hypertension_stage"]].copy()
+
+    X, y = incremental.prepare(pd.concat([readings, watch_only], ignore_index=True))
+
+    assert len(X) == len(y) == 10
+    assert X.notna().all().all()
+
+
+def test_coded_features_are_imputed_with_a_code(bundle, tmp_path, lenient):
+    path = write_readings(tmp_path, cohort(1000, seed=1))
+    output = str(tmp_path / "updated")
+
+    incremental.update(bundle, [path], output, rounds=10)
+    imputer = joblib.load(os.path.join(output, "imputer.pkl"))
+
+    for feature in train.CATEGORIES:
+        value = imputer.statistics_[train.FEATURES.index(feature)]
+        assert value in train.CATEGORIES[feature]
+
+
+def test_update_keeps_the_coded_values_training_fitted(bundle, tmp_path, lenient):
+    # Readings whose most common codes agree with the training cohort leave the
+    # fill values as training fitted them, where a median there would have moved
+    readings = cohort(1000, seed=1)
+    readings["gender"] = (np.arange(1000) % 3 == 0).astype(float)
+    path = write_readings(tmp_path, readings)
+    output = str(tmp_path / "updated")
+
+    incremental.update(bundle, [path], output, rounds=10)
+    before = joblib.load(os.path.join(bundle, "imputer.pkl"))
+    after = joblib.load(os.path.join(output, "imputer.pkl"))
+
+    for feature in train.CATEGORIES:
+        i = train.FEATURES.index(feature)
+        assert before.statistics_[i] in train.CATEGORIES[feature]
+        assert after.statistics_[i] == before.statistics_[i]
+
+
+def test_bundle_without_sketches_needs_a_full_train(bundle, tmp_path):
+    os.remove(os.path.join(bundle, "imputer_sketch.json"))
+    path = write_readings(tmp_path, cohort(100, seed=1))
+
+    with pytest.raises(SystemExit, match="run a full train.py"):
+        incremental.update(bundle, [path], str(tmp_path / "updated"), rounds=10)
@@ -0,0 +1,104 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+
+import train
+
+# Readings on and either side of every stage boundary
+SYSTOLIC  = [90, 119, 119.9, 120, 120.1, 129, 129.9, 130, 130.1, 139, 139.9, 140, 140.1, 180, np.nan]
+DIASTOLIC = [60, 79, 79.9, 80, 80.1, 89, 89.9, 90, 90.1, 110, np.nan]
+
+# Every SMQ020 and SMQ040 code, including refused (7), don't know (9) and missing
+SMQ020 = [1, 2, 7, 9, np.nan]
+SMQ040 = [1, 2, 3, 7, 9, np.nan]
+
+
+def classify(row):
+    """
+    This is the row-wise labelling train.py used before it was vectorised.
+    """
+    systolic, diastolic = row['systolic_bp'], row['diastolic_bp']
+
+    if pd.isna(systolic) or pd.isna(diastolic):
+        return np.nan
+
+    if systolic >= 140 or diastolic >= 90:
+        return 3
+
+    if systolic >= 130 or diastolic >= 80:
+        return 2
+
+    if 120 <= systolic < 130 and diastolic < 80:
+        return 1
+
+    return 0
+
+
+def recode(row):
+    """
+    This is the row-wise smoking recode train.py used before it was vectorised.
+    """
+    ever = row.get('SMQ020', np.nan)
+    now  = row.get('SMQ040', np.nan)
+    if pd.isna(ever): return np.nan
+    if ever == 2: return 0
+    if now in [1, 2]: return 2
+    return 1
+
+
+def boundary_readings():
+    pairs = list(itertools.product(SYSTOLIC, DIASTOLIC))
+    rng = np.random.default_rng(0)
+    random = np.round(rng.uniform([80, 50], [200, 130], size=(2000, 2)), 1)
+    return pd.DataFrame(pairs + random.tolist(), columns=["systolic_bp", "diastolic_bp"])
+
+
+def test_classify_blood_pressure_matches_row_wise():
+    df = boundary_readings()
+    expected = df.apply(classify, axis=1).to_numpy()
+
+    np.testing.assert_array_equal(train.classify_blood_pressure(df["systolic_bp"], df["diastolic_bp"]), expected)
+
+
+@pytest.mark.parametrize("systolic, diastolic, stage", [
+    (119.9, 79.9, 0),
+    (120,   79.9, 1),
+    (129.9, 79.9, 1),
+    (119,   80,   2),
+    (130,   70,   2),
+    (139.9, 89.9, 2),
+    (140,   60,   3),
+    (110,   90,   3),
+])
+def test_classify_blood_pressure_boundaries(systolic, diastolic, stage):
+    assert train.classify_blood_pressure([systolic], [diastolic])[0] == stage
+
+
+def test_classify_blood_pressure_leaves_missing_readings_missing():
+    stages = train.classify_blood_pressure([np.nan, 150, np.nan], [70, np.nan, np.nan])
+
+    assert np.isnan(stages).all()
+
+
+def test_label_hypertension_stages_drops_missing_readings():
+    df = boundary_readings()
+    labelled = train.label_hypertension_stages(df.copy())
+    expected = df.apply(classify, axis=1).dropna().astype(int)
+
+    pd.testing.assert_series_equal(labelled["hypertension_stage"], expected, check_names=False)
+
+
+def test_recode_smoking_matches_row_wise_for_every_code():
+    smoke = pd.DataFrame(list(itertools.product(SMQ020, SMQ040)), columns=["SMQ020", "SMQ040"])
+    expected = smoke.apply(recode, axis=1)
+
+    pd.testing.assert_series_equal(train.recode_smoking(smoke), expected, check_dtype=False)
+
+
+@pytest.mark.parametrize("column", ["SMQ020", "SMQ040"])
+def test_recode_smoking_matches_row_wise_without_a_column(column):
+    smoke = pd.DataFrame(list(itertools.product(SMQ020, SMQ040)), columns=["SMQ020", "SMQ040"]).drop(columns=column)
+    expected = smoke.apply(recode, axis=1)
+
+    pd.testing.assert_series_equal(train.recode_smoking(smoke), expected, check_dtype=False)
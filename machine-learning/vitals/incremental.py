@@ -0,0 +1,232 @@
+"""
+Incremental retraining on newly collected, labelled watch readings. Continues
+boosting the saved model on the new rows only, updates the imputer medians from
+their quantile sketches, and writes the updated bundle to a new directory, ready
+to deploy. Run from the machine-learning directory:
+
+    python3 ./vitals/incremental.py readings.csv --model ./vitals/output/model
+
+The bundle must have been saved by train.py with its imputer sketches and
+training parameters. The bundle checked into the repository predates them, so
+a full train.py run is needed before its first update.
+
+Files are read as CSV or Parquet, with a column per feature the readings have,
+and either hypertension_stage or systolic_bp and diastolic_bp to label them.
+Features missing from the readings are imputed, but rows with too few real
+features are left out. Passing a file that has grown since the last update only
+trains on its appended rows.
+
+Part of the new rows is held out, and the updated bundle is only saved if it
+scores as well as the current one on them.
+"""
+import argparse
+import copy
+import datetime as dt
+import json
+import logging
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+import train
+
+from sklearn.model_selection import train_test_split
+
+from sketch import sketch_from_dict
+
+
+INCREMENTAL_ROUNDS=int(os.getenv("INCREMENTAL_ROUNDS", "20"))
+
+# Rows need at least this fraction of the model's features before imputation.
+# Watch readings on their own only have heart rate, and rows that are mostly
+# imputed medians would pull the model towards them.
+INCREMENTAL_MIN_FEATURES=float(os.getenv("INCREMENTAL_MIN_FEATURES", "0.5"))
+
+# This fraction of the new rows is held out to compare the updated model with
+# the current one, rather than trained on
+INCREMENTAL_HOLDOUT=float(os.getenv("INCREMENTAL_HOLDOUT", "0.2"))
+
+
+def load_readings(path):
+    """
+    This loads a file of readings, as Parquet or else CSV.
+    """
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def new_rows(paths, sources):
+    """
+    This collects the rows of each file not used by an earlier update, where
+    sources maps each file to the number of its rows already used. A file with
+    fewer rows than that was replaced, so all of its rows are new.
+    """
+    frames = []
+    for path in paths:
+        df = load_readings(path)
+        key = os.path.abspath(path)
+        used = sources.get(key, 0)
+
+        if len(df) < used:
+            logging.warning(f"{path} has fewer rows than were used before, treating all as new")
+            used = 0
+
+        logging.info(f"Using {len(df) - used} new rows of {len(df)} from {path}")
+        frames.append(df.iloc[used:])
+        sources[key] = len(df)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def prepare(df):
+    """
+    This labels the readings and lays them out as the model's features. Derived
+    features are computed as in training when they are not given.
+    """
+    for column in ("systolic_bp", "diastolic_bp", "total_cholesterol", "hdl_cholesterol"):
+        if column not in df.columns:
+            df[column] = np.nan
+
+    if "hypertension_stage" not in df.columns:
+        df["hypertension_stage"] = train.classify_blood_pressure(df["systolic_bp"], df["diastolic_bp"])
+    if "chol_ratio" not in df.columns:
+        df = train.add_derived_features(df)
+
+    df = df.dropna(subset=["hypertension_stage"])
+    X = df.reindex(columns=train.FEATURES).astype(np.float64)
+
+    real = X.notna().mean(axis=1) >= INCREMENTAL_MIN_FEATURES
+    if not real.all():
+        logging.warning(
+            f"Leaving out {int((~real).sum())} of {len(X)} rows with under "
+            f"{INCREMENTAL_MIN_FEATURES:.0%} of the features present"
+        )
+    return X[real], df["hypertension_stage"].astype(int)[real]
+
+
+def split_holdout(X, y):
+    """
+    This holds out INCREMENTAL_HOLDOUT of the rows, stratified by stage where
+    every stage has enough rows for it.
+    """
+    counts = y.value_counts()
+    held_out = int(np.ceil(len(y) * INCREMENTAL_HOLDOUT))
+    stratified = counts.min() >= 2 and len(counts) <= min(held_out, len(y) - held_out)
+    return train_test_split(
+        X, y,
+        test_size=INCREMENTAL_HOLDOUT,
+        random_state=train.RANDOM_STATE,
+        stratify=y if stratified else None
+    )
+
+
+def update(model_directory, paths, output_directory, rounds):
+    """
+    This continues training the bundle in model_directory on the new rows from
+    paths, without touching the historical cohort, and saves the updated bundle
+    to output_directory.
+    """
+    with open(os.path.join(model_directory, "feature_schema.json")) as f:
+        schema = json.load(f)
+
+    sketch_path = os.path.join(model_directory, "imputer_sketch.json")
+    if not os.path.exists(sketch_path) or "training_params" not in schema:
+        raise SystemExit(
+            f"{model_directory} has no imputer sketches or training parameters to update from, "
+            "run a full train.py once to save a bundle with them"
+        )
+
+    with open(sketch_path) as f:
+        sketches = {feature: sketch_from_dict(state) for feature, state in json.load(f).items()}
+
+    imputer = joblib.load(os.path.join(model_directory, "imputer.pkl"))
+    booster = xgb.Booster(model_file=os.path.join(model_directory, "hypertension_model.json"))
+
+    incremental = schema.get("incremental", {"sources": {}, "updates": []})
+    X, y = prepare(new_rows(paths, incremental["sources"]))
+    if X.empty:
+        logging.info("No new labelled rows, nothing to update")
+        return None
+    if len(X) < 2:
+        raise SystemExit("At least two new labelled rows are needed, to train on one and hold out another")
+
+    X, X_holdout, y, y_holdout = split_holdout(X, y)
+    if y_holdout.nunique() < 2:
+        raise SystemExit(f"The {len(y_holdout)} held out rows need at least two stages to compare the models on")
+
+    # The current model is scored with its own imputer, before the medians move
+    reference = train.score_probabilities(
+        booster.predict(xgb.DMatrix(imputer.transform(X_holdout))), y_holdout
+    )
+    imputer = copy.deepcopy(imputer)
+
+    # The medians are updated from the sketches, which already summarise every
+    # row the imputer has been fitted on, so only the new rows are read. Coded
+    # features take their most common code, as train.py fits them, and features
+    # the readings do not have keep their values.
+    for i, feature in enumerate(train.FEATURES):
+        values = X[feature].to_numpy()
+        if not np.isnan(values).all():
+            sketch = sketches[feature].update(values)
+            imputer.statistics_[i] = sketch.mode() if feature in train.CATEGORIES else sketch.median()
+
+    X_imp = imputer.transform(X)
+    dnew = xgb.DMatrix(X_imp, label=y)
+    before = float(booster.eval(dnew).split(":")[-1])
+
+    # Boosting continues from the saved trees with the original training
+    # parameters, so each new round corrects the existing model's errors on the
+    # new rows at the same learning rate.
+    params = schema["training_params"]
+    start_rounds = booster.num_boosted_rounds()
+    booster = xgb.train(params, dnew, num_boost_round=rounds, xgb_model=booster)
+    after = float(booster.eval(dnew).split(":")[-1])
+
+    logging.info(
+        f"Added {rounds} rounds on {len(X)} rows ({start_rounds} -> {booster.num_boosted_rounds()}), "
+        f"log loss on the new rows {before:.4f} -> {after:.4f}"
+    )
+
+    scores = train.score_probabilities(
+        booster.predict(xgb.DMatrix(imputer.transform(X_holdout))), y_holdout
+    )
+    logging.info(f"Scores on {len(X_holdout)} held out rows: current {reference}, updated {scores}")
+
+    reasons = train.regressions(scores, reference)
+    if reasons:
+        raise SystemExit(f"The updated model regresses on the held out rows, not saving: {'; '.join(reasons)}")
+
+    sample = X_imp[:train.LATENCY_SAMPLE]
+    inference = {
+        "rounds": booster.num_boosted_rounds(),
+        "trees": booster.num_boosted_rounds() * len(train.STAGE_NAMES),
+        "latency_us": train.measure_latency(booster, sample),
+        "latency_sample_rows": len(sample),
+    }
+    incremental["updates"].append({
+        "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+        "rows": len(X),
+        "rounds": rounds,
+        "holdout_rows": len(X_holdout),
+        "new_rows_log_loss": {"before": round(before, 4), "after": round(after, 4)},
+        "holdout": {"before": reference, "after": scores},
+    })
+
+    train.save(booster, imputer, inference, sketches, params, directory=output_directory, incremental=incremental)
+    logging.info(f"Saved updated bundle to {output_directory}")
+    return output_directory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continue training the vitals model on new readings")
+    parser.add_argument("paths", nargs="+", help="CSV or Parquet files of labelled readings")
+    parser.add_argument("--model", default=f"{train.OUTPUT_DIRECTORY}/model", help="The bundle to update")
+    parser.add_argument("--output", default=None, help="Where to write the updated bundle")
+    parser.add_argument("--rounds", type=int, default=INCREMENTAL_ROUNDS, help="Boosting rounds to add")
+    args = parser.parse_args()
+
+    output = args.output or f"{train.OUTPUT_DIRECTORY}/model-{dt.datetime.now():%Y%m%d-%H%M%S}"
+    update(args.model, args.paths, output, args.rounds)
@@ -0,0 +1,129 @@
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    This is a streaming quantile sketch for one feature, used to keep imputer
+    medians up to date without another pass over the historical data.
+
+    Values are summarised as at most size centroids, each a mean and the number
+    of values it stands for. Adding values merges them in and compresses back to
+    equal-weight centroids, so memory stays fixed however many values are seen,
+    and quantiles are accurate to about 1/size of the distribution.
+    """
+
+    def __init__(self, size=256, means=(), weights=()):
+        self.size = size
+        self.means = np.asarray(means, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        """
+        This adds a batch of values to the sketch, ignoring missing ones.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, np.ones(len(values))])
+        order = np.argsort(means, kind="stable")
+        self.means, self.weights = means[order], weights[order]
+
+        if len(self.means) > self.size:
+            self._compress()
+        return self
+
+    def _compress(self):
+        # Sorted centroids are grouped into size buckets of about equal weight,
+        # by where each one starts in the cumulative weight.
+        starts = np.cumsum(self.weights) - self.weights
+        buckets = np.minimum((starts / self.count * self.size).astype(int), self.size - 1)
+        edges = np.flatnonzero(np.diff(buckets, prepend=-1))
+
+        weights = np.add.reduceat(self.weights, edges)
+        self.means = np.add.reduceat(self.means * self.weights, edges) / weights
+        self.weights = weights
+
+    def quantile(self, q):
+        """
+        This estimates the q-th quantile, interpolating between centroids, or
+        returns NaN when no values have been seen.
+        """
+        if not len(self.means):
+            return np.nan
+
+        midpoints = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.count, midpoints, self.means))
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def to_dict(self):
+        return {
+            "size": self.size,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state["size"], state["means"], state["weights"])
+
+
+class CategoryCounts:
+    """
+    This counts the values of one coded feature, such as gender or smoking
+    status, so its imputer value can be kept as the most common code. A median
+    of codes may fall between them, which is not a valid value.
+    """
+
+    def __init__(self, categories, counts=None):
+        self.categories = np.asarray(categories, dtype=np.float64)
+        self.counts = np.zeros(len(self.categories)) if counts is None else np.asarray(counts, dtype=np.float64)
+
+    @property
+    def count(self):
+        return float(self.counts.sum())
+
+    def update(self, values):
+        """
+        This adds a batch of values to the counts, ignoring missing values and
+        values that are not one of the categories.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        self.counts += (values[:, np.newaxis] == self.categories).sum(axis=0)
+        return self
+
+    def mode(self):
+        """
+        This returns the most common category, the lowest one on ties, or NaN
+        when no values have been seen.
+        """
+        if not self.count:
+            return np.nan
+        return float(self.categories[np.argmax(self.counts)])
+
+    def to_dict(self):
+        return {
+            "categories": self.categories.tolist(),
+            "counts": self.counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state["categories"], state["counts"])
+
+
+def sketch_from_dict(state):
+    """
+    This restores a saved QuantileSketch or CategoryCounts.
+    """
+    if "categories" in state:
+        return CategoryCounts.from_dict(state)
+    return QuantileSketch.from_dict(state)
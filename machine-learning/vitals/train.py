@@ -1,7 +1,8 @@
+import hashlib
 import json
 import joblib
 from sklearn.utils import compute_sample_weight
-from sklearn.metrics import classification_report, accuracy_score, roc_auc_score, confusion_matrix
+from sklearn.metrics import classification_report, accuracy_score, roc_auc_score, confusion_matrix, recall_score
 import pandas as pd
 import xgboost as xgb
 import numpy as np
@@ -9,11 +10,23 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 import logging
 import os
+import tempfile
+import time
 import warnings
 
-from sklearn.model_selection import train_test_split, GridSearchCV
+from concurrent.futures import ThreadPoolExecutor
+from sketch import CategoryCounts, QuantileSketch
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import train_test_split, GridSearchCV, HalvingGridSearchCV, RandomizedSearchCV
 from sklearn.impute import SimpleImputer
 
+try:
+    # The backend's compiled engine only needs NumPy, so with ../fast-backend on
+    # PYTHONPATH it is timed too, without importing the web app
+    from compiled_model import CompiledBooster
+except ImportError:
+    CompiledBooster = None
+
 warnings.filterwarnings('ignore')
 logging.basicConfig(
     level=logging.INFO,
@@ -22,8 +35,41 @@ logging.basicConfig(
 
 DATA_DIRECTORY="./vitals/NHANES_data"
 OUTPUT_DIRECTORY="./vitals/output"
+CACHE_DIRECTORY="./vitals/cache"
+# Set EXPORT_CSV=true to also write a CSV copy of every parsed XPT file
+EXPORT_CSV=os.getenv("EXPORT_CSV", "false").lower() == "true"
 RANDOM_STATE=42
 TEST_SIZE=0.2
+VALIDATION_SIZE=0.1
+CV_FOLDS=5
+# One of grid, halving or random, or several separated by commas to compare
+# them, in which case the best scoring model is kept.
+SEARCH_STRATEGY=os.getenv("SEARCH_STRATEGY", "halving")
+SEARCH_ITERATIONS=int(os.getenv("SEARCH_ITERATIONS", "30"))
+EARLY_STOPPING_ROUNDS=int(os.getenv("EARLY_STOPPING_ROUNDS", "30"))
+# The served model is pruned to the fewest boosting rounds whose validation AUC
+# is within AUC_TOLERANCE of the full model, and whose recall for every stage is
+# within RECALL_TOLERANCE of it.
+AUC_TOLERANCE=float(os.getenv("AUC_TOLERANCE", "0.002"))
+RECALL_TOLERANCE=float(os.getenv("RECALL_TOLERANCE", "0.01"))
+PRUNE_ROUNDS=[25, 50, 75, 100, 150, 200, 300, 400, 600, 800]
+LATENCY_SAMPLE=200
+# A new model only replaces the shipped model when it is within the same
+# tolerances of it on the test set. Otherwise it is saved to CANDIDATE_DIRECTORY.
+SHIPPED_MODEL_DIRECTORY=os.getenv("SHIPPED_MODEL_DIRECTORY", f"{OUTPUT_DIRECTORY}/model")
+CANDIDATE_DIRECTORY=f"{OUTPUT_DIRECTORY}/candidate"
+
+# Early stopping on the validation fold picks the number of trees, up to
+# MAX_ESTIMATORS, so it does not need to be searched for.
+MAX_ESTIMATORS=1000
+
+PARAM_GRID = {
+    'max_depth': [4, 6, 8],
+    'learning_rate': [0.01, 0.05, 0.1],
+    'min_child_weight': [3, 5, 7],
+    'subsample': [0.7, 0.8],
+    'colsample_bytree': [0.7, 0.8],
+}
 
 FEATURES = [
     "age",
@@ -51,29 +97,108 @@ STAGE_NAMES = {
 
 def make_output_dirs():
     """
-    This creates the model output directory if it doesn't already exist.
+    This creates the model output and cache directories if they don't already
+    exist.
     """
     logging.info(f"Creating output directory {OUTPUT_DIRECTORY}")
     os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
+    os.makedirs(CACHE_DIRECTORY, exist_ok=True)
  
    
+def file_digest(path):
+    """
+    This hashes a file's contents, used to key cached copies of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_digest(path):
+    """
+    This returns the digest of a source file. The digest is kept alongside the
+    file's modification time and size in the cache, so it is only recomputed once
+    the file changes on disk.
+    """
+    stat = os.stat(path)
+    stamp_path = os.path.join(CACHE_DIRECTORY, os.path.basename(path) + ".json")
+    stamp = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as f:
+            cached = json.load(f)
+        if cached["mtime_ns"] == stamp["mtime_ns"] and cached["size"] == stamp["size"]:
+            return cached["digest"]
+
+    stamp["digest"] = file_digest(path)
+    with open(stamp_path, "w") as f:
+        json.dump(stamp, f)
+
+    return stamp["digest"]
+
+
+def downcast(df):
+    """
+    This shrinks the float64 columns produced by read_sas without changing any
+    value: whole-number columns without missing values become the smallest
+    integer type, and the rest become float32 where every value survives the
+    round trip.
+    """
+    for column in df.columns:
+        values = df[column]
+        if values.dtype != np.float64:
+            continue
+
+        if values.notna().all() and (values % 1 == 0).all():
+            df[column] = pd.to_numeric(values, downcast="integer")
+            continue
+
+        narrowed = values.astype(np.float32)
+        if ((narrowed.astype(np.float64) == values) | values.isna()).all():
+            df[column] = narrowed
+
+    return df
+
+
 def load_xpt(filename):
     """
     This loads individual XPT files into a Pandas DataFrame. It will log
     an error when an invalid path is passed in.
+
+    Parsed files are cached as Parquet under CACHE_DIRECTORY, keyed by the
+    source file's hash, so later runs skip parsing the XPT file entirely.
     """
     path = os.path.join(DATA_DIRECTORY, filename)
     
     if not os.path.exists(path):
         logging.error(f"{path} is not a valid path, skipping")
         return pd.DataFrame()
-        
-    df = pd.read_sas(path, format='xport', encoding='utf-8')
-    
-    output_path = os.path.join(OUTPUT_DIRECTORY, filename.replace('.XPT', '.csv'))
-    
-    df.to_csv(output_path, index=False)
-    logging.info(f"Saved CSV output to: {output_path}")
+
+    name = filename.replace('.XPT', '')
+    cache_path = os.path.join(CACHE_DIRECTORY, f"{name}-{source_digest(path)[:16]}.parquet")
+
+    if os.path.exists(cache_path):
+        df = pd.read_parquet(cache_path)
+        logging.info(f"Loaded cached {filename} from: {cache_path}")
+    else:
+        df = downcast(pd.read_sas(path, format='xport', encoding='utf-8'))
+
+        # Cached copies of earlier versions of this file are no longer needed
+        for stale in os.listdir(CACHE_DIRECTORY):
+            if stale.startswith(f"{name}-") and stale.endswith(".parquet"):
+                os.remove(os.path.join(CACHE_DIRECTORY, stale))
+
+        temporary = f"{cache_path}.{os.getpid()}"
+        df.to_parquet(temporary, index=False)
+        os.replace(temporary, cache_path)
+        logging.info(f"Cached {filename} to: {cache_path}")
+
+    if EXPORT_CSV:
+        output_path = os.path.join(OUTPUT_DIRECTORY, filename.replace('.XPT', '.csv'))
+        df.to_csv(output_path, index=False)
+        logging.info(f"Saved CSV output to: {output_path}")
     
     return df
   
@@ -81,179 +206,192 @@ def load_xpt(filename):
 def load_xpt_files():
     """
     This attempts to load all NHANES XPT data files. We neatly return this
-    data in a dictionary.
+    data in a dictionary. The files are loaded concurrently, as reading them is
+    mostly waiting on disk and decompression.
     """
     logging.info("Attempting to load all .xpt files")
-    
-    return {
-        "bp": load_xpt("P_BPXO.XPT"), 
-        "demo": load_xpt("P_DEMO.XPT"),
-        "bmi": load_xpt("P_BMX.XPT"),
-        "chol": load_xpt("P_TCHOL.XPT"),
-        "hdl": load_xpt("P_HDL.XPT"),
-        "glu": load_xpt("P_GLU.XPT"),
-        "smoke": load_xpt("P_SMQ.XPT"),
-        "kidney": load_xpt("P_BIOPRO.XPT")
+
+    filenames = {
+        "bp": "P_BPXO.XPT",
+        "demo": "P_DEMO.XPT",
+        "bmi": "P_BMX.XPT",
+        "chol": "P_TCHOL.XPT",
+        "hdl": "P_HDL.XPT",
+        "glu": "P_GLU.XPT",
+        "smoke": "P_SMQ.XPT",
+        "kidney": "P_BIOPRO.XPT"
     }
 
+    with ThreadPoolExecutor(max_workers=len(filenames)) as executor:
+        frames = executor.map(load_xpt, filenames.values())
+        return dict(zip(filenames, frames))
+
 
-def extract_bp(xpt_files):
+def mean_readings(columns):
     """
-    This extracts relevant features from the BP file.
+    This returns a getter for the average of repeated readings, such as the three
+    blood pressure measurements, over whichever of the columns are present.
     """
-    logging.info("Extracting features from Blood Pressure data")
-    
-    bp = xpt_files["bp"]
-    
-    # We need to obtain the columns we're interested in, namely systolic
-    # and diastolic bp.
-    sys_cols = [c for c in ['BPXOSY1','BPXOSY2','BPXOSY3'] if c in bp.columns]
-    dia_cols = [c for c in ['BPXODI1','BPXODI2','BPXODI3'] if c in bp.columns]
-
-    # This will obtain average systolic and diastolic bp values for
-    # each row.
-    df = bp[['SEQN']].copy()
-    df['systolic_bp']  = bp[sys_cols].mean(axis=1)
-    df['diastolic_bp'] = bp[dia_cols].mean(axis=1)
-    df['heart_rate']   = bp['BPXOPLS1'] if 'BPXOPLS1' in bp.columns else np.nan
-    
-    return df
+    def getter(frame):
+        present = [c for c in columns if c in frame.columns]
+        return frame[present].mean(axis=1)
 
+    return getter
 
-def extract_demo(df, xpt_files):
-    """
-    This extracts relevant features from the DEMO file.
-    """
-    logging.info("Extracting features from Demographics data")
-    
-    demo = xpt_files['demo']
-    if not demo.empty:
-        df['age']    = demo.set_index('SEQN')['RIDAGEYR'].reindex(df['SEQN']).values
-        df['gender'] = demo.set_index('SEQN')['RIAGENDR'].reindex(df['SEQN']).map({1:0, 2:1}).values
 
-    return df
-    
-    
-def extract_bmi(df, xpt_files):
+def recode_column(column, mapping):
     """
-    This extracts relevant features from the BMI file.
+    This returns a getter that maps a coded column's values to our own codes.
     """
-    logging.info("Extracting features from BMI data")
-    
-    bmi = xpt_files['bmi']
-    if not bmi.empty and 'BMXBMI' in bmi.columns:
-        df['bmi'] = bmi.set_index('SEQN')['BMXBMI'].reindex(df['SEQN']).values
-    
-    return df
-    
-    
-def extract_total_chol(df, xpt_files):
-    """
-    This extracts relevant features from the TOTAL CHOL file.
-    """
-    logging.info("Extracting features from Total Cholesterol data")
-    
-    chol = xpt_files['chol']
-    if not chol.empty and 'LBXTC' in chol.columns:
-        df['total_cholesterol'] = chol.set_index('SEQN')['LBXTC'].reindex(df['SEQN']).values
-    
-    return df
+    def getter(frame):
+        if column not in frame.columns:
+            return pd.Series(np.nan, index=frame.index)
+        return frame[column].map(mapping)
 
+    return getter
 
-def extract_high_chol(df, xpt_files):
-    """
-    This extracts relevant features from the HIGH CHOL file.
-    """
-    logging.info("Extracting features from High Cholesterol data")
-    
-    hdl = xpt_files['hdl']
-    if not hdl.empty and 'LBDHDD' in hdl.columns:
-        df['hdl_cholesterol'] = hdl.set_index('SEQN')['LBDHDD'].reindex(df['SEQN']).values
-    
-    return df
-        
-        
-def extract_glucose(df, xpt_files):
+
+def recode_smoking(smoke):
     """
-    This extracts relevant features from the Glucose file.
+    This encodes smoking status from the SMQ020 (smoked 100 cigarettes in life)
+    and SMQ040 (smokes now) answers, for every respondent at once:
+        0: Never smoked
+        1: Former smoker
+        2: Current smoker
+    Respondents who did not answer SMQ020 are left missing.
     """
-    logging.info("Extracting features from Glucose data")
-    
-    glu = xpt_files['glu']
-    if not glu.empty and 'LBXGLU' in glu.columns:
-        df['fasting_glucose'] = glu.set_index('SEQN')['LBXGLU'].reindex(df['SEQN']).values
- 
-    return df 
-    
-    
-def extract_smoking(df, xpt_files):
+    missing = pd.Series(np.nan, index=smoke.index)
+    ever = smoke['SMQ020'] if 'SMQ020' in smoke.columns else missing
+    now  = smoke['SMQ040'] if 'SMQ040' in smoke.columns else missing
+
+    status = np.select(
+        [ever.isna(), ever == 2, now.isin([1, 2])],
+        [np.nan, 0, 2],
+        default=1
+    )
+    return pd.Series(status, index=smoke.index)
+
+
+# Every column of the dataset, grouped by the NHANES file it comes from. Each
+# is either the name of a column in that file, or a function of the whole file.
+SOURCE_COLUMNS = {
+    "bp": {
+        "systolic_bp":  mean_readings(['BPXOSY1', 'BPXOSY2', 'BPXOSY3']),
+        "diastolic_bp": mean_readings(['BPXODI1', 'BPXODI2', 'BPXODI3']),
+        "heart_rate":   'BPXOPLS1',
+    },
+    "demo": {
+        "age":    'RIDAGEYR',
+        "gender": recode_column('RIAGENDR', {1: 0, 2: 1}),
+    },
+    "bmi":    {"bmi": 'BMXBMI'},
+    "chol":   {"total_cholesterol": 'LBXTC'},
+    "hdl":    {"hdl_cholesterol": 'LBDHDD'},
+    "glu":    {"fasting_glucose": 'LBXGLU'},
+    "smoke":  {"smoking_status": recode_smoking},
+    "kidney": {"creatinine": 'LBXSCR'},
+}
+
+# Coded columns are stored as categories, everything else as float32
+CATEGORIES = {
+    "gender":         [0, 1],
+    "smoking_status": [0, 1, 2],
+}
+
+
+def extract_source(name, frame):
     """
-    This extracts relevant features from the Smoking file.
+    This extracts one source's columns from its NHANES file, indexed by SEQN and
+    stored in compact dtypes. Columns missing from the file are left empty.
     """
-    logging.info("Extracting features from Smoking data")
-   
-    smoke = xpt_files['smoke']
-    smoke = smoke.set_index('SEQN')
-    
-    def recode(row):
-        ever = row.get('SMQ020', np.nan)
-        now  = row.get('SMQ040', np.nan)
-        if pd.isna(ever): return np.nan
-        # Here we just encode smoking status
-        # 0: Never smoked
-        # 1: Current smoker
-        # 2: Former smoker
-        if ever == 2: return 0
-        if now in [1, 2]: return 2
-        return 1                 
-        
-    df['smoking_status'] = smoke.apply(recode, axis=1).reindex(df['SEQN']).values
+    logging.info(f"Extracting {', '.join(SOURCE_COLUMNS[name])} from {name} data")
 
-    return df
+    if 'SEQN' not in frame.columns:
+        logging.error(f"No {name} data found, its columns will be empty")
+        frame = pd.DataFrame({'SEQN': pd.Series(dtype=np.int32)})
+
+    frame = frame.set_index('SEQN')
+    columns = {}
+
+    for column, source in SOURCE_COLUMNS[name].items():
+        if callable(source):
+            values = source(frame)
+        elif source in frame.columns:
+            values = frame[source]
+        else:
+            logging.error(f"{source} is missing from {name} data, {column} will be empty")
+            values = pd.Series(np.nan, index=frame.index)
+
+        if column in CATEGORIES:
+            columns[column] = pd.Categorical(values, categories=CATEGORIES[column])
+        else:
+            columns[column] = values.to_numpy(dtype=np.float32)
+
+    return pd.DataFrame(columns, index=frame.index)
 
 
-def extract_kidney(df, xpt_files):
+def add_derived_features(df):
     """
-    This extracts relevant features from the Kidney file.
+    This computes the derived features for the whole dataset at once.
     """
-    logging.info("Extracting features from Kidney data")
-    
-    kidney = xpt_files['kidney']
-    if not kidney.empty and 'LBXSCR' in kidney.columns:
-        df['creatinine'] = kidney.set_index('SEQN')['LBXSCR'].reindex(df['SEQN']).values
-        
-    return df
+    pulse_pressure = df['systolic_bp'] - df['diastolic_bp']
 
-   
-def build_dataset(xpt_files):
+    return df.assign(
+        pulse_pressure=pulse_pressure,
+        map=df['diastolic_bp'] + (pulse_pressure / 3),
+        chol_ratio=df['total_cholesterol'] / df['hdl_cholesterol'].where(df['hdl_cholesterol'] != 0)
+    )
+
+
+def build_dataset(*cycles):
     """
-    This combines relevant features into a coherent dataset.
+    This combines relevant features into a coherent dataset, with one row per
+    respondent with a blood pressure reading.
+
+    Each argument is one NHANES cycle's files, as returned by load_xpt_files.
+    Only the needed columns are extracted from each file, and each source's
+    cycles are stacked before a single join on SEQN, which is unique across
+    cycles, so adding cycles grows memory with the extracted columns only.
     """
-    logging.info("")
-    
-    bp_df = extract_bp(xpt_files)
-    
-    demo_df = extract_demo(bp_df, xpt_files)
-    bmi_df = extract_bmi(demo_df, xpt_files)
-    total_chol_df = extract_total_chol(bmi_df, xpt_files)
-    high_chol_df = extract_high_chol(total_chol_df, xpt_files)
-    glucose_df = extract_glucose(high_chol_df, xpt_files)
-    smoking_df = extract_smoking(glucose_df, xpt_files)
-    kidney_df = extract_kidney(smoking_df, xpt_files)
-    
-    # We can compute derived features
-    df = kidney_df
-    
-    df['pulse_pressure'] = df['systolic_bp'] - df['diastolic_bp']
-    df['map']            = df['diastolic_bp'] + (df['pulse_pressure'] / 3)
-    df['chol_ratio']     = df['total_cholesterol'] / df['hdl_cholesterol'].replace(0, np.nan) 
-    
+    logging.info(f"Building dataset from {len(cycles)} NHANES cycle(s)")
+
+    sources = {
+        name: pd.concat([extract_source(name, xpt_files[name]) for xpt_files in cycles])
+        for name in SOURCE_COLUMNS
+    }
+
+    cohort = sources.pop("bp")
+    df = cohort.join(list(sources.values()), how="left")
+    df = add_derived_features(df.reset_index())
+
     logging.info("Finished building dataset")
     print("\n\n", df, "\n\n")
     
     return df
     
     
+def classify_blood_pressure(systolic, diastolic):
+    """
+    This stages blood pressure readings in bulk, returning 0-3 for each pair of
+    readings, or NaN where either reading is missing.
+    """
+    systolic  = np.asarray(systolic, dtype=np.float64)
+    diastolic = np.asarray(diastolic, dtype=np.float64)
+
+    # The first matching condition wins, so each one only needs to rule in its
+    # own stage.
+    return np.select(
+        [
+            np.isnan(systolic) | np.isnan(diastolic),
+            (systolic >= 140) | (diastolic >= 90),
+            (systolic >= 130) | (diastolic >= 80),
+            systolic >= 120,
+        ],
+        [np.nan, 3, 2, 1],
+        default=0
+    )
+
+
 def label_hypertension_stages(df, save=False):
     """
     This adds a hypertension stage label to our dataset.
@@ -266,25 +404,7 @@ def label_hypertension_stages(df, save=False):
     """
     logging.info("Labeling hypertension stages")
     
-    def classify(row):
-        systolic, diastolic = row['systolic_bp'], row['diastolic_bp']
-        
-        # This should not happen
-        if pd.isna(systolic) or pd.isna(diastolic): 
-            return np.nan
-            
-        if systolic >= 140 or diastolic >= 90:
-            return 3
-            
-        if systolic >= 130 or diastolic >= 80:  
-            return 2
-            
-        if 120 <= systolic < 130 and diastolic < 80: 
-            return 1 
-        
-        return 0
-          
-    df['hypertension_stage'] = df.apply(classify, axis=1)
+    df['hypertension_stage'] = classify_blood_pressure(df['systolic_bp'], df['diastolic_bp'])
     df = df.dropna(subset=['hypertension_stage'])
     df['hypertension_stage'] = df['hypertension_stage'].astype(int)  
     
@@ -315,20 +435,25 @@ def train(df):
         stratify=y
     )
     
-    # This imputer will replace missing values using median data.
-    imputer = SimpleImputer(strategy='median')
-    X_train_imp = imputer.fit_transform(X_train)
-    X_test_imp  = imputer.transform(X_test)
-    
-    param_grid = {
-        'n_estimators': [200, 300, 400],
-        'max_depth': [4, 6, 8],
-        'learning_rate': [0.01, 0.05, 0.1],
-        'min_child_weight': [3, 5, 7],
-        'subsample': [0.7, 0.8],
-        'colsample_bytree': [0.7, 0.8],
-    }
-  
+    imputer, sketches = fit_imputer(X_train)
+    X_train_imp = imputer.transform(X_train)
+
+    # A validation fold is held out of the search, so every fit can stop adding
+    # trees once the validation log loss stops improving.
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train_imp,
+        y_train,
+        test_size=VALIDATION_SIZE,
+        random_state=RANDOM_STATE,
+        stratify=y_train
+    )
+
+    # The cores are split between CV workers and XGBoost threads, rather than
+    # both trying to use every core at once.
+    cores = os.cpu_count() or 1
+    cv_jobs = min(CV_FOLDS, cores)
+    xgb_jobs = max(1, cores // cv_jobs)
+
     # Extreme Gradient Boosting (XGBoost)
     # 
     # We are using decision trees as our base learners, then we combine
@@ -337,44 +462,272 @@ def train(df):
     # 
     # We use multi-class soft-max as the objective function.
     # We are also predicting 4 hypertension classes.
-    # Each decision tree may grow to a max depth of 6, with a learning rate at 0.05.
+    # Tree depth and learning rate are searched for below, while early stopping
+    # decides the number of trees.
     # 
-    # Each tree may only use 80% of samples and training rows, to prevent over-fitting.
+    # Each tree may only use a sample of training rows and columns, to prevent over-fitting.
     # 
     # Alpha (L1 / Lasso) and Lambda (L2 / Ridge) regularization are used to improve model accuracy.
     # L1 will push small weights towards 0, L2 will punish large weights.
     # 
     # Logarithmic loss as the performance metric.
     # 
-    # Finally we set n_job to -1 to utilize all CPU cores.
+    # Histogram-based splitting bins every feature once up front, which is much
+    # faster than the exact method at this size and gives equally good trees.
     xgb_model = xgb.XGBClassifier(
         objective='multi:softprob',
         num_class=4,
+        n_estimators=MAX_ESTIMATORS,
         reg_alpha=0.1,
         reg_lambda=1.0,
         gamma=0.1,
         eval_metric='mlogloss',
+        tree_method='hist',
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
         random_state=RANDOM_STATE,
-        n_jobs=-1
+        n_jobs=xgb_jobs
     )
-    
-    grid_search = GridSearchCV(
-        estimator=xgb_model,
-        param_grid=param_grid,
+    logging.info(f"Searching with {cv_jobs} CV workers of {xgb_jobs} XGBoost threads each")
+
+    best = None
+    for strategy in SEARCH_STRATEGY.split(","):
+        search = make_search(strategy.strip(), xgb_model, cv_jobs)
+
+        start = time.perf_counter()
+        search.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        elapsed = time.perf_counter() - start
+
+        logging.info(
+            f"{strategy} search: {len(search.cv_results_['params'])} candidate evaluations in {elapsed:.1f}s, "
+            f"best CV AUC {search.best_score_:.4f}, "
+            f"{search.best_estimator_.best_iteration + 1} trees after early stopping"
+        )
+        logging.info(f"{strategy} best params: {search.best_params_}")
+
+        if best is None or search.best_score_ > best.best_score_:
+            best = search
+
+    return best.best_estimator_, imputer, sketches, X_val, y_val, X_test, y_test
+
+
+def fit_imputer(X):
+    """
+    This fits the imputer on the training rows, along with the sketches that
+    incremental training later updates its values from. Missing values are
+    replaced with medians, except coded features, which take their most common
+    code, as a median can fall between codes.
+    """
+    imputer = SimpleImputer(strategy='median').fit(X)
+    sketches = sketch_features(X)
+    for i, feature in enumerate(FEATURES):
+        if feature in CATEGORIES:
+            imputer.statistics_[i] = sketches[feature].mode()
+    return imputer, sketches
+
+
+def sketch_features(X):
+    """
+    This summarises every feature's distribution as a quantile sketch, or as
+    counts of each code for coded features, so the imputer values can later be
+    updated from new data alone.
+    """
+    return {
+        feature: (
+            CategoryCounts(CATEGORIES[feature]) if feature in CATEGORIES else QuantileSketch()
+        ).update(X[feature].astype(np.float64).to_numpy())
+        for feature in FEATURES
+    }
+
+
+def make_search(strategy, estimator, n_jobs):
+    """
+    This builds the hyperparameter search for a strategy, all over the same
+    PARAM_GRID so their scores can be compared:
+        grid:    every combination, fully cross-validated
+        halving: every combination on a small sample of rows, with only the best
+                 third going on to each round with three times as many rows
+        random:  SEARCH_ITERATIONS combinations drawn at random
+    """
+    options = dict(
+        estimator=estimator,
         scoring='roc_auc_ovr_weighted',
-        cv=5,
-        verbose=2,
-        n_jobs=-1
+        cv=CV_FOLDS,
+        verbose=1,
+        n_jobs=n_jobs
     )
-    
-    grid_search.fit(X_train_imp, y_train)
-    
-    logging.info(f"Best params: {grid_search.best_params_}")
-    logging.info(f"Best CV AUC: {grid_search.best_score_:.4f}")
-    
-    xgb_model = grid_search.best_estimator_
-    
-    return xgb_model, imputer, X_test, y_test
+
+    if strategy == "grid":
+        return GridSearchCV(param_grid=PARAM_GRID, **options)
+    if strategy == "halving":
+        return HalvingGridSearchCV(param_grid=PARAM_GRID, factor=3, random_state=RANDOM_STATE, **options)
+    if strategy == "random":
+        return RandomizedSearchCV(
+            param_distributions=PARAM_GRID,
+            n_iter=SEARCH_ITERATIONS,
+            random_state=RANDOM_STATE,
+            **options
+        )
+
+    raise ValueError(f"Unknown SEARCH_STRATEGY: {strategy}")
+
+
+def measure_latency(booster, X_sample):
+    """
+    This times a booster scoring each already imputed sample row one at a time,
+    as the backend does for a request, with each of its engines. The compiled
+    engine is only timed when it can be imported. Returns the p50 and p99
+    latency per engine in microseconds.
+    """
+    # XGBClassifier.predict_proba is a thin wrapper over in-place prediction
+    engines = {"xgboost": booster.inplace_predict}
+    if CompiledBooster is not None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "model.json")
+            booster.save_model(path)
+            compiled = CompiledBooster(path)
+        engines["compiled"] = lambda row: compiled.predict_row(row[0])
+
+    rows = [row[np.newaxis, :] for row in X_sample.astype(np.float32)]
+    latency = {}
+    for engine, predict in engines.items():
+        for row in rows[:20]:
+            predict(row)
+
+        timings = []
+        for _ in range(5):
+            for row in rows:
+                start = time.perf_counter()
+                predict(row)
+                timings.append(time.perf_counter() - start)
+
+        timings = np.array(timings) * 1e6
+        latency[engine] = {
+            "p50_us": round(float(np.percentile(timings, 50)), 1),
+            "p99_us": round(float(np.percentile(timings, 99)), 1),
+        }
+
+    return latency
+
+
+def score(model, X, y):
+    """
+    This scores a model on imputed rows: weighted AUC, accuracy and the recall
+    of every stage.
+    """
+    return score_probabilities(model.predict_proba(X), y)
+
+
+def score_probabilities(probs, y):
+    """
+    This scores predicted stage probabilities as score does. Stages missing
+    from y, as in a small holdout, count towards neither AUC nor recall.
+    """
+    recall = recall_score(y, probs.argmax(axis=1), labels=list(STAGE_NAMES), average=None, zero_division=0)
+    return {
+        "auc": round(roc_auc_score(y, probs, multi_class='ovr', average='weighted', labels=list(STAGE_NAMES)), 4),
+        "accuracy": round(accuracy_score(y, probs.argmax(axis=1)), 4),
+        "recall": {STAGE_NAMES[stage]: round(float(r), 4) for stage, r in zip(STAGE_NAMES, recall)},
+    }
+
+
+def regressions(scores, reference):
+    """
+    This lists every way scores fall short of reference scores by more than
+    AUC_TOLERANCE or RECALL_TOLERANCE, empty when they do not.
+    """
+    reasons = []
+    if scores["auc"] < reference["auc"] - AUC_TOLERANCE:
+        reasons.append(f"AUC {reference['auc']} -> {scores['auc']}")
+    for stage, recall in reference["recall"].items():
+        if scores["recall"][stage] < recall - RECALL_TOLERANCE:
+            reasons.append(f"{stage} recall {recall} -> {scores['recall'][stage]}")
+    return reasons
+
+
+def prune(model, imputer, X_val, y_val, X_test, y_test):
+    """
+    This cuts the trained booster down to its first boosting rounds, trying a
+    range of sizes. X_val is the already imputed validation fold from training.
+    For each size, it prints validation and test scores with every stage's test
+    recall, model size and inference latency. It returns the smallest model
+    whose validation scores do not regress against the full model, with its
+    report.
+    """
+    logging.info("Pruning the model to the fewest trees within the AUC and recall tolerances")
+    if CompiledBooster is None:
+        logging.info("compiled_model is not importable, add ../fast-backend to PYTHONPATH to time the compiled engine")
+
+    booster = model.get_booster()
+    # Early stopping leaves the rounds after the best one in the booster
+    total = model.best_iteration + 1
+    X_test_imp = imputer.transform(X_test)
+    X_sample   = X_test_imp[np.random.default_rng(RANDOM_STATE).choice(len(X_test_imp), LATENCY_SAMPLE, replace=False)]
+
+    candidates = []
+    for rounds in sorted({r for r in PRUNE_ROUNDS if r < total} | {total}):
+        pruned = xgb.XGBClassifier()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "model.json")
+            booster[:rounds].save_model(path)
+            pruned.load_model(path)
+            size_kb = os.path.getsize(path) / 1024
+
+        candidates.append((pruned, {
+            "rounds": rounds,
+            "trees": rounds * len(STAGE_NAMES),
+            "size_kb": round(size_kb, 1),
+            "validation": score(pruned, X_val, y_val),
+            "test": score(pruned, X_test_imp, y_test),
+            "latency_us": measure_latency(pruned.get_booster(), X_sample),
+        }))
+
+    recall_header = " ".join(f"{name + ' R':>14}" for name in STAGE_NAMES.values())
+    print(f"\n  {'Rounds':>6} {'Trees':>6} {'Size KB':>9} {'Val AUC':>8} {'Test AUC':>9} {'Test Acc':>9} {recall_header} {'XGBoost p50/p99 us':>20} {'Compiled p50/p99 us':>21}")
+    for _, report in candidates:
+        xgboost = report["latency_us"]["xgboost"]
+        compiled = report["latency_us"].get("compiled", {"p50_us": "-", "p99_us": "-"})
+        recalls = " ".join(f"{r:>14}" for r in report["test"]["recall"].values())
+        print(
+            f"  {report['rounds']:>6} {report['trees']:>6} {report['size_kb']:>9} {report['validation']['auc']:>8} "
+            f"{report['test']['auc']:>9} {report['test']['accuracy']:>9} {recalls} "
+            f"{xgboost['p50_us']:>9} / {xgboost['p99_us']:<8} {compiled['p50_us']:>9} / {compiled['p99_us']:<9}"
+        )
+
+    full = candidates[-1][1]["validation"]
+    pruned, report = next(c for c in candidates if not regressions(c[1]["validation"], full))
+    report["latency_sample_rows"] = LATENCY_SAMPLE
+    print(
+        f"\n  Keeping {report['trees']} trees, validation AUC {report['validation']['auc']} and recall "
+        f"{report['validation']['recall']} against {full['auc']} and {full['recall']} for all {candidates[-1][1]['trees']}\n"
+    )
+
+    return pruned, report
+
+
+def compare_with_shipped(model, imputer, test_rows, y_test, directory=SHIPPED_MODEL_DIRECTORY):
+    """
+    This scores a new model and the model shipped in directory on the same test
+    rows, each with its own features and imputer. It returns the shipped model's
+    scores and every way the new model regresses against them, or None and no
+    regressions when nothing has been shipped yet.
+    """
+    model_path = os.path.join(directory, "hypertension_model.json")
+    if not os.path.exists(model_path):
+        logging.info(f"No shipped model in {directory} to compare against")
+        return None, []
+
+    with open(os.path.join(directory, "feature_schema.json")) as f:
+        features = json.load(f)["features"]
+    shipped = xgb.XGBClassifier()
+    shipped.load_model(model_path)
+    shipped_imputer = joblib.load(os.path.join(directory, "imputer.pkl"))
+
+    reference = score(shipped, shipped_imputer.transform(test_rows.reindex(columns=features)), y_test)
+    scores = score(model, imputer.transform(test_rows[FEATURES]), y_test)
+    logging.info(f"Shipped model test scores: {reference}")
+    logging.info(f"New model test scores: {scores}")
+
+    return reference, regressions(scores, reference)
 
 
 def evaluate(model, X_test, y_test):
@@ -424,23 +777,47 @@ def evaluate(model, X_test, y_test):
     print(f"\n  Plots saved to {OUTPUT_DIRECTORY}/images")
     
     
-def save(model, imputer):
+def training_params(model):
+    """
+    This returns the booster parameters a model was trained with. The saved
+    model keeps its trees but not these, and incremental training needs them to
+    carry on the same way.
+    """
+    return {
+        name: value
+        for name, value in model.get_xgb_params().items()
+        if value is not None and name != "n_jobs"
+    }
+
+
+def save(model, imputer, inference, sketches, params, directory=None, incremental=None):
+    """
+    This saves a model bundle, by default to the model output directory. For an
+    incrementally updated bundle, incremental records the updates it has had.
+    """
     logging.info("Saving model")
     
-    FINAL_OUTPUT_DIRECTORY = f"{OUTPUT_DIRECTORY}/model"
+    FINAL_OUTPUT_DIRECTORY = directory or f"{OUTPUT_DIRECTORY}/model"
     os.makedirs(FINAL_OUTPUT_DIRECTORY, exist_ok=True)
 
     model_path   = f"{FINAL_OUTPUT_DIRECTORY}/hypertension_model.json"
     imputer_path = f"{FINAL_OUTPUT_DIRECTORY}/imputer.pkl"
     schema_path  = f"{FINAL_OUTPUT_DIRECTORY}/feature_schema.json"
+    sketch_path  = f"{FINAL_OUTPUT_DIRECTORY}/imputer_sketch.json"
 
     model.save_model(model_path)
     joblib.dump(imputer, imputer_path)
 
+    with open(sketch_path, 'w') as f:
+        json.dump({feature: sketch.to_dict() for feature, sketch in sketches.items()}, f)
+
     with open(schema_path, 'w') as f:
         json.dump({
             "features": FEATURES,
             "stages": STAGE_NAMES,
+            "inference": inference,
+            "training_params": params,
+            **({"incremental": incremental} if incremental else {}),
             "phase2_features": [
                 "avg_sleep_hours",
                 "stress_level",
@@ -461,10 +838,23 @@ def main():
     dataset = build_dataset(xpt_files)
     
     df = label_hypertension_stages(dataset, save=True)
-    model, imputer, X_test, y_test = train(df)
+    model, imputer, sketches, X_val, y_val, X_test, y_test = train(df)
+    params = training_params(model)
+    model, inference = prune(model, imputer, X_val, y_val, X_test, y_test)
     
     evaluate(model, X_test, y_test)
-    save(model, imputer)
+
+    # The new model is only promoted when it holds up against the shipped one
+    shipped, reasons = compare_with_shipped(model, imputer, df.loc[X_test.index], y_test)
+    inference["shipped_test"] = shipped
+    if reasons:
+        save(model, imputer, inference, sketches, params, directory=CANDIDATE_DIRECTORY)
+        raise SystemExit(
+            f"Not promoting the new model, it regresses against {SHIPPED_MODEL_DIRECTORY}: {'; '.join(reasons)}. "
+            f"It was saved to {CANDIDATE_DIRECTORY} instead."
+        )
+    save(model, imputer, inference, sketches, params)
 
 
-main()
+if __name__ == "__main__":
+    main()